@@ -0,0 +1,243 @@
+"""
+設定檔模組
+config.yaml 在程序中只解析一次並檢查必要欄位，所有模組共用同一個 config 物件
+
+- 解析結果會另存為預先編譯的快取檔（依設定檔的修改時間與大小判斷是否有效），
+  之後啟動時直接讀取快取，不需要載入 yaml 模組
+- 常駐程序可呼叫 config.reload_if_changed()，設定檔有變更時就地更新內容，
+  各模組先前取得的設定區塊（例如 config['search_params']）也會看到新的值；
+  更新不是原子操作，需在沒有查詢執行時呼叫
+- 由設定推導出的值（名稱對照、郵件標頭快取、TOP_K 等）由各模組以 config.on_reload() 註冊的函數重建；
+  連線、資料庫與快取相關的設定需要重新啟動程序（見 ticket_searcher._apply_config）
+"""
+
+import marshal
+import os
+import re
+import threading
+
+CONFIG_FILE = os.environ.get("FLIGHT_MONITOR_CONFIG", "config.yaml")
+
+# 快取檔格式版本（格式變更時遞增，舊快取自動失效）
+CACHE_VERSION = 1
+
+# 必要的設定區塊與欄位
+REQUIRED_FIELDS = {
+    "amadeus": ("api_key", "api_secret", "token_url", "flight_search_url"),
+    "files": ("error_log_file", "email_content_file", "execution_log_file"),
+    "search_params": ("originLocationCode", "destinationLocationCode", "departureDate", "returnDate",
+                      "adults", "currencyCode"),
+    "notification_rules": (),
+    "flight_preferences": (),
+    "display_settings": ("max_results_in_email", "show_return_flight"),
+    "mappings": ("airport_names", "airline_names"),
+}
+
+REPLAY_MODES = ("off", "mock", "archive")
+
+_DATE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+class ConfigError(ValueError):
+    """設定檔格式錯誤"""
+
+
+def _check_route(errors, where, route):
+    for field in ("originLocationCode", "destinationLocationCode", "departureDate", "returnDate"):
+        if not route.get(field):
+            errors.append(f"{where} 缺少 {field}")
+    for field in ("departureDate", "returnDate"):
+        value = route.get(field)
+        if value and not _DATE_PATTERN.match(str(value)):
+            errors.append(f"{where}.{field} 日期格式應為 YYYY-MM-DD: {value}")
+
+
+def validate(data):
+    """
+    檢查設定內容
+
+    Returns:
+        list: 錯誤訊息（沒有錯誤時為空列表）
+    """
+    if not isinstance(data, dict):
+        return ["設定檔內容必須是 YAML 對應表（mapping）"]
+
+    errors = []
+    for section, fields in REQUIRED_FIELDS.items():
+        value = data.get(section)
+        if not isinstance(value, dict):
+            errors.append(f"缺少設定區塊 {section}")
+            continue
+        for field in fields:
+            if field not in value:
+                errors.append(f"{section} 缺少 {field}")
+
+    # 選用的區塊若有設定，必須是對應表
+    for section, value in data.items():
+        if value is not None and section not in REQUIRED_FIELDS and not isinstance(value, dict):
+            errors.append(f"{section} 必須是對應表")
+
+    search_params = data.get("search_params")
+    if isinstance(search_params, dict):
+        _check_route(errors, "search_params", search_params)
+        adults = search_params.get("adults")
+        if adults is not None and (not isinstance(adults, int) or adults < 1):
+            errors.append(f"search_params.adults 必須是正整數: {adults}")
+
+    for section in ("watchlist", "subscriptions"):
+        value = data.get(section) or {}
+        key = "routes" if section == "watchlist" else "subscribers"
+        entries = value.get(key) if isinstance(value, dict) else None
+        if entries is None:
+            continue
+        if not isinstance(entries, list):
+            errors.append(f"{section}.{key} 必須是列表")
+            continue
+        for i, entry in enumerate(entries):
+            if not isinstance(entry, dict):
+                errors.append(f"{section}.{key}[{i}] 必須是對應表")
+            elif section == "watchlist":
+                _check_route(errors, f"{section}.{key}[{i}]", entry)
+
+    replay = data.get("replay")
+    if isinstance(replay, dict) and (replay.get("mode") or "off") not in REPLAY_MODES:
+        errors.append(f"replay.mode 必須是 {' / '.join(REPLAY_MODES)} 之一: {replay.get('mode')}")
+
+    return errors
+
+
+def _update_in_place(target, source):
+    """以 source 的內容更新 target，巢狀的對應表也就地更新（保留原本的物件）"""
+    for key in [key for key in target if key not in source]:
+        del target[key]
+    for key, value in source.items():
+        current = target.get(key)
+        if isinstance(current, dict) and isinstance(value, dict):
+            _update_in_place(current, value)
+        else:
+            target[key] = value
+
+
+class AppConfig(dict):
+    """設定內容（dict），可依設定檔修改時間重新載入"""
+
+    def __init__(self, path=CONFIG_FILE, cache_file=None, use_cache=True):
+        """
+        Args:
+            path: 設定檔路徑
+            cache_file: 預先編譯的快取檔路徑（預設為 <設定檔>.cache）
+            use_cache: 是否使用快取檔
+
+        Raises:
+            ConfigError: 設定檔格式錯誤
+        """
+        super().__init__()
+        self.path = path
+        self.cache_file = cache_file or f"{path}.cache"
+        self.use_cache = use_cache
+        self._signature = None
+        self._callbacks = []
+        self._lock = threading.Lock()
+        signature, data = self._load()
+        self.update(data)
+        self._signature = signature
+
+    def _stat(self):
+        st = os.stat(self.path)
+        return st.st_mtime_ns, st.st_size
+
+    def _read_cache(self, signature):
+        try:
+            with open(self.cache_file, "rb") as f:
+                version, cached_signature, data = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        if version != CACHE_VERSION or tuple(cached_signature) != signature:
+            return None
+        return data
+
+    def _write_cache(self, signature, data):
+        tmp_path = f"{self.cache_file}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                marshal.dump((CACHE_VERSION, signature, data), f)
+            os.replace(tmp_path, self.cache_file)
+        except (OSError, ValueError):
+            # 無法寫入或內容含有無法編譯的型別（例如未加引號的日期）時不使用快取
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def _parse(self):
+        import yaml
+        loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+        with open(self.path, "r", encoding="utf-8") as f:
+            return yaml.load(f, Loader=loader)
+
+    def _load(self):
+        """讀取設定檔（快取有效時直接使用快取），回傳 (檔案簽章, 內容)"""
+        signature = self._stat()
+        if self.use_cache:
+            data = self._read_cache(signature)
+            if data is not None:
+                return signature, data
+
+        data = self._parse()
+        errors = validate(data)
+        if errors:
+            raise ConfigError(f"{self.path} 設定錯誤:\n  " + "\n  ".join(errors))
+        if self.use_cache:
+            self._write_cache(signature, data)
+        return signature, data
+
+    def section(self, name):
+        """取得設定區塊（未設定時為空的對應表）"""
+        return self.get(name) or {}
+
+    def on_reload(self, callback):
+        """註冊重新載入後要呼叫的函數 callback(config)"""
+        self._callbacks.append(callback)
+
+    def changed(self):
+        """設定檔在上次載入後是否有變更"""
+        try:
+            return self._stat() != self._signature
+        except OSError:
+            return False
+
+    def reload_if_changed(self):
+        """
+        設定檔有變更時重新載入（格式錯誤時保留原本的設定）
+
+        內容是就地更新，呼叫時不應有其他執行緒正在讀取設定（常駐模式會等執行中的查詢完成再呼叫）
+
+        Returns:
+            bool: 是否已重新載入
+        """
+        with self._lock:
+            try:
+                if self._stat() == self._signature:
+                    return False
+                signature, data = self._load()
+            except ConfigError as e:
+                print(f"⚠️ {e}\n⚠️ 繼續使用原本的設定")
+                # 同一個錯誤的版本不重複檢查
+                self._signature = self._stat()
+                return False
+            except Exception as e:
+                print(f"⚠️ 重新載入設定檔失敗: {e}")
+                return False
+            _update_in_place(self, data)
+            self._signature = signature
+
+        print(f"🔄 已重新載入設定檔: {self.path}")
+        for callback in self._callbacks:
+            try:
+                callback(self)
+            except Exception as e:
+                print(f"⚠️ 設定重新載入後的處理失敗: {e}")
+        return True
+
+
+config = AppConfig()
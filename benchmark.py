@@ -0,0 +1,279 @@
+"""
+效能測試
+以模擬資料（synthetic_offers）或封存的真實回應（response_archive）測量
+解析、篩選、排序、格式化的處理速度與記憶體高峰，結果存成 JSON 供不同版本比較
+
+用法:
+    python benchmark.py                          # 50 / 250 / 10k / 100k 筆模擬資料
+    python benchmark.py --sizes 50 250           # 只測指定筆數
+    python benchmark.py --replay archive         # 另外重播封存的回應
+    python benchmark.py --output result.json     # 指定結果檔（預設 benchmarks/<commit>.json）
+    python benchmark.py --compare old.json new.json   # 比較兩次結果，變慢超過門檻時回傳 1
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from utils import config, parse_duration, get_time_period
+from flightInfo import FlightInfo
+from email_formatter import EmailFormatter
+from notifier import Alert
+from rules import SubscriptionIndex, compile_preferences
+from offer_stream import OfferStream
+from topk import TopK
+from synthetic_offers import generate_payload_bytes
+import offer_batch
+
+DEFAULT_SIZES = (50, 250, 10000, 100000)
+DEFAULT_THRESHOLD = 0.10
+RESULTS_DIR = "benchmarks"
+
+PREFERENCES = config.get('flight_preferences') or {}
+
+
+def _repeats_for(n):
+    """資料量越大重複次數越少，讓每個項目的總時間維持在合理範圍"""
+    if n <= 1000:
+        return 20
+    if n <= 20000:
+        return 5
+    return 2
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def measure(fn, repeats, items):
+    """
+    執行 fn 數次，回傳耗時統計與記憶體高峰
+
+    計時與記憶體分開測量（tracemalloc 會拖慢執行速度）
+    """
+    times = []
+    for _ in range(repeats):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = min(times)
+    return {
+        "items": items,
+        "repeats": repeats,
+        "best_s": best,
+        "median_s": statistics.median(times),
+        "items_per_s": items / best if best > 0 else None,
+        "peak_kb": peak // 1024
+    }
+
+
+def _cases(raw):
+    """
+    一份回應的所有測試項目
+
+    Args:
+        raw: API 回應的原始 bytes
+
+    Returns:
+        list: [(名稱, 函數, 處理筆數)]
+    """
+    data = json.loads(raw)
+    offers = data["data"]
+    flights = [FlightInfo(offer) for offer in offers]
+    n = len(flights)
+    durations = [it["duration"] for offer in offers for it in offer["itineraries"]]
+    times = [seg["departure"]["at"] for offer in offers for it in offer["itineraries"] for seg in it["segments"]]
+    top = sorted(flights, key=lambda f: f.price_minor)[:10]
+    formatter = EmailFormatter("TPE", "NRT", "2026-03-06", "2026-03-11", 1)
+    last_price = top[-1].price if top else 0
+    # 50 條路線（日期各不相同）的摘要
+    alerts = [Alert(f"TPE-{dest}-{day}", "TPE", dest, f"2026-03-{day:02d}", f"2026-04-{day:02d}", 1,
+                    last_price * 1.2, last_price, "benchmark", top[:3], recipients=["bench@example.com"])
+              for dest in ("NRT", "KIX") for day in range(1, 26)]
+
+    # 200 位訂閱者（偏好各不相同）的反向索引
+    rule = compile_preferences(PREFERENCES)
+    carriers = sorted({f.airline_code for f in flights}) or ["XX"]
+    index = SubscriptionIndex()
+    for i in range(200):
+        index.add("TPE-NRT", i, {"max_stops": i % 3 if i % 4 else None,
+                                 "preferred_airlines": [carriers[i % len(carriers)]] if i % 2 else []})
+
+    def stream_parse():
+        chunks = (raw[i:i + 65536] for i in range(0, len(raw), 65536))
+        return [FlightInfo(offer) for offer in OfferStream(chunks)]
+
+    def top_k():
+        heap = TopK(10)
+        heap.extend(flights)
+        return heap.items()
+
+    cases = [
+        ("decode", lambda: json.loads(raw), n),
+        ("parse", lambda: [FlightInfo(offer) for offer in offers], n),
+        ("decode+parse", lambda: [FlightInfo(offer) for offer in json.loads(raw)["data"]], n),
+        ("stream_parse", stream_parse, n),
+        ("parse_duration", lambda: [parse_duration(d) for d in durations], len(durations)),
+        ("get_time_period", lambda: [get_time_period(t) for t in times], len(times)),
+        ("filter", lambda: [f for f in flights if f.matches_preferences(PREFERENCES)], n),
+        ("filter_compiled", lambda: [f for f in flights if rule.matches(f)], n),
+        ("subscription_index", lambda: index.match("TPE-NRT", flights), n),
+        ("sort_full", lambda: sorted(flights, key=lambda f: f.price_minor), n),
+        ("top_k", top_k, n),
+        ("summary", lambda: [f.get_summary() for f in flights], n),
+        ("price_drop_email", lambda: formatter.create_price_drop_email(last_price * 1.2, last_price, top), 1),
+        ("price_drop_html", lambda: formatter.create_price_drop_email(last_price * 1.2, last_price, top, html=True), 1),
+        ("digest_email", lambda: EmailFormatter.create_digest_email(alerts), len(alerts)),
+    ]
+    if offer_batch.is_available():
+        batch = offer_batch.OfferBatch(flights)
+        cases += [
+            ("batch_build", lambda: offer_batch.OfferBatch(flights), n),
+            ("batch_filter", lambda: batch.filter(PREFERENCES), n),
+            ("batch_filter_top_k", lambda: batch.filter(PREFERENCES, 10), n),
+        ]
+    return cases
+
+
+def run_dataset(name, raw, case_filter=None):
+    """測量一份回應的所有項目"""
+    results = []
+    cases = _cases(raw)
+    n = cases[0][2]
+    repeats = _repeats_for(n)
+    print(f"\n📦 {name}（{n:,} 筆航班，{len(raw) / 1024:,.0f} KB）")
+    for case, fn, items in cases:
+        if case_filter and case not in case_filter:
+            continue
+        # 單筆的項目（如 Email）多重複幾次
+        result = measure(fn, repeats * 5 if items == 1 else repeats, items)
+        result.update({"dataset": name, "case": case, "offers": n})
+        results.append(result)
+        rate = f"{result['items_per_s']:>14,.0f}/s" if result["items_per_s"] else " " * 16
+        print(f"  {case:<18} {result['best_s'] * 1000:>10.2f} ms {rate} {result['peak_kb']:>10,} KB")
+    return results
+
+
+def replay_datasets(path, limit=None):
+    """從封存檔取出回應（每條路線只取最新一筆）"""
+    from response_archive import iter_records
+
+    latest = {}
+    for record in iter_records(path):
+        if (record.get("response") or {}).get("data"):
+            latest[record["route"]] = record
+    items = sorted(latest.items())[:limit] if limit else sorted(latest.items())
+    for route, record in items:
+        raw = json.dumps(record["response"], separators=(",", ":")).encode("utf-8")
+        yield f"replay-{route}", raw
+
+
+def run(sizes=DEFAULT_SIZES, replay=None, seed=0, case_filter=None):
+    results = []
+    for size in sizes:
+        raw = generate_payload_bytes(size, seed=seed)
+        results += run_dataset(f"synthetic-{size}", raw, case_filter)
+        del raw
+    if replay:
+        for name, raw in replay_datasets(replay):
+            results += run_dataset(name, raw, case_filter)
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": offer_batch.is_available(),
+            "seed": seed
+        },
+        "results": results
+    }
+
+
+def save(report, path=None):
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{report['meta']['commit']}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 結果已儲存: {path}")
+    return path
+
+
+def compare(base_path, new_path, threshold=DEFAULT_THRESHOLD):
+    """
+    比較兩次結果（以 best_s 為準）
+
+    Returns:
+        bool: 沒有項目變慢超過 threshold 時回傳 True
+    """
+    with open(base_path, "r", encoding="utf-8") as f:
+        base = json.load(f)
+    with open(new_path, "r", encoding="utf-8") as f:
+        new = json.load(f)
+
+    base_results = {(r["dataset"], r["case"]): r for r in base["results"]}
+    print(f"📊 {base['meta']['commit']} → {new['meta']['commit']}（門檻 {threshold:.0%}）")
+    print(f"  {'dataset':<22} {'case':<18} {'舊 (ms)':>10} {'新 (ms)':>10} {'變化':>8} {'記憶體':>10}")
+
+    ok = True
+    for r in new["results"]:
+        old = base_results.get((r["dataset"], r["case"]))
+        if not old:
+            continue
+        change = r["best_s"] / old["best_s"] - 1 if old["best_s"] else 0
+        mem_change = r["peak_kb"] / old["peak_kb"] - 1 if old["peak_kb"] else 0
+        flag = ""
+        if change > threshold:
+            flag = " ⚠️ 變慢"
+            ok = False
+        elif change < -threshold:
+            flag = " ✅ 變快"
+        print(f"  {r['dataset']:<22} {r['case']:<18} {old['best_s'] * 1000:>10.2f} "
+              f"{r['best_s'] * 1000:>10.2f} {change:>+8.1%} {mem_change:>+10.1%}{flag}")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="航班查詢效能測試")
+    parser.add_argument("--sizes", type=int, nargs="*", default=list(DEFAULT_SIZES), help="模擬資料的航班筆數")
+    parser.add_argument("--replay", help="重播封存的回應（封存檔或目錄）")
+    parser.add_argument("--seed", type=int, default=0, help="模擬資料的亂數種子")
+    parser.add_argument("--cases", nargs="*", help="只測指定項目")
+    parser.add_argument("--output", help="結果檔路徑（預設 benchmarks/<commit>.json）")
+    parser.add_argument("--compare", nargs="+", metavar="JSON", help="比較兩個結果檔（只給一個時與本次結果比較）")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="判定變慢的比例（預設 0.10）")
+    args = parser.parse_args(argv)
+
+    if args.compare and len(args.compare) >= 2:
+        return 0 if compare(args.compare[0], args.compare[1], args.threshold) else 1
+
+    report = run(args.sizes, args.replay, args.seed, set(args.cases) if args.cases else None)
+    path = save(report, args.output)
+    if args.compare:
+        return 0 if compare(args.compare[0], path, args.threshold) else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,250 @@
+"""
+常駐監控模組
+程序常駐並依每條路線的價格波動與出發日遠近，自動調整查詢頻率
+"""
+
+import heapq
+import random
+import signal
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from ticket_searcher import HISTORY_STORE, METRICS, METRICS_SETTINGS, METRICS_TEXTFILE, config
+from watchlist import WatchlistRunner, load_routes, route_key
+
+
+class RouteSchedule:
+    """單一路線的排程狀態"""
+
+    def __init__(self, route, history_size=10):
+        self.route = route
+        self.key = route_key(route['origin'], route['destination'], route['depart_date'], route['return_date'])
+        self.prices = deque(maxlen=history_size)
+        self.interval = None
+
+
+class AdaptiveScheduler:
+    """依價格波動與出發日遠近決定查詢間隔"""
+
+    def __init__(self, base_interval=1800, min_interval=300, max_interval=14400,
+                 volatility_sensitivity=0.5):
+        """
+        Args:
+            base_interval: 基準查詢間隔（秒）
+            min_interval / max_interval: 查詢間隔上下限（秒）
+            volatility_sensitivity: 價格波動對間隔的影響程度（越大則波動時查得越頻繁）
+        """
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.volatility_sensitivity = volatility_sensitivity
+
+    def _volatility_factor(self, prices):
+        """價格波動越大，間隔越短；連續多次價格不變則放寬間隔"""
+        if len(prices) < 2:
+            return 1.0
+        mean = statistics.fmean(prices)
+        if mean <= 0:
+            return 1.0
+        cv_percent = statistics.pstdev(prices) / mean * 100
+        if cv_percent == 0 and len(prices) >= 3:
+            return 2.0
+        return 1.0 / (1.0 + self.volatility_sensitivity * cv_percent)
+
+    def _departure_factor(self, depart_date):
+        """出發日越近，間隔越短"""
+        try:
+            days_left = (datetime.strptime(depart_date, "%Y-%m-%d") - datetime.now()).days
+        except ValueError:
+            return 1.0
+        if days_left <= 7:
+            return 0.25
+        if days_left <= 30:
+            return 0.5
+        if days_left <= 90:
+            return 1.0
+        return 2.0
+
+    def next_interval(self, schedule):
+        """計算下一次查詢的間隔（秒）"""
+        interval = (self.base_interval
+                    * self._volatility_factor(schedule.prices)
+                    * self._departure_factor(schedule.route['depart_date']))
+        return max(self.min_interval, min(self.max_interval, interval))
+
+
+class MonitorDaemon:
+    """常駐監控：以優先佇列排程所有路線"""
+
+    def __init__(self, routes, scheduler, max_workers=4, start_jitter=60,
+                 config_check_interval=10):
+        """
+        Args:
+            routes: watchlist.load_routes() 回傳的路線列表
+            scheduler: AdaptiveScheduler 物件
+            max_workers: 同時檢查的路線數上限
+            start_jitter: 啟動時每條路線隨機延遲的最大秒數（避免同時查詢）
+            config_check_interval: 每隔幾秒檢查設定檔是否變更（0 表示不檢查）
+        """
+        self.schedules = [self._new_schedule(route) for route in routes]
+        self.scheduler = scheduler
+        self.max_workers = max(1, max_workers)
+        self.runner = WatchlistRunner(routes, max_workers=max_workers)
+        self.start_jitter = start_jitter
+        self.config_check_interval = config_check_interval
+        self._stop = threading.Event()
+        self._queue = []
+        self._seq = 0
+
+    @staticmethod
+    def _new_schedule(route):
+        schedule = RouteSchedule(route)
+        # 以資料庫中最近的價格記錄作為初始波動資料
+        recent = HISTORY_STORE.price_history(schedule.key, days=7)
+        schedule.prices.extend(price for _, price in recent[-schedule.prices.maxlen:])
+        return schedule
+
+    def update_routes(self, routes):
+        """
+        套用新的路線列表（設定檔變更時呼叫）
+
+        新增的路線在啟動延遲內開始查詢，移除的路線不再排程，
+        保留的路線沿用原本的排程與價格記錄，但改用新的偏好與通知規則
+        """
+        current = {schedule.key: schedule for schedule in self.schedules}
+        schedules = []
+        added = 0
+        now = time.time()
+        for route in routes:
+            schedule = RouteSchedule(route)
+            existing = current.pop(schedule.key, None)
+            if existing is not None:
+                existing.route = route
+                schedules.append(existing)
+                continue
+            schedule = self._new_schedule(route)
+            schedules.append(schedule)
+            self._push(now + random.uniform(0, self.start_jitter), schedule)
+            added += 1
+
+        self.schedules = schedules
+        self.runner.routes = routes
+        # 已移除路線的排程在到期時略過
+        self._queue = [item for item in self._queue if item[2].key not in current]
+        heapq.heapify(self._queue)
+        print(f"🔄 路線已更新：共 {len(schedules)} 條（新增 {added}，移除 {len(current)}）")
+
+    def _push(self, run_at, schedule):
+        heapq.heappush(self._queue, (run_at, self._seq, schedule))
+        self._seq += 1
+
+    def _reschedule(self, schedule, result):
+        """依本次結果安排下一次查詢（路線已被移除時不再排程）"""
+        if schedule not in self.schedules:
+            return
+        if result["success"] and result["price"] is not None:
+            schedule.prices.append(result["price"])
+        schedule.interval = self.scheduler.next_interval(schedule)
+        self._push(time.time() + schedule.interval, schedule)
+        print(f"🗓️ {schedule.key} 下次查詢: {schedule.interval / 60:.0f} 分鐘後")
+
+    def stop(self, *args):
+        """要求停止（等待執行中的查詢完成後結束）"""
+        if not self._stop.is_set():
+            print("\n🛑 收到停止訊號，等待執行中的查詢完成...")
+        self._stop.set()
+
+    def _install_signal_handlers(self):
+        if threading.current_thread() is not threading.main_thread():
+            return
+        for name in ("SIGINT", "SIGTERM", "SIGBREAK"):
+            if hasattr(signal, name):
+                signal.signal(getattr(signal, name), self.stop)
+
+    def run(self):
+        """開始常駐執行，直到收到停止訊號"""
+        self._install_signal_handlers()
+
+        now = time.time()
+        for schedule in self.schedules:
+            self._push(now + random.uniform(0, self.start_jitter), schedule)
+
+        print(f"🚀 常駐監控啟動：共 {len(self.schedules)} 條路線（同時 {self.max_workers} 條）")
+
+        running = {}
+        next_config_check = now + self.config_check_interval
+        reload_pending = False
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while not self._stop.is_set():
+                # 設定檔變更時套用新的路線，不需要重新啟動
+                if self.config_check_interval and time.time() >= next_config_check:
+                    next_config_check = time.time() + self.config_check_interval
+                    if not reload_pending and config.changed():
+                        reload_pending = True
+                        if running:
+                            print("🔄 設定檔已變更，等待執行中的查詢完成後重新載入")
+
+                # 處理已完成的查詢
+                finished = [f for f in running if f.done()]
+                for future in finished:
+                    schedule = running.pop(future)
+                    self._reschedule(schedule, future.result())
+                if finished and METRICS_TEXTFILE:
+                    METRICS.write_textfile(METRICS_TEXTFILE)
+
+                # 重新載入會就地修改設定內容，只在沒有查詢執行時進行，查詢不會讀到更新到一半的設定
+                if reload_pending and not running:
+                    reload_pending = False
+                    if config.reload_if_changed():
+                        self.update_routes(load_routes(config.section('watchlist')))
+
+                # 啟動已到期的路線（等待重新載入時暫不啟動）
+                now = time.time()
+                while (not reload_pending and self._queue and self._queue[0][0] <= now
+                       and len(running) < self.max_workers):
+                    _, _, schedule = heapq.heappop(self._queue)
+                    running[executor.submit(self.runner.check_route, schedule.route)] = schedule
+
+                wait = self._queue[0][0] - now if self._queue else 1.0
+                self._stop.wait(max(0.1, min(wait, 1.0)))
+
+        print("👋 常駐監控已停止")
+
+
+def run_daemon():
+    """依 config.yaml 的 watchlist 與 daemon 設定啟動常駐監控"""
+    watchlist_config = config.get('watchlist') or {}
+    daemon_config = config.get('daemon') or {}
+    routes = load_routes(watchlist_config)
+    if not routes:
+        print("⚠️ config.yaml 的 watchlist 沒有設定任何路線")
+        return False
+
+    scheduler = AdaptiveScheduler(
+        base_interval=daemon_config.get('base_interval_minutes', 30) * 60,
+        min_interval=daemon_config.get('min_interval_minutes', 5) * 60,
+        max_interval=daemon_config.get('max_interval_minutes', 240) * 60,
+        volatility_sensitivity=daemon_config.get('volatility_sensitivity', 0.5)
+    )
+    daemon = MonitorDaemon(
+        routes,
+        scheduler,
+        max_workers=watchlist_config.get('max_workers', 4),
+        start_jitter=daemon_config.get('start_jitter_seconds', 60),
+        config_check_interval=daemon_config.get('config_check_seconds', 10)
+    )
+
+    # 常駐模式可另外提供 HTTP 端點讓 Prometheus 直接抓取
+    metrics_server = None
+    if METRICS_SETTINGS.get('enabled', False) and METRICS_SETTINGS.get('http_port'):
+        metrics_server = METRICS.serve(METRICS_SETTINGS['http_port'], METRICS_SETTINGS.get('http_host', '127.0.0.1'))
+    try:
+        daemon.run()
+    finally:
+        if metrics_server:
+            metrics_server.shutdown()
+    return True
@@ -0,0 +1,180 @@
+"""
+彈性日期搜尋模組
+在出發/回程日期前後 N 天內並行搜尋所有日期組合，找出每個組合的最低價
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+from ticket_searcher import TicketSearcher, config
+from topk import merge_topk
+
+
+def generate_date_pairs(depart_date, return_date, flex_days, min_trip_days=None, max_trip_days=None):
+    """
+    產生 (出發日, 回程日) 組合
+
+    Args:
+        depart_date / return_date: 基準日期 (YYYY-MM-DD)
+        flex_days: 前後彈性天數
+        min_trip_days / max_trip_days: 旅行天數限制（None 表示不限）
+
+    Returns:
+        list: [(出發日, 回程日), ...]，日期格式為 YYYY-MM-DD
+    """
+    base_dep = datetime.strptime(depart_date, "%Y-%m-%d")
+    base_ret = datetime.strptime(return_date, "%Y-%m-%d")
+    offsets = range(-flex_days, flex_days + 1)
+
+    pairs = []
+    for dep_offset in offsets:
+        dep = base_dep + timedelta(days=dep_offset)
+        for ret_offset in offsets:
+            ret = base_ret + timedelta(days=ret_offset)
+            trip_days = (ret - dep).days
+            if trip_days < 0:
+                continue
+            if min_trip_days is not None and trip_days < min_trip_days:
+                continue
+            if max_trip_days is not None and trip_days > max_trip_days:
+                continue
+            pairs.append((dep.strftime("%Y-%m-%d"), ret.strftime("%Y-%m-%d")))
+    return pairs
+
+
+class DateGridSearch:
+    """彈性日期矩陣搜尋"""
+
+    def __init__(self, origin, destination, depart_date, return_date, flex_days=3,
+                 min_trip_days=None, max_trip_days=None, max_workers=4,
+                 search_params=None, preferences=None, top_k=5):
+        self.origin = origin
+        self.destination = destination
+        self.date_pairs = generate_date_pairs(depart_date, return_date, flex_days,
+                                              min_trip_days, max_trip_days)
+        self.max_workers = max(1, max_workers)
+        self.search_params = search_params
+        self.preferences = preferences
+        self.top_k = top_k
+
+    def _search_cell(self, depart_date, return_date):
+        """搜尋單一日期組合，回傳符合條件的航班（依價格排序）"""
+        searcher = TicketSearcher(
+            self.origin,
+            self.destination,
+            depart_date,
+            return_date,
+            search_params=self.search_params,
+            preferences=self.preferences
+        )
+        return searcher.get_flights()
+
+    def iter_results(self):
+        """
+        並行搜尋所有日期組合，每完成一個就立即回傳
+
+        Yields:
+            (出發日, 回程日, 航班列表或 None)
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self._search_cell, dep, ret): (dep, ret)
+                for dep, ret in self.date_pairs
+            }
+            for future in as_completed(futures):
+                dep, ret = futures[future]
+                try:
+                    flights = future.result()
+                except Exception as e:
+                    print(f"❌ {dep} ~ {ret} 搜尋失敗: {e}")
+                    flights = None
+                yield dep, ret, flights
+
+    def run(self, on_result=None):
+        """
+        執行矩陣搜尋
+
+        Args:
+            on_result: 每個日期組合完成時呼叫的函數 on_result(出發日, 回程日, 最低價或 None)
+
+        Returns:
+            dict: {"matrix": {(出發日, 回程日): 最低價或 None},
+                   "cheapest": (出發日, 回程日, 最低價航班) 或 None,
+                   "top_offers": 所有日期組合中最便宜的航班 [(出發日, 回程日, 航班), ...]}
+        """
+        print(f"\n📅 彈性日期搜尋：{self.origin} → {self.destination}，共 {len(self.date_pairs)} 組日期")
+
+        matrix = {}
+        cheapest = None
+        cell_offers = []
+        for dep, ret, flights in self.iter_results():
+            if flights:
+                # 每個日期組合的結果已依價格排序
+                cell_offers.append([(dep, ret, flight) for flight in flights])
+            best = flights[0] if flights else None
+            matrix[(dep, ret)] = best.price if best else None
+            if best and (cheapest is None or best.price < cheapest[2].price):
+                cheapest = (dep, ret, best)
+            if on_result:
+                on_result(dep, ret, matrix[(dep, ret)])
+
+        top_offers = merge_topk(cell_offers, self.top_k, key=lambda item: item[2].price_minor)
+
+        self.print_matrix(matrix, cheapest)
+        self.print_top_offers(top_offers)
+        return {"matrix": matrix, "cheapest": cheapest, "top_offers": top_offers}
+
+    def print_matrix(self, matrix, cheapest):
+        """輸出價格矩陣（列: 出發日，欄: 回程日）"""
+        depart_dates = sorted({dep for dep, _ in matrix})
+        return_dates = sorted({ret for _, ret in matrix})
+
+        print("\n" + "="*60)
+        print("📊 價格矩陣（列: 出發日 / 欄: 回程日）")
+        print("="*60)
+        print(" " * 7 + "".join(f"{ret[5:]:>10}" for ret in return_dates))
+        for dep in depart_dates:
+            cells = []
+            for ret in return_dates:
+                if (dep, ret) not in matrix:
+                    cells.append(f"{'':>10}")
+                elif matrix[(dep, ret)] is None:
+                    cells.append(f"{'-':>10}")
+                else:
+                    cells.append(f"{matrix[(dep, ret)]:>10,.0f}")
+            print(f"{dep[5:]:>7}" + "".join(cells))
+        print("-"*60)
+
+        if cheapest:
+            dep, ret, flight = cheapest
+            print(f"💰 最低票價: NT$ {flight.price:,.0f} | {dep} ~ {ret}")
+            print(f"   {flight.get_summary()}")
+        else:
+            print("⚠️ 所有日期組合都沒有找到航班")
+
+    def print_top_offers(self, top_offers):
+        """輸出所有日期組合中最便宜的航班"""
+        if not top_offers:
+            return
+        print(f"\n🏆 所有日期中最便宜的 {len(top_offers)} 個航班:")
+        for i, (dep, ret, flight) in enumerate(top_offers, 1):
+            print(f"{i}. NT$ {flight.price:,.0f} | {dep} ~ {ret} | {flight.get_summary()}")
+
+
+def run_date_grid():
+    """依 config.yaml 的 search_params 與 date_grid 設定執行彈性日期搜尋"""
+    search_params = config['search_params']
+    grid_config = config.get('date_grid') or {}
+
+    grid = DateGridSearch(
+        search_params['originLocationCode'],
+        search_params['destinationLocationCode'],
+        search_params['departureDate'],
+        search_params['returnDate'],
+        flex_days=grid_config.get('flex_days', 3),
+        min_trip_days=grid_config.get('min_trip_days'),
+        max_trip_days=grid_config.get('max_trip_days'),
+        max_workers=grid_config.get('max_workers', 4),
+        top_k=config['display_settings']['max_results_in_email']
+    )
+    return grid.run()
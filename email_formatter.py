@@ -1,22 +1,172 @@
 """
 Email 內容格式化模組
-負責生成航班價格通知的 Email 內容
+負責生成航班價格通知的 Email 內容（純文字與 HTML 兩種格式）
+
+每條路線固定不變的標頭與比價連結只產生一次並快取，
+內容以片段列表組成後一次 join，郵件數量與航班數增加時耗時為線性成長
+"""
+
+from datetime import datetime, timezone
+from functools import lru_cache
+from html import escape
+from flightInfo import SEG_DEP_AIRPORT, SEG_DEP_TIME, SEG_ARR_AIRPORT, SEG_ARR_TIME
+from app_config import config
+from utils import get_airport_name
+
+RULE = "═" * 39
+SEPARATOR = "-" * 50
+
+# ---- 純文字模板 ----
+
+TEXT_ROUTE_HEADER = """
+🎉 機票價格下降通知！
+
+{rule}
+📍 航班資訊
+{rule}
+出發地：{origin_name} ({origin})
+目的地：{destination_name} ({destination})
+出發日期：{depart}
+回程日期：{return_}
+乘客人數：{adults} 位成人
+"""
+
+TEXT_PRICE = """
+{rule}
+💰 價格變化
+{rule}
+上次價格：NT$ {last_price:,.0f}
+目前價格：NT$ {new_price:,.0f}
+省下金額：NT$ {price_diff:,.0f} ({percentage:.1f}%)
+
+{rule}
+✈️ 推薦航班（前 {count} 個符合條件的選項）
+{rule}
+"""
+
+TEXT_OPTION = "\n【選項 {index}】NT$ {price:,.0f}\n"
+
+TEXT_LINKS = """
+{rule}
+🔗 立即比價
+{rule}
+Skyscanner: {skyscanner}
+
+Google Flights: {google}
+
+{rule}
+"""
+
+TEXT_FOOTER = """⏰ 通知時間：{timestamp}
+
+💡 提醒：
+- 建議在多個平台比價後再下單
+- 注意行李、餐食等附加費用
+- 建議盡快下單，價格可能隨時變動
+- 確認航班時間是否適合您的行程
+"""
+
+TEXT_DIGEST_HEADER = "\n🎉 機票價格下降通知！共 {count} 條路線降價\n\n{rule}\n📋 總覽\n{rule}\n"
+
+TEXT_DIGEST_LINE = "{index}. {route_name}｜{depart_date} ~ {return_date}｜NT$ {last_price:,.0f} → NT$ {new_price:,.0f} (-{percentage:.1f}%)\n"
+
+TEXT_DIGEST_ROUTE = """
+{rule}
+📍 {index}. {route_name} ({origin} → {destination})
+{rule}
+出發日期：{depart}
+回程日期：{return_}
+乘客人數：{adults} 位成人
+上次價格：NT$ {last_price:,.0f}
+目前價格：NT$ {new_price:,.0f}
+省下金額：NT$ {price_diff:,.0f} ({percentage:.1f}%)
+通知原因：{reason}
+"""
+
+TEXT_DIGEST_LINKS = "\nSkyscanner: {skyscanner}\nGoogle Flights: {google}\n"
+
+TEXT_DIGEST_FOOTER = """
+{rule}
+⏰ 通知時間：{timestamp}
+
+💡 提醒：
+- 建議在多個平台比價後再下單
+- 注意行李、餐食等附加費用
+- 建議盡快下單，價格可能隨時變動
+"""
+
+# ---- HTML 模板（欄位值需先 escape）----
+
+HTML_OPEN = '<html><body style="font-family:sans-serif;line-height:1.5;color:#222">\n'
+
+HTML_CLOSE = "</body></html>\n"
+
+HTML_ROUTE_HEADER = """<h2>🎉 機票價格下降通知！</h2>
+<h3>📍 航班資訊</h3>
+<table cellpadding="4">
+<tr><td>出發地</td><td>{origin_name} ({origin})</td></tr>
+<tr><td>目的地</td><td>{destination_name} ({destination})</td></tr>
+<tr><td>出發日期</td><td>{depart}</td></tr>
+<tr><td>回程日期</td><td>{return_}</td></tr>
+<tr><td>乘客人數</td><td>{adults} 位成人</td></tr>
+</table>
+"""
+
+HTML_PRICE = """<h3>💰 價格變化</h3>
+<table cellpadding="4">
+<tr><td>上次價格</td><td>NT$ {last_price:,.0f}</td></tr>
+<tr><td>目前價格</td><td><b>NT$ {new_price:,.0f}</b></td></tr>
+<tr><td>省下金額</td><td>NT$ {price_diff:,.0f} ({percentage:.1f}%)</td></tr>
+</table>
+<h3>✈️ 推薦航班（前 {count} 個符合條件的選項）</h3>
+"""
+
+HTML_OPTION = "<h4>【選項 {index}】NT$ {price:,.0f}</h4>\n"
+
+HTML_LINKS = """<h3>🔗 立即比價</h3>
+<p><a href="{skyscanner}">Skyscanner</a> ｜ <a href="{google}">Google Flights</a></p>
+"""
+
+HTML_FOOTER = """<hr>
+<p>⏰ 通知時間：{timestamp}</p>
+<p>💡 提醒：</p>
+<ul>
+<li>建議在多個平台比價後再下單</li>
+<li>注意行李、餐食等附加費用</li>
+<li>建議盡快下單，價格可能隨時變動</li>
+<li>確認航班時間是否適合您的行程</li>
+</ul>
+"""
+
+HTML_DIGEST_HEADER = "<h2>🎉 機票價格下降通知！共 {count} 條路線降價</h2>\n<h3>📋 總覽</h3>\n<ol>\n"
+
+HTML_DIGEST_LINE = "<li>{route_name}｜{depart_date} ~ {return_date}｜NT$ {last_price:,.0f} → <b>NT$ {new_price:,.0f}</b> (-{percentage:.1f}%)</li>\n"
+
+HTML_DIGEST_ROUTE = """<hr>
+<h3>📍 {index}. {route_name} ({origin} → {destination})</h3>
+<table cellpadding="4">
+<tr><td>出發日期</td><td>{depart}</td></tr>
+<tr><td>回程日期</td><td>{return_}</td></tr>
+<tr><td>乘客人數</td><td>{adults} 位成人</td></tr>
+<tr><td>上次價格</td><td>NT$ {last_price:,.0f}</td></tr>
+<tr><td>目前價格</td><td><b>NT$ {new_price:,.0f}</b></td></tr>
+<tr><td>省下金額</td><td>NT$ {price_diff:,.0f} ({percentage:.1f}%)</td></tr>
+<tr><td>通知原因</td><td>{reason}</td></tr>
+</table>
 """
 
-from datetime import datetime
+HTML_DIGEST_LINKS = '<p><a href="{skyscanner}">Skyscanner</a> ｜ <a href="{google}">Google Flights</a></p>\n'
 
-# 機場代碼對應中文名稱
-AIRPORT_NAMES = {
-    "TPE": "台北桃園", "NRT": "東京成田", "HND": "東京羽田",
-    "KIX": "大阪關西", "NGO": "名古屋中部", "FUK": "福岡",
-    "CTS": "札幌新千歲", "ITM": "大阪伊丹", "OSA": "大阪",
-    "ICN": "首爾仁川", "SIN": "新加坡", "HKG": "香港",
-    "BKK": "曼谷", "AKL": "奧克蘭"
-}
+HTML_DIGEST_FOOTER = """<hr>
+<p>⏰ 通知時間：{timestamp}</p>
+<p>💡 提醒：</p>
+<ul>
+<li>建議在多個平台比價後再下單</li>
+<li>注意行李、餐食等附加費用</li>
+<li>建議盡快下單，價格可能隨時變動</li>
+</ul>
+"""
 
-def get_airport_name(code):
-    """取得機場中文名稱"""
-    return AIRPORT_NAMES.get(code, code)
 
 def format_duration(hours):
     """將小時數格式化為易讀格式"""
@@ -24,148 +174,243 @@ def format_duration(hours):
     m = int((hours - h) * 60)
     return f"{h}小時{m}分鐘"
 
+def _format_time(epoch):
+    """epoch 秒數格式化為 2024-01-01 08:30"""
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime("%Y-%m-%d %H:%M")
+
+
+class _AirportNames(dict):
+    """單次產生郵件期間的機場名稱查詢結果（同一機場只查一次）"""
+
+    def __missing__(self, code):
+        name = self[code] = get_airport_name(code)
+        return name
+
+
+@lru_cache(maxsize=512)
+def _route_context(origin, destination, depart_date, return_date, adults):
+    """
+    路線固定不變的內容（名稱、日期、比價連結與已套用模板的標頭），同一路線只產生一次
+
+    Returns:
+        dict: 模板欄位與預先產生的 text_header / html_header / text_links / html_links
+    """
+    dep_compact = depart_date.replace('-', '')
+    ret_compact = return_date.replace('-', '')
+    context = {
+        "rule": RULE,
+        "origin": origin,
+        "destination": destination,
+        "origin_name": get_airport_name(origin),
+        "destination_name": get_airport_name(destination),
+        "depart_date": depart_date,
+        "return_date": return_date,
+        "depart": datetime.strptime(depart_date, "%Y-%m-%d").strftime("%Y年%m月%d日"),
+        "return_": datetime.strptime(return_date, "%Y-%m-%d").strftime("%Y年%m月%d日"),
+        "adults": adults,
+        "skyscanner": f"https://www.skyscanner.com.tw/transport/flights/{origin}/{destination}/{dep_compact}/{ret_compact}/",
+        "google": f"https://www.google.com/flights?hl=zh-TW#flt={origin}.{destination}.{depart_date}*{destination}.{origin}.{return_date}",
+    }
+    context["route_name"] = f"{context['origin_name']} → {context['destination_name']}"
+
+    html_context = {key: escape(str(value)) for key, value in context.items()}
+    context["html"] = html_context
+    context["text_header"] = TEXT_ROUTE_HEADER.format_map(context)
+    context["text_links"] = TEXT_LINKS.format_map(context)
+    context["html_header"] = HTML_ROUTE_HEADER.format_map(html_context)
+    context["html_links"] = HTML_LINKS.format_map(html_context)
+    return context
+
+
+# 名稱與連結可能隨設定檔改變，重新載入後重新產生
+config.on_reload(lambda new_config: _route_context.cache_clear())
+
+
+def _price_change(last_price, new_price):
+    price_diff = last_price - new_price
+    percentage = (price_diff / last_price) * 100 if last_price else 0
+    return price_diff, percentage
+
+
 class EmailFormatter:
     """Email 內容格式化器"""
-    
+
     def __init__(self, origin, destination, depart_date, return_date, adults):
         self.origin = origin
         self.destination = destination
         self.depart_date = depart_date
         self.return_date = return_date
         self.adults = adults
-    
+
+    @property
+    def _context(self):
+        return _route_context(self.origin, self.destination, self.depart_date, self.return_date, self.adults)
+
     def _format_date(self, date_str):
         """格式化日期為中文格式"""
         return datetime.strptime(date_str, "%Y-%m-%d").strftime("%Y年%m月%d日")
-    
+
     def _generate_comparison_links(self):
         """生成比價網站連結"""
-        dep_date_compact = self.depart_date.replace('-', '')
-        ret_date_compact = self.return_date.replace('-', '')
-        
-        skyscanner_url = f"https://www.skyscanner.com.tw/transport/flights/{self.origin}/{self.destination}/{dep_date_compact}/{ret_date_compact}/"
-        google_flights_url = f"https://www.google.com/flights?hl=zh-TW#flt={self.origin}.{self.destination}.{self.depart_date}*{self.destination}.{self.origin}.{self.return_date}"
-        
-        return skyscanner_url, google_flights_url
-    
-    def _format_flight_details(self, flight, show_return=True):
-        """格式化單個航班的詳細資訊"""
-        details = []
-        
-        # 去程資訊
-        details.append(f"【去程】{flight.airline_name} {flight.flight_number}")
-        details.append(f"  出發: {flight.departure_time.replace('T', ' ')[:16]} {get_airport_name(flight.departure_airport)}")
-        details.append(f"  抵達: {flight.arrival_time.replace('T', ' ')[:16]} {get_airport_name(flight.arrival_airport)}")
-        details.append(f"  轉機: {'直飛' if flight.outbound_stops == 0 else f'{flight.outbound_stops}次'}")
-        details.append(f"  飛行時間: {format_duration(flight.outbound_duration)}")
-        
+        context = self._context
+        return context["skyscanner"], context["google"]
+
+    def _flight_sections(self, flight, show_return=True, names=None):
+        """
+        單個航班的詳細資訊（純文字與 HTML 共用）
+
+        Returns:
+            list: [(標題, [內容行])]，依序為去程、回程
+        """
+        names = names if names is not None else _AirportNames()
+        lines = [
+            f"出發: {flight.departure_time.replace('T', ' ')[:16]} {names[flight.departure_airport]}",
+            f"抵達: {flight.arrival_time.replace('T', ' ')[:16]} {names[flight.arrival_airport]}",
+            f"轉機: {'直飛' if flight.outbound_stops == 0 else f'{flight.outbound_stops}次'}",
+            f"飛行時間: {format_duration(flight.outbound_duration)}",
+        ]
         if flight.outbound_stops > 0:
-            transit_airports = ', '.join([get_airport_name(seg['arrival']['iataCode']) 
-                                        for seg in flight.outbound_segments[:-1]])
-            details.append(f"  轉機機場: {transit_airports}")
-        
-        # 回程資訊
-        if show_return and flight.inbound_segments:
-            first_return = flight.inbound_segments[0]
-            last_return = flight.inbound_segments[-1]
-            airline_name = flight.airline_name  # 可以從 flight 物件取得
-            
-            details.append(f"\n【回程】{airline_name}")
-            details.append(f"  出發: {first_return['departure']['at'].replace('T', ' ')[:16]} {get_airport_name(first_return['departure']['iataCode'])}")
-            details.append(f"  抵達: {last_return['arrival']['at'].replace('T', ' ')[:16]} {get_airport_name(last_return['arrival']['iataCode'])}")
-            details.append(f"  轉機: {'直飛' if flight.inbound_stops == 0 else f'{flight.inbound_stops}次'}")
-            details.append(f"  飛行時間: {format_duration(flight.inbound_duration)}")
+            lines.append(f"轉機機場: {', '.join([names[code] for code in flight.transit_airports()])}")
+        sections = [(f"【去程】{flight.airline_name} {flight.flight_number}", lines)]
 
+        if show_return and flight.inbound:
+            first_return = flight.inbound[0]
+            last_return = flight.inbound[-1]
+            lines = [
+                f"出發: {_format_time(first_return[SEG_DEP_TIME])} {names[first_return[SEG_DEP_AIRPORT]]}",
+                f"抵達: {_format_time(last_return[SEG_ARR_TIME])} {names[last_return[SEG_ARR_AIRPORT]]}",
+                f"轉機: {'直飛' if flight.inbound_stops == 0 else f'{flight.inbound_stops}次'}",
+                f"飛行時間: {format_duration(flight.inbound_duration)}",
+            ]
             if flight.inbound_stops > 0:
-                transit_airports = ', '.join([get_airport_name(seg['arrival']['iataCode']) 
-                                            for seg in flight.inbound_segments[:-1]])
-                details.append(f"  轉機機場: {transit_airports}")
-        
-        return "\n".join(details)
-    
-    def create_price_drop_email(self, last_price, new_price, filtered_flights, 
-                                max_results=5, show_return=True):
+                lines.append(f"轉機機場: {', '.join([names[code] for code in flight.transit_airports(inbound=True)])}")
+            sections.append((f"【回程】{flight.airline_name}", lines))
+
+        return sections
+
+    def _format_flight_details(self, flight, show_return=True, names=None):
+        """格式化單個航班的詳細資訊"""
+        return "\n\n".join(
+            title + "".join(f"\n  {line}" for line in lines)
+            for title, lines in self._flight_sections(flight, show_return, names)
+        )
+
+    def _format_flight_details_html(self, flight, show_return=True, names=None):
+        """格式化單個航班的詳細資訊（HTML）"""
+        return "".join(
+            f"<p><b>{escape(title)}</b></p>\n<ul>\n" + "".join(f"<li>{escape(line)}</li>\n" for line in lines) + "</ul>\n"
+            for title, lines in self._flight_sections(flight, show_return, names)
+        )
+
+    def create_price_drop_email(self, last_price, new_price, filtered_flights,
+                                max_results=5, show_return=True, html=False):
         """
         建立價格下降通知 Email
-        
+
         Args:
             last_price: 上次記錄的價格
             new_price: 目前最低價
             filtered_flights: 符合條件的航班列表 (FlightInfo 物件)
             max_results: Email 中最多顯示幾個航班選項
             show_return: 是否顯示回程資訊
-        
+            html: True 時產生 HTML 格式
+
         Returns:
             str: 格式化的 Email 內容
         """
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        price_diff = last_price - new_price
-        percentage = (price_diff / last_price) * 100
-        
-        dep_formatted = self._format_date(self.depart_date)
-        ret_formatted = self._format_date(self.return_date)
-        
-        skyscanner_url, google_flights_url = self._generate_comparison_links()
-        
-        # Email 主體
-        email_body = f"""
-🎉 機票價格下降通知！
+        context = self._context
+        price_diff, percentage = _price_change(last_price, new_price)
+        fields = {
+            "rule": RULE,
+            "last_price": last_price,
+            "new_price": new_price,
+            "price_diff": price_diff,
+            "percentage": percentage,
+            "count": min(len(filtered_flights), max_results),
+            "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        names = _AirportNames()
+        flights = filtered_flights[:max_results]
 
-═══════════════════════════════════════
-📍 航班資訊
-═══════════════════════════════════════
-出發地：{get_airport_name(self.origin)} ({self.origin})
-目的地：{get_airport_name(self.destination)} ({self.destination})
-出發日期：{dep_formatted}
-回程日期：{ret_formatted}
-乘客人數：{self.adults} 位成人
-
-═══════════════════════════════════════
-💰 價格變化
-═══════════════════════════════════════
-上次價格：NT$ {last_price:,.0f}
-目前價格：NT$ {new_price:,.0f}
-省下金額：NT$ {price_diff:,.0f} ({percentage:.1f}%)
+        if html:
+            parts = [HTML_OPEN, context["html_header"], HTML_PRICE.format_map(fields)]
+            for i, flight in enumerate(flights, 1):
+                parts.append(HTML_OPTION.format(index=i, price=flight.price))
+                parts.append(self._format_flight_details_html(flight, show_return, names))
+            parts += [context["html_links"], HTML_FOOTER.format_map(fields), HTML_CLOSE]
+            return "".join(parts)
 
-═══════════════════════════════════════
-✈️ 推薦航班（前 {min(len(filtered_flights), max_results)} 個符合條件的選項）
-═══════════════════════════════════════
-"""
-        
-        # 加入航班詳細資訊
-        for i, flight in enumerate(filtered_flights[:max_results], 1):
-            email_body += f"\n【選項 {i}】NT$ {flight.price:,.0f}\n"
-            email_body += self._format_flight_details(flight, show_return)
-            email_body += "\n" + "-"*50 + "\n"
-        
-        # 加入比價連結和提醒
-        email_body += f"""
-═══════════════════════════════════════
-🔗 立即比價
-═══════════════════════════════════════
-Skyscanner: {skyscanner_url}
+        parts = [context["text_header"], TEXT_PRICE.format_map(fields)]
+        for i, flight in enumerate(flights, 1):
+            parts.append(TEXT_OPTION.format(index=i, price=flight.price))
+            parts.append(self._format_flight_details(flight, show_return, names))
+            parts.append(f"\n{SEPARATOR}\n")
+        parts += [context["text_links"], TEXT_FOOTER.format_map(fields)]
+        return "".join(parts)
 
-Google Flights: {google_flights_url}
+    @classmethod
+    def create_digest_email(cls, alerts, max_results=3, show_return=True, html=False):
+        """
+        建立多條路線的降價摘要 Email
 
-═══════════════════════════════════════
-⏰ 通知時間：{timestamp}
+        Args:
+            alerts: 通知列表（notifier.Alert 物件，依列出順序排列）
+            max_results: 每條路線最多顯示幾個航班選項
+            show_return: 是否顯示回程資訊
+            html: True 時產生 HTML 格式
+
+        Returns:
+            str: 格式化的 Email 內容
+        """
+        fields = {"rule": RULE, "count": len(alerts), "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+        names = _AirportNames()
+        if html:
+            parts = [HTML_OPEN, HTML_DIGEST_HEADER.format_map(fields)]
+            line_template, route_template, option_template, links_template = (
+                HTML_DIGEST_LINE, HTML_DIGEST_ROUTE, HTML_OPTION, HTML_DIGEST_LINKS)
+        else:
+            parts = [TEXT_DIGEST_HEADER.format_map(fields)]
+            line_template, route_template, option_template, links_template = (
+                TEXT_DIGEST_LINE, TEXT_DIGEST_ROUTE, TEXT_OPTION, TEXT_DIGEST_LINKS)
+        sections = []
+
+        for n, alert in enumerate(alerts, 1):
+            formatter = cls(alert.origin, alert.destination, alert.depart_date, alert.return_date, alert.adults)
+            context = formatter._context
+            price_diff, percentage = _price_change(alert.last_price, alert.new_price)
+            route_fields = dict(context["html"] if html else context)
+            route_fields.update(index=n, last_price=alert.last_price, new_price=alert.new_price,
+                                price_diff=price_diff, percentage=percentage,
+                                reason=escape(alert.reason) if html else alert.reason)
+
+            parts.append(line_template.format_map(route_fields))
+            sections.append(route_template.format_map(route_fields))
+            for i, flight in enumerate(alert.flights[:max_results], 1):
+                sections.append(option_template.format(index=i, price=flight.price))
+                if html:
+                    sections.append(formatter._format_flight_details_html(flight, show_return, names))
+                else:
+                    sections.append(formatter._format_flight_details(flight, show_return, names))
+                    sections.append(f"\n{SEPARATOR}\n")
+            sections.append(links_template.format_map(route_fields))
+
+        if html:
+            parts.append("</ol>\n")
+            parts += sections
+            parts += [HTML_DIGEST_FOOTER.format_map(fields), HTML_CLOSE]
+        else:
+            parts += sections
+            parts.append(TEXT_DIGEST_FOOTER.format_map(fields))
+        return "".join(parts)
 
-💡 提醒：
-- 建議在多個平台比價後再下單
-- 注意行李、餐食等附加費用
-- 建議盡快下單，價格可能隨時變動
-- 確認航班時間是否適合您的行程
-"""
-        return email_body
-    
     def create_simple_summary(self, price, num_flights):
         """
         建立簡短的查詢摘要（用於日誌）
-        
+
         Args:
             price: 最低價格
             num_flights: 符合條件的航班數量
-        
+
         Returns:
             str: 一行摘要文字
         """
@@ -178,9 +423,9 @@ def create_flight_email(origin, destination, depart_date, return_date, adults,
                        last_price, new_price, flights, max_results=5, show_return=True):
     """
     快速建立航班價格變化通知 Email
-    
+
     這是一個便捷函數，讓你不需要先建立 EmailFormatter 物件
     """
     formatter = EmailFormatter(origin, destination, depart_date, return_date, adults)
-    return formatter.create_price_drop_email(last_price, new_price, flights, 
+    return formatter.create_price_drop_email(last_price, new_price, flights,
                                             max_results, show_return)
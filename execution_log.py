@@ -0,0 +1,139 @@
+"""
+執行記錄模組
+以 JSON Lines 格式附加寫入執行狀態，超過大小上限時輪替為 .1、.2 …
+每筆寫入都是 O(1)，並以檔案鎖確保多個程序同時寫入時不會互相覆蓋
+"""
+
+import json
+import os
+import re
+from datetime import datetime
+
+from utils import file_lock
+
+# 舊版純文字格式: [2024-01-01 08:30:00] STATUS - message
+_LEGACY_PATTERN = re.compile(r"^\[(.+?)\] (\S+)(?: - (.*))?$")
+
+_TAIL_BLOCK = 8192
+
+
+def parse_entry(line):
+    """解析一行記錄（JSON 或舊版純文字格式），無法解析時回傳 None"""
+    line = line.strip()
+    if not line:
+        return None
+    if line.startswith("{"):
+        try:
+            return json.loads(line)
+        except ValueError:
+            return None
+    match = _LEGACY_PATTERN.match(line)
+    if not match:
+        return None
+    ts, status, message = match.groups()
+    return {"ts": ts, "status": status, "message": message or ""}
+
+
+def format_entry(entry):
+    """記錄轉為易讀的單行文字"""
+    text = f"[{entry.get('ts', '')}] {entry.get('status', '')}"
+    if entry.get("route"):
+        text += f" ({entry['route']})"
+    if entry.get("message"):
+        text += f" - {entry['message']}"
+    return text
+
+
+def _tail_lines(path, n):
+    """從檔案結尾往回讀取最後 n 行（不讀取整個檔案）"""
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            pos = f.tell()
+            data = b""
+            while pos > 0 and data.count(b"\n") <= n:
+                size = min(_TAIL_BLOCK, pos)
+                pos -= size
+                f.seek(pos)
+                data = f.read(size) + data
+    except FileNotFoundError:
+        return []
+    lines = data.decode("utf-8", errors="replace").splitlines()
+    # 沒有讀到檔案開頭時，第一行可能不完整
+    if pos > 0:
+        lines = lines[1:]
+    return lines[-n:] if n > 0 else []
+
+
+class ExecutionLog:
+    """輪替式執行記錄"""
+
+    def __init__(self, path="execution.log", max_bytes=1024 * 1024, backup_count=3):
+        """
+        Args:
+            path: 記錄檔路徑
+            max_bytes: 記錄檔超過此大小就輪替
+            backup_count: 保留幾個輪替後的舊檔（path.1 ~ path.N）
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = max(0, backup_count)
+        self.lock_path = path + ".lock"
+
+    def write(self, status, message="", **fields):
+        """
+        附加一筆記錄
+
+        Args:
+            status: 狀態（START、SUCCESS、ERROR …）
+            message: 說明文字
+            fields: 其他欄位（例如 route）
+        """
+        entry = {"ts": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "status": status}
+        if message:
+            entry["message"] = message
+        entry.update((k, v) for k, v in fields.items() if v is not None)
+        entry["pid"] = os.getpid()
+        line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+
+        try:
+            with file_lock(self.lock_path):
+                self._rotate_if_needed(len(line))
+                with open(self.path, "ab") as f:
+                    f.write(line)
+        except Exception as e:
+            print(f"⚠️ 寫入執行記錄失敗: {e}")
+
+    def _rotate_if_needed(self, incoming):
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return
+        if size + incoming <= self.max_bytes:
+            return
+
+        if self.backup_count == 0:
+            os.remove(self.path)
+            return
+        for i in range(self.backup_count - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    def tail(self, n=20):
+        """
+        最近的 n 筆記錄（由舊到新），目前檔案不足時會接著讀取輪替的舊檔
+
+        Returns:
+            list: 記錄 dict 列表
+        """
+        entries = []
+        paths = [self.path] + [f"{self.path}.{i}" for i in range(1, self.backup_count + 1)]
+        for path in paths:
+            need = n - len(entries)
+            if need <= 0:
+                break
+            parsed = [e for e in (parse_entry(line) for line in _tail_lines(path, need)) if e]
+            entries = parsed + entries
+        return entries[-n:] if n > 0 else []
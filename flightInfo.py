@@ -1,112 +1,238 @@
-from utils import parse_duration, format_duration, get_airline_name, get_airport_name, get_time_period
+import hashlib
+import sys
+from datetime import datetime, timezone
+from decimal import Decimal
+from utils import (parse_duration_minutes, minutes_to_hours, format_duration,
+                   get_airline_name, get_airport_name, period_of_hour)
+from rules import PreferenceRule
+
+# 航段欄位索引：(航空公司, 航班號碼, 出發機場, 出發時間, 抵達機場, 抵達時間)
+# 時間以當地時間（不含時區）換算的 epoch 秒數儲存
+SEG_CARRIER, SEG_NUMBER, SEG_DEP_AIRPORT, SEG_DEP_TIME, SEG_ARR_AIRPORT, SEG_ARR_TIME = range(6)
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _to_epoch(at):
+    """將 "2024-01-01T08:30:00" 轉為 epoch 秒數（視為當地時間，不做時區換算，時區標記會被忽略）"""
+    return int((datetime.fromisoformat(at).replace(tzinfo=None) - _EPOCH).total_seconds())
+
+
+def _to_iso(epoch):
+    """epoch 秒數轉回 "2024-01-01T08:30:00" 格式"""
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def _compact_segments(segments):
+    """將 API 的航段資料轉為精簡的 tuple（代碼字串 intern，所有航班共用同一份）"""
+    return tuple(
+        (sys.intern(seg["carrierCode"]), seg["number"],
+         sys.intern(seg["departure"]["iataCode"]), _to_epoch(seg["departure"]["at"]),
+         sys.intern(seg["arrival"]["iataCode"]), _to_epoch(seg["arrival"]["at"]))
+        for seg in segments
+    )
+
+
+def _segment_dict(seg):
+    """精簡航段還原為 API 格式的 dict"""
+    return {
+        "carrierCode": seg[SEG_CARRIER],
+        "number": seg[SEG_NUMBER],
+        "departure": {"iataCode": seg[SEG_DEP_AIRPORT], "at": _to_iso(seg[SEG_DEP_TIME])},
+        "arrival": {"iataCode": seg[SEG_ARR_AIRPORT], "at": _to_iso(seg[SEG_ARR_TIME])}
+    }
+
+
 class FlightInfo:
-    """航班資訊類別"""
+    """航班資訊類別（只保留必要欄位，顯示用資料在需要時才計算）"""
+
+    __slots__ = (
+        "price_minor", "currency",
+        "outbound", "outbound_stops", "outbound_minutes",
+        "inbound", "inbound_stops", "inbound_minutes",
+        "departure_hour", "arrival_hour",
+        "_airline_name"
+    )
+
     def __init__(self, offer_data):
-        self.raw_data = offer_data
-        self.price = float(offer_data["price"]["total"])
-        self.currency = offer_data["price"]["currency"]
-        
+        # 價格以最小貨幣單位（分）儲存
+        self.price_minor = int((Decimal(offer_data["price"]["total"]) * 100).to_integral_value())
+        self.currency = sys.intern(offer_data["price"]["currency"])
+
         # 去程資訊
         outbound = offer_data["itineraries"][0]
-        self.outbound_segments = outbound["segments"]
-        self.outbound_stops = len(self.outbound_segments) - 1
-        self.outbound_duration = parse_duration(outbound["duration"])
-        
+        self.outbound = _compact_segments(outbound["segments"])
+        self.outbound_stops = len(self.outbound) - 1
+        self.outbound_minutes = parse_duration_minutes(outbound["duration"])
+
         # 回程資訊
         if len(offer_data["itineraries"]) > 1:
             inbound = offer_data["itineraries"][1]
-            self.inbound_segments = inbound["segments"]
-            self.inbound_stops = len(self.inbound_segments) - 1
-            self.inbound_duration = parse_duration(inbound["duration"])
+            self.inbound = _compact_segments(inbound["segments"])
+            self.inbound_stops = len(self.inbound) - 1
+            self.inbound_minutes = parse_duration_minutes(inbound["duration"])
         else:
-            self.inbound_segments = []
+            self.inbound = ()
             self.inbound_stops = 0
-            self.inbound_duration = 0
-        
+            self.inbound_minutes = 0
+
+        # 出發/抵達時段只需要小時
+        self.departure_hour = self.outbound[0][SEG_DEP_TIME] // 3600 % 24
+        self.arrival_hour = self.outbound[-1][SEG_ARR_TIME] // 3600 % 24
+
+        self._airline_name = None
+
+    # ===== 相容舊版的屬性 =====
+
+    @property
+    def price(self):
+        return self.price_minor / 100
+
+    @property
+    def airline_code(self):
         # 主要航空公司（去程第一段）
-        first_segment = self.outbound_segments[0]
-        self.airline_code = first_segment["carrierCode"]
-        self.airline_name = get_airline_name(self.airline_code)
-        self.flight_number = first_segment["number"]
-        
-        # 出發/抵達資訊
-        self.departure_time = first_segment["departure"]["at"]
-        self.departure_airport = first_segment["departure"]["iataCode"]
-        
-        last_segment = self.outbound_segments[-1]
-        self.arrival_time = last_segment["arrival"]["at"]
-        self.arrival_airport = last_segment["arrival"]["iataCode"]
-        
-        # 時段
-        self.departure_period = get_time_period(self.departure_time)
-        self.arrival_period = get_time_period(self.arrival_time)
-    
+        return self.outbound[0][SEG_CARRIER]
+
+    @property
+    def airline_name(self):
+        if self._airline_name is None:
+            self._airline_name = get_airline_name(self.airline_code)
+        return self._airline_name
+
+    @property
+    def flight_number(self):
+        return self.outbound[0][SEG_NUMBER]
+
+    @property
+    def departure_time(self):
+        return _to_iso(self.outbound[0][SEG_DEP_TIME])
+
+    @property
+    def departure_airport(self):
+        return self.outbound[0][SEG_DEP_AIRPORT]
+
+    @property
+    def arrival_time(self):
+        return _to_iso(self.outbound[-1][SEG_ARR_TIME])
+
+    @property
+    def arrival_airport(self):
+        return self.outbound[-1][SEG_ARR_AIRPORT]
+
+    @property
+    def departure_period(self):
+        return period_of_hour(self.departure_hour)
+
+    @property
+    def arrival_period(self):
+        return period_of_hour(self.arrival_hour)
+
+    @property
+    def outbound_duration(self):
+        return minutes_to_hours(self.outbound_minutes)
+
+    @property
+    def inbound_duration(self):
+        return minutes_to_hours(self.inbound_minutes)
+
+    @property
+    def outbound_segments(self):
+        return [_segment_dict(seg) for seg in self.outbound]
+
+    @property
+    def inbound_segments(self):
+        return [_segment_dict(seg) for seg in self.inbound]
+
+    def itinerary_key(self):
+        """行程識別字串（航空公司、航班號碼與起降時間，不含票價）"""
+        return "|".join(
+            f"{seg[SEG_CARRIER]}{seg[SEG_NUMBER]}@{seg[SEG_DEP_TIME]}-{seg[SEG_ARR_TIME]}"
+            for seg in self.outbound + self.inbound
+        )
+
+    def offer_id(self):
+        """航班識別碼（只依行程，不含票價），用於比對前後兩次查詢的同一航班"""
+        return hashlib.sha1(self.itinerary_key().encode("utf-8")).hexdigest()[:16]
+
+    def fingerprint(self):
+        """航班指紋（行程 + 票價），相同航班相同價格時不變"""
+        raw = f"{self.itinerary_key()}#{self.price_minor}{self.currency}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+    def transit_airports(self, inbound=False):
+        """轉機機場代碼列表"""
+        segments = self.inbound if inbound else self.outbound
+        return [seg[SEG_ARR_AIRPORT] for seg in segments[:-1]]
+
     def matches_preferences(self, preferences):
-        """檢查是否符合使用者偏好"""
+        """檢查是否符合使用者偏好（preferences 為 dict 或 rules.PreferenceRule）"""
+        if isinstance(preferences, PreferenceRule):
+            return preferences.matches(self)
+
         # 檢查轉機次數
         max_stops = preferences.get("max_stops")
         if max_stops is not None and self.outbound_stops > max_stops:
             return False
-        
+
         # 檢查航空公司偏好
         preferred = preferences.get("preferred_airlines", [])
         if preferred and self.airline_code not in preferred:
             return False
-        
+
         excluded = preferences.get("excluded_airlines", [])
         if excluded and self.airline_code in excluded:
             return False
-        
+
         # 檢查飛行時間
         max_duration = preferences.get("max_duration_hours")
         if max_duration is not None and self.outbound_duration > max_duration:
             return False
-        
+
         # 檢查出發時段
         dep_pref = preferences.get("departure_time_preference", "any")
         if dep_pref != "any" and self.departure_period != dep_pref:
             return False
-        
+
         # 檢查抵達時段
         arr_pref = preferences.get("arrival_time_preference", "any")
         if arr_pref != "any" and self.arrival_period != arr_pref:
             return False
-        
+
         return True
-    
+
     def get_summary(self):
         """取得航班摘要"""
         stops_text = "直飛" if self.outbound_stops == 0 else f"{self.outbound_stops}次轉機"
         dep_time = self.departure_time.split('T')[1][:5]
         arr_time = self.arrival_time.split('T')[1][:5]
-        
+
         return f"{self.airline_name} {self.flight_number} | {stops_text} | {dep_time}→{arr_time} | {format_duration(self.outbound_duration)}"
-    
+
     def get_detailed_info(self, show_return=True):
         """取得詳細航班資訊"""
         info = []
-        
+
         # 去程資訊
         info.append(f"【去程】{self.airline_name} {self.flight_number}")
         info.append(f"  出發: {self.departure_time.replace('T', ' ')[:16]} {get_airport_name(self.departure_airport)}")
         info.append(f"  抵達: {self.arrival_time.replace('T', ' ')[:16]} {get_airport_name(self.arrival_airport)}")
         info.append(f"  轉機: {'直飛' if self.outbound_stops == 0 else f'{self.outbound_stops}次'}")
         info.append(f"  飛行時間: {format_duration(self.outbound_duration)}")
-        
+
         if self.outbound_stops > 0:
-            info.append(f"  轉機機場: {', '.join([get_airport_name(seg['arrival']['iataCode']) for seg in self.outbound_segments[:-1]])}")
-        
+            info.append(f"  轉機機場: {', '.join([get_airport_name(code) for code in self.transit_airports()])}")
+
         # 回程資訊
-        if show_return and self.inbound_segments:
-            first_return = self.inbound_segments[0]
-            last_return = self.inbound_segments[-1]
-            info.append(f"\n【回程】{get_airline_name(first_return['carrierCode'])} {first_return['number']}")
-            info.append(f"  出發: {first_return['departure']['at'].replace('T', ' ')[:16]} {get_airport_name(first_return['departure']['iataCode'])}")
-            info.append(f"  抵達: {last_return['arrival']['at'].replace('T', ' ')[:16]} {get_airport_name(last_return['arrival']['iataCode'])}")
+        if show_return and self.inbound:
+            first_return = self.inbound[0]
+            last_return = self.inbound[-1]
+            info.append(f"\n【回程】{get_airline_name(first_return[SEG_CARRIER])} {first_return[SEG_NUMBER]}")
+            info.append(f"  出發: {_to_iso(first_return[SEG_DEP_TIME]).replace('T', ' ')[:16]} {get_airport_name(first_return[SEG_DEP_AIRPORT])}")
+            info.append(f"  抵達: {_to_iso(last_return[SEG_ARR_TIME]).replace('T', ' ')[:16]} {get_airport_name(last_return[SEG_ARR_AIRPORT])}")
             info.append(f"  轉機: {'直飛' if self.inbound_stops == 0 else f'{self.inbound_stops}次'}")
             info.append(f"  飛行時間: {format_duration(self.inbound_duration)}")
-            
+
             if self.inbound_stops > 0:
-                info.append(f"  轉機機場: {', '.join([get_airport_name(seg['arrival']['iataCode']) for seg in self.inbound_segments[:-1]])}")
-        
-        return "\n".join(info)
\ No newline at end of file
+                info.append(f"  轉機機場: {', '.join([get_airport_name(code) for code in self.transit_airports(inbound=True)])}")
+
+        return "\n".join(info)
@@ -0,0 +1,194 @@
+"""
+價格歷史資料庫模組
+以 SQLite（WAL 模式）記錄每次查詢結果，並保存每條路線的比較基準價格與上次的航班快照
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS observations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    route TEXT NOT NULL,
+    origin TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    depart_date TEXT NOT NULL,
+    return_date TEXT NOT NULL,
+    observed_at REAL NOT NULL,
+    min_price REAL NOT NULL,
+    offer_count INTEGER NOT NULL,
+    top_offers TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_observations_route_time ON observations (route, observed_at);
+
+CREATE TABLE IF NOT EXISTS route_state (
+    route TEXT PRIMARY KEY,
+    last_price REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS notification_state (
+    route TEXT NOT NULL,
+    recipient TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    price REAL NOT NULL,
+    sent_at REAL NOT NULL,
+    PRIMARY KEY (route, recipient)
+);
+
+CREATE TABLE IF NOT EXISTS offer_snapshots (
+    route TEXT PRIMARY KEY,
+    offers TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+class HistoryStore:
+    """價格歷史資料庫"""
+
+    def __init__(self, db_path="flight_history.db", batch_size=20):
+        """
+        Args:
+            db_path: SQLite 資料庫檔案路徑
+            batch_size: 累積幾筆查詢記錄後一次寫入
+        """
+        self.db_path = db_path
+        self.batch_size = max(1, batch_size)
+        self._pending = []
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def record(self, route, origin, destination, depart_date, return_date,
+               min_price, offer_count, top_offers=None, observed_at=None):
+        """
+        記錄一次查詢結果（累積到 batch_size 筆才實際寫入）
+
+        Args:
+            route: 路線識別字串
+            top_offers: 最便宜的幾個航班摘要（list of dict），None 表示不記錄（航班與上次相同時）
+        """
+        row = (
+            route, origin, destination, depart_date, return_date,
+            observed_at or time.time(), min_price, offer_count,
+            None if top_offers is None else json.dumps(top_offers, ensure_ascii=False)
+        )
+        with self._lock:
+            self._pending.append(row)
+            if len(self._pending) >= self.batch_size:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO observations (route, origin, destination, depart_date, return_date, "
+                "observed_at, min_price, offer_count, top_offers) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                self._pending
+            )
+        self._pending = []
+
+    def flush(self):
+        """寫入所有尚未寫入的查詢記錄"""
+        with self._lock:
+            self._flush_locked()
+
+    def get_last_price(self, route):
+        """取得路線的比較基準價格（上次通知或首次記錄的價格），沒有記錄時回傳 None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_price FROM route_state WHERE route = ?", (route,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_last_price(self, route, price):
+        """更新路線的比較基準價格"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO route_state (route, last_price, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(route) DO UPDATE SET last_price = excluded.last_price, updated_at = excluded.updated_at",
+                (route, price, time.time())
+            )
+
+    def import_last_prices(self, prices):
+        """匯入舊版的比較基準價格 {路線: 價格}，已有記錄的路線不覆寫，回傳實際匯入的筆數"""
+        now = time.time()
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO route_state (route, last_price, updated_at) VALUES (?, ?, ?)",
+                [(route, price, now) for route, price in prices.items()]
+            )
+            return self._conn.total_changes - before
+
+    def last_notification(self, route, recipient):
+        """路線上次寄給此收件人的通知，回傳 (航班指紋, 價格, 寄出時間) 或 None"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT fingerprint, price, sent_at FROM notification_state WHERE route = ? AND recipient = ?",
+                (route, recipient)
+            ).fetchone()
+
+    def record_notification(self, route, recipient, fingerprint, price, sent_at=None):
+        """記錄已寄出的通知（用於重複通知的判斷）"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO notification_state (route, recipient, fingerprint, price, sent_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(route, recipient) DO UPDATE SET fingerprint = excluded.fingerprint, "
+                "price = excluded.price, sent_at = excluded.sent_at",
+                (route, recipient, fingerprint, price, sent_at or time.time())
+            )
+
+    def get_snapshot(self, route):
+        """路線上次的航班快照 {航班識別碼: 票價（最小貨幣單位）}，沒有記錄時回傳 None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT offers FROM offer_snapshots WHERE route = ?", (route,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_snapshot(self, route, offers):
+        """更新路線的航班快照"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO offer_snapshots (route, offers, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(route) DO UPDATE SET offers = excluded.offers, updated_at = excluded.updated_at",
+                (route, json.dumps(offers, separators=(",", ":")), time.time())
+            )
+
+    def min_price(self, route, days=7):
+        """路線在最近 N 天內的最低價，沒有記錄時回傳 None"""
+        with self._lock:
+            self._flush_locked()
+            row = self._conn.execute(
+                "SELECT MIN(min_price) FROM observations WHERE route = ? AND observed_at >= ?",
+                (route, time.time() - days * 86400)
+            ).fetchone()
+        return row[0]
+
+    def price_history(self, route, days=7):
+        """路線在最近 N 天內的價格記錄，回傳 [(時間戳記, 最低價), ...]（由舊到新）"""
+        with self._lock:
+            self._flush_locked()
+            return self._conn.execute(
+                "SELECT observed_at, min_price FROM observations WHERE route = ? AND observed_at >= ? "
+                "ORDER BY observed_at",
+                (route, time.time() - days * 86400)
+            ).fetchall()
+
+    def close(self):
+        """寫入剩餘記錄並關閉資料庫"""
+        with self._lock:
+            if self._conn is None:
+                return
+            self._flush_locked()
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,142 @@
+"""
+HTTP 連線模組
+所有 Amadeus API 呼叫共用的連線池，支援 keep-alive、逾時設定、限流與自動重試
+"""
+
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+from rate_limiter import parse_retry_after
+
+
+class HttpClient:
+    """共用 HTTP 連線（連線池 + 重試 + 指數退避）"""
+
+    def __init__(self, connect_timeout=5, read_timeout=15, max_retries=3,
+                 backoff_base=0.5, backoff_max=8, pool_size=10,
+                 rate_limiter=None, max_rate_limit_retries=5, metrics=None):
+        """
+        Args:
+            connect_timeout: 建立連線的逾時秒數
+            read_timeout: 讀取回應的逾時秒數
+            max_retries: 5xx 或連線錯誤時最多重試幾次
+            backoff_base: 第一次重試的等待秒數上限（之後每次加倍）
+            backoff_max: 單次重試等待秒數的上限
+            pool_size: 每個主機保留的 keep-alive 連線數
+            rate_limiter: RateLimiter 物件，每個請求送出前都會先取得配額
+            max_rate_limit_retries: 收到 429 時最多重試幾次
+            metrics: Metrics 物件，記錄每個請求的狀態碼與重試次數
+        """
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rate_limiter = rate_limiter
+        self.max_rate_limit_retries = max_rate_limit_retries
+        self.metrics = metrics
+        self.pool_size = pool_size
+
+        # requests 在第一個請求時才載入（只讀取記錄或快取時不需要）
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=0)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    session.headers.update({
+                        "Accept-Encoding": "gzip, deflate",
+                        "Connection": "keep-alive"
+                    })
+                    self._session = session
+        return self._session
+
+    def _backoff(self, attempt):
+        """計算第 attempt 次重試的等待時間（full jitter）"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _count(self, name, **labels):
+        if self.metrics:
+            self.metrics.inc(name, **labels)
+
+    def request(self, method, url, **kwargs):
+        """
+        送出請求，遇到 5xx 或連線錯誤時自動重試，遇到 429 時依 Retry-After 等待後重試
+
+        Returns:
+            requests.Response: 最後一次的回應（重試用盡仍失敗時回傳最後的 5xx / 429 回應）
+
+        Raises:
+            requests.ConnectionError / requests.Timeout: 重試用盡仍無法連線
+        """
+        import requests
+
+        kwargs.setdefault("timeout", self.timeout)
+        endpoint = urlparse(url).path
+        attempt = 0
+        throttled = 0
+
+        while True:
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._count("flight_monitor_api_requests_total", endpoint=endpoint, status="error")
+                if attempt >= self.max_retries:
+                    raise
+                self._count("flight_monitor_api_retries_total", endpoint=endpoint, reason="connection")
+                wait = self._backoff(attempt)
+                attempt += 1
+                print(f"⚠️ 連線失敗，{wait:.1f} 秒後重試 ({attempt}/{self.max_retries}): {e}")
+                time.sleep(wait)
+                continue
+
+            self._count("flight_monitor_api_requests_total", endpoint=endpoint, status=response.status_code)
+
+            if response.status_code == 429 and throttled < self.max_rate_limit_retries:
+                wait = parse_retry_after(response.headers.get("Retry-After"))
+                if wait is None:
+                    wait = self._backoff(throttled)
+                throttled += 1
+                self._count("flight_monitor_api_retries_total", endpoint=endpoint, reason="429")
+                print(f"⚠️ 超過 API 流量限制 (狀態碼: 429)，{wait:.1f} 秒後重試 ({throttled}/{self.max_rate_limit_retries})")
+                response.close()
+                if self.rate_limiter:
+                    self.rate_limiter.block_for(wait)
+                else:
+                    time.sleep(wait)
+                continue
+
+            if response.status_code >= 500 and attempt < self.max_retries:
+                wait = self._backoff(attempt)
+                attempt += 1
+                self._count("flight_monitor_api_retries_total", endpoint=endpoint, reason="5xx")
+                print(f"⚠️ 伺服器錯誤 (狀態碼: {response.status_code})，{wait:.1f} 秒後重試 ({attempt}/{self.max_retries})")
+                response.close()
+                time.sleep(wait)
+                continue
+
+            return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def close(self):
+        """關閉所有連線"""
+        if self._session is not None:
+            self._session.close()
@@ -0,0 +1,60 @@
+"""
+舊版價格記錄轉移模組
+將舊版的 last_price*.txt 價格記錄匯入價格歷史資料庫（python main.py --migrate-state [目錄]）
+只需在升級後執行一次，轉移完成的檔案會改名為 *.migrated
+"""
+
+import os
+import re
+
+from history_store import HistoryStore
+from utils import route_key
+
+
+def _safe_name(name):
+    return re.sub(r'[^A-Za-z0-9_-]', '_', name)
+
+
+def legacy_price_files(config, state_dir="state"):
+    """依設定檔列出舊版價格記錄檔 {路線識別字串: 檔案路徑}"""
+    files = {}
+    search_params = config['search_params']
+    default_route = route_key(search_params['originLocationCode'], search_params['destinationLocationCode'],
+                              search_params['departureDate'], search_params['returnDate'])
+    files[default_route] = config['files'].get('last_price_file', 'last_price.txt')
+
+    for route in (config.get('watchlist') or {}).get('routes') or []:
+        key = route_key(route['originLocationCode'], route['destinationLocationCode'],
+                        route['departureDate'], route['returnDate'])
+        files[key] = os.path.join(state_dir, f"last_price_{_safe_name(key)}.txt")
+
+    for entry in (config.get('subscriptions') or {}).get('subscribers') or []:
+        files[f"sub:{entry['name']}"] = os.path.join(state_dir, f"last_price_sub_{_safe_name(entry['name'])}.txt")
+    return files
+
+
+def migrate_legacy_state(config, state_dir="state"):
+    """將舊版價格記錄匯入資料庫，回傳匯入的筆數"""
+    prices = {}
+    migrated = []
+    for route, path in legacy_price_files(config, state_dir).items():
+        if not os.path.exists(path):
+            continue
+        try:
+            with open(path, "r") as f:
+                prices[route] = float(f.read().strip())
+            migrated.append(path)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ 無法讀取舊版價格記錄 {path}: {e}")
+
+    if not prices:
+        print("ℹ️ 沒有需要轉移的舊版價格記錄")
+        return 0
+
+    store = HistoryStore(config['files'].get('history_db_file', 'flight_history.db'))
+    imported = store.import_last_prices(prices)
+    store.close()
+    for path in migrated:
+        os.replace(path, path + ".migrated")
+    print(f"✅ 已轉移 {imported} 筆舊版價格記錄（{len(prices) - imported} 筆路線已有記錄，保留資料庫中的價格）")
+    return imported
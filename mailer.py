@@ -1,24 +1,352 @@
+"""
+Email 發送模組
+以背景執行緒依序寄出佇列中的郵件，共用同一個已登入的 SMTP 連線，
+失敗時以指數退避重試，並限制寄給同一收件人的頻率
+"""
+
+import atexit
+import heapq
+import itertools
+import os
+import queue
+import random
 import smtplib
+import threading
+import time
+from concurrent.futures import Future
+from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 
-def send_email(body):
-    """發送 Email"""
-    sender = "@gmail.com"
-    receiver = "@gmail.com"
-    app_password = "" # Gmail 應用程式密碼
-    subject = "✈️ 機票價格通知"
+from app_config import config
+
+EMAIL_SETTINGS = config.get('email') or {}
+
+_STOP = object()
+
+
+class SmtpConnection:
+    """可重複使用的 SMTP 連線（第一次寄信時才連線並登入，閒置過久自動關閉）"""
+
+    def __init__(self, host, port, use_ssl=True, username=None, password=None,
+                 timeout=30, idle_timeout=60):
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.connects = 0
+        self._server = None
+        self._last_used = 0
+
+    def _connect(self):
+        if self.use_ssl:
+            server = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            server.ehlo()
+            if server.has_extn("starttls"):
+                server.starttls()
+                server.ehlo()
+        if self.username:
+            server.login(self.username, self.password)
+        self.connects += 1
+        return server
+
+    def send(self, msg):
+        """寄出一封郵件（連線已被伺服器關閉時重新連線一次）"""
+        if self._server is not None and time.time() - self._last_used > self.idle_timeout:
+            self.close()
+        if self._server is None:
+            self._server = self._connect()
+            self._last_used = time.time()
+        try:
+            self._server.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            self._server = self._connect()
+            self._server.send_message(msg)
+        self._last_used = time.time()
+
+    def close_if_idle(self):
+        if self._server is not None and time.time() - self._last_used > self.idle_timeout:
+            self.close()
+
+    def close(self):
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except Exception:
+            pass
+        self._server = None
+
+
+class _Job:
+    __slots__ = ("msg", "recipients", "future", "attempt")
+
+    def __init__(self, msg, recipients, future):
+        self.msg = msg
+        self.recipients = recipients
+        self.future = future
+        self.attempt = 0
+
+
+class MailQueue:
+    """背景寄信佇列"""
+
+    def __init__(self, connection, sender, max_retries=3, backoff_seconds=2, backoff_max=60,
+                 per_recipient_interval=0, queue_size=100, metrics=None, shutdown_timeout=10):
+        """
+        Args:
+            connection: SmtpConnection 物件
+            sender: 寄件人
+            max_retries: 寄送失敗時最多重試幾次
+            backoff_seconds: 第一次重試的等待秒數上限（之後每次加倍）
+            per_recipient_interval: 寄給同一收件人的最短間隔秒數（0 表示不限制，太快的郵件會延後寄出）
+            queue_size: 等待寄出的郵件數量上限
+            metrics: Metrics 物件，記錄每封郵件的寄送耗時
+            shutdown_timeout: 關閉時最多等待幾秒寄完剩餘的郵件（逾時未寄出的郵件會被捨棄）
+        """
+        self.connection = connection
+        self.sender = sender
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.backoff_max = backoff_max
+        self.per_recipient_interval = per_recipient_interval
+        self.metrics = metrics
+        self.shutdown_timeout = shutdown_timeout
+        self.sent = 0
+        self.failed = 0
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        # 等待重試或受收件人頻率限制而延後的郵件: (可寄出時間, 序號, job)
+        self._delayed = []
+        self._seq = itertools.count()
+        self._last_sent = {}
+        self._pending = 0
+        self._idle = threading.Condition()
+        self._closed = False
+        # 關閉逾時後不再寄出，剩餘的郵件直接以失敗結束
+        self._abort = False
+        self._thread = threading.Thread(target=self._worker, name="mail-queue", daemon=True)
+        self._thread.start()
+
+    def submit(self, body, subject, recipients, html=None):
+        """
+        加入一封待寄郵件
+
+        Args:
+            body: 純文字內容
+            html: HTML 內容（有提供時以 multipart/alternative 寄出，收件軟體自行選擇顯示的格式）
+
+        Returns:
+            Future: 寄出後結果為 True，重試用盡後為寄送失敗的例外（沒有收件人時立即失敗）
+        """
+        future = Future()
+        if self._closed:
+            future.set_exception(RuntimeError("寄信佇列已關閉"))
+            return future
+        if not recipients:
+            future.set_exception(ValueError("沒有收件人，請在 config.yaml 的 email.recipients 設定收件人"))
+            return future
+
+        if html:
+            msg = MIMEMultipart('alternative')
+            msg.attach(MIMEText(body, 'plain', 'utf-8'))
+            msg.attach(MIMEText(html, 'html', 'utf-8'))
+        else:
+            msg = MIMEText(body, 'plain', 'utf-8')
+        msg["Subject"] = subject
+        msg["From"] = self.sender
+        msg["To"] = ", ".join(recipients)
+
+        with self._idle:
+            self._pending += 1
+        self._queue.put(_Job(msg, list(recipients), future))
+        return future
+
+    def _finish(self, job, error=None):
+        if error is None:
+            self.sent += 1
+            job.future.set_result(True)
+        else:
+            self.failed += 1
+            job.future.set_exception(error)
+        with self._idle:
+            self._pending -= 1
+            self._idle.notify_all()
 
-    msg = MIMEText(body, 'plain', 'utf-8')
-    msg["Subject"] = subject
-    msg["From"] = sender
-    msg["To"] = receiver
+    def _rate_limited_until(self, job):
+        if not self.per_recipient_interval:
+            return 0
+        return max((self._last_sent.get(r, 0) + self.per_recipient_interval for r in job.recipients), default=0)
 
+    def _next_job(self):
+        """取得下一個可寄出的郵件（延後的郵件到期前最多等到到期時間）"""
+        while True:
+            now = time.time()
+            if self._delayed and (self._abort or self._delayed[0][0] <= now):
+                return heapq.heappop(self._delayed)[2]
+            timeout = self._delayed[0][0] - now if self._delayed else self.connection.idle_timeout
+            try:
+                return self._queue.get(timeout=max(0.05, timeout))
+            except queue.Empty:
+                self.connection.close_if_idle()
+
+    def _delay(self, job, until):
+        heapq.heappush(self._delayed, (until, next(self._seq), job))
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            if job is _STOP:
+                if self._delayed and not self._abort:
+                    # 還有延後的郵件，寄完再結束
+                    self._queue.put(_STOP)
+                    time.sleep(min(0.5, max(0.05, self._delayed[0][0] - time.time())))
+                    continue
+                while self._delayed:
+                    self._finish(heapq.heappop(self._delayed)[2], RuntimeError("程序結束前未寄出，已捨棄"))
+                self.connection.close()
+                return
+
+            if self._abort:
+                self._finish(job, RuntimeError("程序結束前未寄出，已捨棄"))
+                continue
+
+            until = self._rate_limited_until(job)
+            if until > time.time():
+                self._delay(job, until)
+                continue
+
+            start = time.perf_counter()
+            try:
+                self.connection.send(job.msg)
+            except (smtplib.SMTPException, OSError) as e:
+                # 伺服器有回應錯誤碼時連線仍可使用，其他錯誤則重新連線
+                if not isinstance(e, smtplib.SMTPResponseException):
+                    self.connection.close()
+                # 認證失敗或收件人被拒絕時重試也不會成功
+                permanent = isinstance(e, (smtplib.SMTPAuthenticationError, smtplib.SMTPRecipientsRefused))
+                if permanent or job.attempt >= self.max_retries:
+                    print(f"❌ 郵件發送失敗: {e}")
+                    self._finish(job, e)
+                    continue
+                wait = random.uniform(0, min(self.backoff_max, self.backoff_seconds * (2 ** job.attempt)))
+                job.attempt += 1
+                print(f"⚠️ 郵件發送失敗，{wait:.1f} 秒後重試 ({job.attempt}/{self.max_retries}): {e}")
+                self._delay(job, time.time() + wait)
+                continue
+            except Exception as e:
+                print(f"❌ 郵件發送失敗: {e}")
+                self._finish(job, e)
+                continue
+
+            if self.metrics:
+                self.metrics.observe("flight_monitor_phase_seconds", time.perf_counter() - start, phase="smtp")
+            now = time.time()
+            for recipient in job.recipients:
+                self._last_sent[recipient] = now
+            self._finish(job)
+
+    def flush(self, timeout=None):
+        """等待佇列中的郵件全部寄出（或重試用盡），逾時回傳 False"""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def close(self, timeout=None):
+        """
+        寄完剩餘的郵件後關閉連線（可重複呼叫）
+
+        Args:
+            timeout: 最多等待幾秒（None 表示使用 shutdown_timeout），逾時未寄出的郵件會被捨棄
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if timeout is None:
+            timeout = self.shutdown_timeout
+        # 等待寄完與結束背景執行緒共用同一個期限
+        deadline = time.monotonic() + timeout
+        if not self.flush(timeout):
+            print(f"⚠️ 寄信佇列在 {timeout} 秒內未寄完，捨棄 {self._pending} 封未寄出的郵件")
+            self._abort = True
+        self._queue.put(_STOP)
+        self._thread.join(max(0, deadline - time.monotonic()))
+
+
+_MAIL_QUEUE = None
+_MAIL_QUEUE_LOCK = threading.Lock()
+
+
+def resolve_recipients(recipients=None):
+    """收件人列表（未指定時使用 config.yaml 的 email.recipients）"""
+    if not recipients:
+        recipients = EMAIL_SETTINGS.get('recipients') or []
+    if isinstance(recipients, str):
+        recipients = [recipients]
+    # 略過空白的收件人
+    return [r for r in recipients if r and r.strip()]
+
+
+def get_mail_queue(metrics=None):
+    """取得共用的寄信佇列（第一次呼叫時依 config.yaml 的 email 設定建立）"""
+    global _MAIL_QUEUE
+    with _MAIL_QUEUE_LOCK:
+        if _MAIL_QUEUE is None:
+            sender = EMAIL_SETTINGS.get('sender', '')
+            connection = SmtpConnection(
+                EMAIL_SETTINGS.get('smtp_host', 'smtp.gmail.com'),
+                EMAIL_SETTINGS.get('smtp_port', 465),
+                use_ssl=EMAIL_SETTINGS.get('use_ssl', True),
+                username=EMAIL_SETTINGS.get('username') or sender,
+                # 密碼也可以用環境變數提供，避免寫在設定檔
+                password=EMAIL_SETTINGS.get('password') or os.environ.get('FLIGHT_MONITOR_SMTP_PASSWORD', ''),
+                timeout=EMAIL_SETTINGS.get('timeout_seconds', 30),
+                idle_timeout=EMAIL_SETTINGS.get('idle_timeout_seconds', 60)
+            )
+            _MAIL_QUEUE = MailQueue(
+                connection,
+                sender,
+                max_retries=EMAIL_SETTINGS.get('max_retries', 3),
+                backoff_seconds=EMAIL_SETTINGS.get('backoff_seconds', 2),
+                per_recipient_interval=EMAIL_SETTINGS.get('per_recipient_interval_seconds', 0),
+                queue_size=EMAIL_SETTINGS.get('queue_size', 100),
+                metrics=metrics,
+                shutdown_timeout=EMAIL_SETTINGS.get('shutdown_timeout_seconds', 10)
+            )
+            # 程序結束前寄完佇列中的郵件（最多等待 shutdown_timeout 秒）
+            atexit.register(_MAIL_QUEUE.close)
+        elif metrics is not None and _MAIL_QUEUE.metrics is None:
+            _MAIL_QUEUE.metrics = metrics
+        return _MAIL_QUEUE
+
+
+def queue_email(body, subject=None, recipients=None, metrics=None, html=None):
+    """
+    將郵件加入寄信佇列後立即返回（由背景執行緒寄出）
+
+    Args:
+        html: HTML 內容（與純文字內容一起以 multipart 寄出）
+
+    Returns:
+        Future: 寄出後結果為 True，失敗時為例外
+    """
+    return get_mail_queue(metrics).submit(
+        body,
+        subject or EMAIL_SETTINGS.get('subject', "✈️ 機票價格通知"),
+        resolve_recipients(recipients),
+        html
+    )
+
+
+def send_email(body, subject=None, recipients=None):
+    """發送 Email（等待寄出結果）"""
     try:
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-            server.login(sender, app_password)
-            server.send_message(msg)
-            print("✅ 郵件已寄出！")
-            return True
+        queue_email(body, subject, recipients).result()
+        print("✅ 郵件已寄出！")
+        return True
     except Exception as e:
         print(f"❌ 郵件發送失敗: {e}")
         return False
@@ -28,14 +356,14 @@ def send_email_from_file(filename="email_content.txt"):
     try:
         with open(filename, "r", encoding="utf-8") as f:
             content = f.read()
-        
+
         if not content.strip():
             print("⚠️ 檔案內容為空")
             return False
-        
+
         print(f"📧 正在發送 Email (內容來自 {filename})...")
         return send_email(content)
-        
+
     except FileNotFoundError:
         print(f"❌ 找不到檔案: {filename}")
         return False
@@ -57,7 +385,7 @@ def send_test_email():
 
 if __name__ == "__main__":
     import sys
-    
+
     if len(sys.argv) > 1:
         # 如果有指定檔案參數，就從檔案讀取
         filename = sys.argv[1]
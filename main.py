@@ -1,22 +1,60 @@
 
-from utils import *
-from ticket_searcher import TicketSearcher
+import sys
+from app_config import config
 
+# 各模式需要的模組在選定模式後才載入，縮短單次查詢的啟動時間
 if __name__ == "__main__":
     SEARCH_PARAMS = config['search_params']
     AMADEUS_API_KEY = config['amadeus']['api_key']
     AMADEUS_API_SECRET = config['amadeus']['api_secret']
-    searcher = TicketSearcher(
-        SEARCH_PARAMS['originLocationCode'],
-        SEARCH_PARAMS['destinationLocationCode'],
-        SEARCH_PARAMS['departureDate'],
-        SEARCH_PARAMS['returnDate']
-    )
     
-    if AMADEUS_API_KEY == "YOUR_CLIENT_ID" or AMADEUS_API_SECRET == "YOUR_CLIENT_SECRET":
+    if "--log" in sys.argv:
+        # 查看最近的執行記錄：python main.py --log [筆數]
+        from execution_log import ExecutionLog, format_entry
+        index = sys.argv.index("--log")
+        count = int(sys.argv[index + 1]) if len(sys.argv) > index + 1 and sys.argv[index + 1].isdigit() else 20
+        log = ExecutionLog(config['files']['execution_log_file'],
+                           backup_count=config.section('execution_log').get('backup_count', 3))
+        for entry in log.tail(count):
+            print(format_entry(entry))
+        success = True
+    elif "--migrate-state" in sys.argv:
+        # 轉移舊版價格記錄（升級後執行一次）：python main.py --migrate-state [舊版 state 目錄]
+        from legacy_state import migrate_legacy_state
+        index = sys.argv.index("--migrate-state")
+        state_dir = sys.argv[index + 1] if len(sys.argv) > index + 1 else "state"
+        migrate_legacy_state(config, state_dir)
+        success = True
+    elif AMADEUS_API_KEY == "YOUR_CLIENT_ID" or AMADEUS_API_SECRET == "YOUR_CLIENT_SECRET":
         print("❌ 請先在 config.yaml 填入你的 Amadeus API Key 和 Secret！")
         exit(1)
+    elif "--watchlist" in sys.argv:
+        # 多路線模式：python main.py --watchlist
+        from watchlist import run_watchlist
+        results = run_watchlist()
+        success = bool(results) and all(r["success"] for r in results)
+    elif "--daemon" in sys.argv:
+        # 常駐模式：python main.py --daemon（Ctrl+C 結束）
+        from daemon import run_daemon
+        success = run_daemon()
+    elif "--subscriptions" in sys.argv:
+        # 訂閱模式：python main.py --subscriptions
+        from subscriptions import run_subscriptions
+        results = run_subscriptions()
+        success = bool(results) and all(r["success"] for r in results)
+    elif "--grid" in sys.argv:
+        # 彈性日期模式：python main.py --grid
+        from date_grid import run_date_grid
+        result = run_date_grid()
+        success = result["cheapest"] is not None
     else:
+        from ticket_searcher import TicketSearcher
+        searcher = TicketSearcher(
+            SEARCH_PARAMS['originLocationCode'],
+            SEARCH_PARAMS['destinationLocationCode'],
+            SEARCH_PARAMS['departureDate'],
+            SEARCH_PARAMS['returnDate']
+        )
         success = searcher.run()
         # exit(0 if success else 1)
 
@@ -0,0 +1,186 @@
+"""
+效能指標模組
+記錄各階段耗時（histogram）與計數（counter），輸出為 Prometheus 文字格式，
+可寫入檔案（給 node_exporter textfile collector）或由本機 HTTP 端點提供
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# 耗時分布的區間上限（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# 指標說明（Prometheus 的 HELP）
+METRIC_HELP = {
+    "flight_monitor_phase_seconds": "各階段耗時（token、search、decode、parse、stream、filter、format、smtp）",
+    "flight_monitor_run_seconds": "單次價格檢查的總耗時（含查詢、篩選與通知判斷）",
+    "flight_monitor_api_requests_total": "Amadeus API 請求數（依端點與狀態碼）",
+    "flight_monitor_api_retries_total": "API 重試次數（依原因）",
+    "flight_monitor_cache_requests_total": "查詢結果快取命中 / 未命中次數",
+    "flight_monitor_offers_parsed_total": "解析的航班數",
+    "flight_monitor_emails_total": "Email 發送結果",
+    "flight_monitor_notifications_total": "降價通知排入或因重複而略過的次數（依收件人計算）",
+    "flight_monitor_offer_changes_total": "與上次查詢相比新增、消失、價格變動的航班數",
+    "flight_monitor_unchanged_polls_total": "航班與價格和上次相同而略過處理的查詢次數",
+}
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for i, upper in enumerate(self.buckets):
+            if value <= upper:
+                self.counts[i] += 1
+                break
+
+
+class Metrics:
+    """指標收集器（執行緒安全）"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        """計數器加 value"""
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """記錄一次數值（通常為秒數）"""
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(self.buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """
+        記錄區塊的執行時間
+        用法: with metrics.timer("flight_monitor_phase_seconds", phase="parse"): ...
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def get(self, name, **labels):
+        """目前的計數器數值（測試與除錯用）"""
+        return self._counters.get((name, _label_key(labels)), 0)
+
+    def render(self):
+        """輸出 Prometheus 文字格式"""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                ((key, (list(h.counts), h.sum, h.count)) for key, h in self._histograms.items()),
+                key=lambda item: item[0]
+            )
+
+        lines = []
+        described = set()
+
+        def describe(name, kind):
+            if name in described:
+                return
+            described.add(name)
+            if name in METRIC_HELP:
+                lines.append(f"# HELP {name} {METRIC_HELP[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for (name, key), value in counters:
+            describe(name, "counter")
+            lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+
+        for (name, key), (counts, total, count) in histograms:
+            describe(name, "histogram")
+            cumulative = 0
+            for upper, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f"{name}_bucket{_format_labels(key, [('le', _format_value(float(upper)))])} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(key, [('le', '+Inf')])} {count}")
+            lines.append(f"{name}_sum{_format_labels(key)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(key)} {count}")
+
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path):
+        """寫入檔案（先寫暫存檔再取代，讀取端不會讀到寫一半的內容）"""
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(self.render())
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"⚠️ 寫入效能指標失敗: {e}")
+
+    def serve(self, port, host="127.0.0.1"):
+        """
+        在背景執行緒提供 HTTP 端點（GET /metrics）
+
+        Returns:
+            ThreadingHTTPServer: 呼叫 shutdown() 停止
+        """
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        print(f"📈 效能指標端點: http://{host}:{server.server_address[1]}/metrics")
+        return server
@@ -0,0 +1,240 @@
+"""
+本機模擬 Amadeus API
+提供 OAuth token 與 flight-offers 兩個端點，回傳模擬資料或封存的真實回應，
+可設定延遲、錯誤率、429 流量限制與 token 到期時間，用於離線測試並行、限流與常駐模式
+
+用法:
+    python mock_amadeus.py --port 8080 --latency 50 200 --error-rate 0.05 --burst-every 20
+    python mock_amadeus.py --port 8080 --archive archive     # 重播封存的回應
+
+config.yaml 設定 replay.mode: "mock" 後，TicketSearcher 會改為連到此伺服器
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from synthetic_offers import generate_payload_bytes
+
+TOKEN_PATH = "/v1/security/oauth2/token"
+SEARCH_PATH = "/v2/shopping/flight-offers"
+
+
+def _error_body(status, title, detail=""):
+    return json.dumps({"errors": [{"status": status, "code": status, "title": title, "detail": detail}]}).encode("utf-8")
+
+
+class MockAmadeus:
+    """模擬 Amadeus API 伺服器"""
+
+    def __init__(self, host="127.0.0.1", port=0, latency_ms=(0, 0), error_rate=0.0,
+                 burst_every=0, burst_size=3, retry_after=1, token_ttl=1799,
+                 default_offers=250, archive=None, seed=0):
+        """
+        Args:
+            host / port: 監聽位址（port 為 0 時自動選擇）
+            latency_ms: 每個請求的延遲範圍（毫秒）(最小, 最大)
+            error_rate: 航班查詢回傳 500 的機率
+            burst_every: 每幾個航班查詢就連續回傳 burst_size 次 429（0 表示不模擬）
+            retry_after: 429 回應的 Retry-After 秒數
+            token_ttl: token 有效秒數（過期的 token 查詢時回傳 401）
+            default_offers: 查詢參數沒有 max 時產生的航班數
+            archive: 封存檔或目錄，設定時改為重播封存的回應
+            seed: 亂數種子（相同設定會產生相同的結果）
+        """
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.burst_every = burst_every
+        self.burst_size = burst_size
+        self.retry_after = retry_after
+        self.token_ttl = token_ttl
+        self.default_offers = default_offers
+        self.seed = seed
+        self.stats = {"token": 0, "search": 0, "401": 0, "429": 0, "500": 0}
+
+        self._random = random.Random(seed)
+        self._tokens = {}
+        self._burst_left = 0
+        self._payloads = OrderedDict()
+        self._archive = None
+        if archive:
+            from response_archive import ArchiveReplay
+            self._archive = ArchiveReplay(archive)
+        self._lock = threading.Lock()
+
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """在背景執行緒啟動，回傳自己"""
+        self._thread = threading.Thread(target=self.server.serve_forever, name="mock-amadeus", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _sleep(self):
+        low, high = self.latency_ms
+        if high > 0:
+            with self._lock:
+                delay = self._random.uniform(low, high)
+            time.sleep(delay / 1000)
+
+    def issue_token(self):
+        token = uuid.uuid4().hex
+        with self._lock:
+            self.stats["token"] += 1
+            self._tokens[token] = time.time() + self.token_ttl
+        return {"type": "amadeusOAuth2Token", "access_token": token,
+                "token_type": "Bearer", "expires_in": self.token_ttl, "state": "approved"}
+
+    def check_token(self, header):
+        token = (header or "").replace("Bearer ", "", 1)
+        with self._lock:
+            expires_at = self._tokens.get(token)
+        return expires_at is not None and expires_at > time.time()
+
+    def next_failure(self):
+        """依設定決定這次查詢是否回傳 429 或 500，回傳狀態碼或 None"""
+        with self._lock:
+            self.stats["search"] += 1
+            if self._burst_left > 0:
+                self._burst_left -= 1
+                self.stats["429"] += 1
+                return 429
+            if self.burst_every and self.stats["search"] % self.burst_every == 0:
+                self._burst_left = self.burst_size - 1
+                self.stats["429"] += 1
+                return 429
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.stats["500"] += 1
+                return 500
+        return None
+
+    def payload(self, params):
+        """依查詢參數回傳回應內容（bytes），相同參數會回傳相同內容"""
+        origin = params.get("originLocationCode", "TPE")
+        destination = params.get("destinationLocationCode", "NRT")
+        depart_date = params.get("departureDate", "2026-03-06")
+        return_date = params.get("returnDate")
+        count = int(params.get("max", self.default_offers))
+        key = (origin, destination, depart_date, return_date, count)
+
+        with self._lock:
+            if key in self._payloads:
+                self._payloads.move_to_end(key)
+                return self._payloads[key]
+
+        if self._archive:
+            response = self._archive.get(origin, destination, depart_date, return_date)
+            if response is None:
+                response = {"meta": {"count": 0}, "data": []}
+            body = json.dumps(response, separators=(",", ":")).encode("utf-8")
+        else:
+            seed = zlib.crc32(repr((self.seed,) + key).encode("utf-8"))
+            body = generate_payload_bytes(count, seed=seed, origin=origin, destination=destination,
+                                          depart_date=depart_date, return_date=return_date,
+                                          currency=params.get("currencyCode", "TWD"))
+
+        with self._lock:
+            self._payloads[key] = body
+            while len(self._payloads) > 64:
+                self._payloads.popitem(last=False)
+        return body
+
+    def _handler_class(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _send(self, status, body, headers=None):
+                self.send_response(status)
+                self.send_header("Content-Type", "application/vnd.amadeus+json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if urlparse(self.path).path != TOKEN_PATH:
+                    self._send(404, _error_body(404, "NOT FOUND"))
+                    return
+                mock._sleep()
+                self._send(200, json.dumps(mock.issue_token()).encode("utf-8"))
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path != SEARCH_PATH:
+                    self._send(404, _error_body(404, "NOT FOUND"))
+                    return
+                mock._sleep()
+                if not mock.check_token(self.headers.get("Authorization")):
+                    with mock._lock:
+                        mock.stats["401"] += 1
+                    self._send(401, _error_body(401, "Invalid access token", "access token expired"))
+                    return
+                failure = mock.next_failure()
+                if failure == 429:
+                    self._send(429, _error_body(429, "Too many requests"),
+                               {"Retry-After": str(mock.retry_after)})
+                    return
+                if failure == 500:
+                    self._send(500, _error_body(500, "INTERNAL ERROR"))
+                    return
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                self._send(200, mock.payload(params))
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本機模擬 Amadeus API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, nargs=2, default=(0, 0), metavar=("MIN_MS", "MAX_MS"))
+    parser.add_argument("--error-rate", type=float, default=0.0, help="回傳 500 的機率")
+    parser.add_argument("--burst-every", type=int, default=0, help="每幾個查詢就連續回傳 429")
+    parser.add_argument("--burst-size", type=int, default=3, help="每次連續回傳幾個 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="429 的 Retry-After 秒數")
+    parser.add_argument("--token-ttl", type=int, default=1799, help="token 有效秒數")
+    parser.add_argument("--offers", type=int, default=250, help="查詢沒有指定 max 時的航班數")
+    parser.add_argument("--archive", help="重播封存的回應（封存檔或目錄）")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    mock = MockAmadeus(args.host, args.port, tuple(args.latency), args.error_rate,
+                       args.burst_every, args.burst_size, args.retry_after, args.token_ttl,
+                       args.offers, args.archive, args.seed)
+    print(f"🧪 模擬 Amadeus API: {mock.url}（Ctrl+C 結束）")
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        mock.server.server_close()
+        print(f"📊 統計: {mock.stats}")
+
+
+if __name__ == "__main__":
+    main()
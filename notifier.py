@@ -0,0 +1,233 @@
+"""
+通知彙整模組
+將一段時間內觸發的降價通知合併為每位收件人一封摘要郵件，
+並以航班指紋與冷卻時間避免同一個價格重複通知
+"""
+
+import atexit
+import threading
+import time
+
+from email_formatter import EmailFormatter
+
+
+class Alert:
+    """一條路線的降價通知"""
+
+    __slots__ = ("route", "origin", "destination", "depart_date", "return_date", "adults",
+                 "last_price", "new_price", "reason", "flights", "recipients", "fingerprint",
+                 "created_at", "on_done")
+
+    def __init__(self, route, origin, destination, depart_date, return_date, adults,
+                 last_price, new_price, reason, flights, recipients=None, on_done=None):
+        """
+        Args:
+            route: 路線識別字串（同一路線在彙整期間只保留最新的通知）
+            flights: 要列在郵件中的航班（FlightInfo，由便宜到貴）
+            recipients: 收件人列表（None 表示使用 config.yaml 的 email.recipients）
+            on_done: 寄出或失敗後呼叫 on_done(recipient, error)，error 為 None 表示成功
+        """
+        self.route = route
+        self.origin = origin
+        self.destination = destination
+        self.depart_date = depart_date
+        self.return_date = return_date
+        self.adults = adults
+        self.last_price = last_price
+        self.new_price = new_price
+        self.reason = reason
+        self.flights = flights
+        # mailer（smtplib）在需要寄信時才載入
+        from mailer import resolve_recipients
+        self.recipients = resolve_recipients(recipients)
+        # 以最便宜航班的指紋代表這次通知
+        self.fingerprint = flights[0].fingerprint() if flights else ""
+        self.created_at = time.time()
+        self.on_done = on_done
+
+
+class NotificationEngine:
+    """通知彙整與去重"""
+
+    def __init__(self, store, window_seconds=0, cooldown_seconds=0, max_results=5,
+                 show_return=True, metrics=None, outbox_file=None, content_file=None):
+        """
+        Args:
+            store: HistoryStore 物件（保存每位收件人最後收到的通知）
+            window_seconds: 彙整時間（秒），期間內的通知合併為一封郵件，0 表示立即寄出
+            cooldown_seconds: 冷卻時間（秒），期間內相同航班或價格沒有更低時不再通知
+            max_results: 每條路線最多列出幾個航班
+            metrics: Metrics 物件
+            outbox_file: 設定時不寄信，郵件改為附加寫入此檔案（離線測試用）
+            content_file: 最後一封成功寄出的郵件內容存放的檔案（可用 mailer.py 重新寄出）
+        """
+        self.store = store
+        self.outbox_file = outbox_file
+        self.content_file = content_file
+        self.window_seconds = window_seconds
+        self.cooldown_seconds = cooldown_seconds
+        self.max_results = max_results
+        self.show_return = show_return
+        self.metrics = metrics
+
+        # 等待寄出的通知: {收件人: {路線: Alert}}
+        self._buffer = {}
+        # 已交給寄信佇列、尚未寄出的通知: {(路線, 收件人): (指紋, 價格)}
+        self._inflight = {}
+        self._timer = None
+        self._exit_hook = False
+        self._lock = threading.Lock()
+        self._content_lock = threading.Lock()
+
+    def _is_duplicate(self, alert, recipient, now):
+        """冷卻時間內相同航班，或價格沒有比上次通知更低時視為重複"""
+        previous = self._inflight.get((alert.route, recipient))
+        if previous is None and self.cooldown_seconds:
+            row = self.store.last_notification(alert.route, recipient)
+            if row and now - row[2] < self.cooldown_seconds:
+                previous = row[:2]
+        if previous is None:
+            return False
+        fingerprint, price = previous
+        return fingerprint == alert.fingerprint or alert.new_price >= price
+
+    def submit(self, alert):
+        """
+        加入一則通知
+
+        Returns:
+            list: 實際排入的收件人（全部被視為重複時為空列表）
+        """
+        self._register_exit_hook()
+        now = time.time()
+        queued = []
+        with self._lock:
+            for recipient in alert.recipients:
+                if self._is_duplicate(alert, recipient, now):
+                    continue
+                pending = self._buffer.setdefault(recipient, {})
+                current = pending.get(alert.route)
+                # 同一路線只保留較便宜（價格相同時較新）的通知
+                if current is None or alert.new_price <= current.new_price:
+                    pending[alert.route] = alert
+                queued.append(recipient)
+
+            if queued and self.window_seconds and self._timer is None:
+                self._timer = threading.Timer(self.window_seconds, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+        if self.metrics:
+            self.metrics.inc("flight_monitor_notifications_total", len(queued), result="queued")
+            self.metrics.inc("flight_monitor_notifications_total",
+                             len(alert.recipients) - len(queued), result="suppressed")
+        if queued and not self.window_seconds:
+            self.flush()
+        return queued
+
+    def _register_exit_hook(self):
+        # 寄信佇列先建立，程序結束時才會在佇列關閉前寄出剩餘的通知（atexit 後註冊的先執行）
+        if self._exit_hook:
+            return
+        self._exit_hook = True
+        if not self.outbox_file:
+            from mailer import get_mail_queue
+            get_mail_queue(self.metrics)
+        atexit.register(self.close)
+
+    def flush(self):
+        """立即寄出所有等待中的通知（每位收件人一封）"""
+        from mailer import queue_email
+
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            buffer, self._buffer = self._buffer, {}
+            for recipient, alerts in buffer.items():
+                for alert in alerts.values():
+                    self._inflight[(alert.route, recipient)] = (alert.fingerprint, alert.new_price)
+
+        # 收到相同通知組合的收件人共用同一份內容
+        rendered = {}
+        for recipient, alerts in buffer.items():
+            alerts = sorted(alerts.values(), key=lambda a: a.new_price)
+            key = tuple(id(alert) for alert in alerts)
+            if key not in rendered:
+                if self.metrics:
+                    with self.metrics.timer("flight_monitor_phase_seconds", phase="format"):
+                        rendered[key] = self._render(alerts)
+                else:
+                    rendered[key] = self._render(alerts)
+            body, html, subject = rendered[key]
+            if self.outbox_file:
+                self._finish(recipient, alerts, self._write_outbox(recipient, subject, body))
+                continue
+            try:
+                future = queue_email(body, subject, recipients=[recipient], metrics=self.metrics, html=html)
+            except Exception as e:
+                print(f"❌ 通知加入寄信佇列失敗: {e}")
+                self._finish(recipient, alerts, e)
+                continue
+            future.add_done_callback(lambda f, r=recipient, a=alerts, b=body: self._finish(r, a, f.exception(), b))
+
+    def _write_outbox(self, recipient, subject, body):
+        """郵件寫入 outbox_file（取代寄信），回傳錯誤或 None"""
+        try:
+            with open(self.outbox_file, "a", encoding="utf-8") as f:
+                f.write(f"To: {recipient}\nSubject: {subject or '(預設主旨)'}\n\n{body}\n{'=' * 60}\n")
+            print(f"📭 離線模式不寄信，通知已寫入 {self.outbox_file}（{recipient}）")
+            return None
+        except OSError as e:
+            print(f"❌ 寫入通知檔失敗: {e}")
+            return e
+
+    def _render(self, alerts):
+        """
+        單一路線使用原本的降價通知格式，多條路線合併為摘要
+
+        Returns:
+            tuple: (純文字內容, HTML 內容, 主旨)，主旨為 None 時使用預設主旨
+        """
+        if len(alerts) == 1:
+            alert = alerts[0]
+            formatter = EmailFormatter(alert.origin, alert.destination, alert.depart_date,
+                                       alert.return_date, alert.adults)
+            args = (alert.last_price, alert.new_price, alert.flights, self.max_results, self.show_return)
+            return (formatter.create_price_drop_email(*args),
+                    formatter.create_price_drop_email(*args, html=True),
+                    None)
+        from mailer import EMAIL_SETTINGS
+        subject = f"{EMAIL_SETTINGS.get('subject', '✈️ 機票價格通知')}（{len(alerts)} 條路線降價）"
+        return (EmailFormatter.create_digest_email(alerts, self.max_results, self.show_return),
+                EmailFormatter.create_digest_email(alerts, self.max_results, self.show_return, html=True),
+                subject)
+
+    def _finish(self, recipient, alerts, error, body=None):
+        """寄出後記錄通知狀態（在寄信執行緒中呼叫），body 為寄出的純文字內容"""
+        now = time.time()
+        if error is None and body is not None and self.content_file:
+            self._write_content(body)
+        for alert in alerts:
+            with self._lock:
+                self._inflight.pop((alert.route, recipient), None)
+            if error is None:
+                try:
+                    self.store.record_notification(alert.route, recipient, alert.fingerprint,
+                                                   alert.new_price, now)
+                except Exception as e:
+                    print(f"⚠️ 記錄通知狀態失敗: {e}")
+            if alert.on_done:
+                alert.on_done(recipient, error)
+
+    def _write_content(self, body):
+        """保存最後一封寄出的郵件內容（覆寫）"""
+        try:
+            with self._content_lock, open(self.content_file, "w", encoding="utf-8") as f:
+                f.write(body)
+        except OSError as e:
+            print(f"⚠️ 保存郵件內容失敗: {e}")
+
+    def close(self):
+        """寄出等待中的通知（程序結束時呼叫）"""
+        self.flush()
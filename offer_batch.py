@@ -0,0 +1,147 @@
+"""
+航班欄位批次模組（需要 numpy）
+將大量 FlightInfo 轉為欄位陣列，以向量運算進行偏好篩選、排序與分組取最低價
+篩選結果與 FlightInfo.matches_preferences 完全相同
+"""
+
+# numpy 在第一次需要時才載入（航班數少時不會用到，可縮短啟動時間）
+np = None
+_NUMPY_CHECKED = False
+
+# 時段代碼：與 utils.period_of_hour 對應，無法取得小時則為 "any"
+PERIODS = ("night", "morning", "afternoon", "evening")
+_PERIOD_ANY = -1
+
+
+def is_available():
+    """是否可使用向量化篩選（已安裝 numpy）"""
+    global np, _NUMPY_CHECKED
+    if not _NUMPY_CHECKED:
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            pass
+        _NUMPY_CHECKED = True
+    return np is not None
+
+
+def _period_ids(hours):
+    """小時陣列轉為時段代碼陣列（0-5 night, 6-11 morning, 12-17 afternoon, 18-23 evening）"""
+    ids = hours // 6
+    return np.where((hours < 0) | (hours > 23), _PERIOD_ANY, ids)
+
+
+class OfferBatch:
+    """航班欄位批次"""
+
+    def __init__(self, flights):
+        if not is_available():
+            raise ImportError("OfferBatch 需要安裝 numpy")
+
+        self.flights = list(flights)
+        n = len(self.flights)
+
+        # 航空公司代碼轉為整數 id
+        self.airline_codes = sorted({f.airline_code for f in self.flights})
+        code_ids = {code: i for i, code in enumerate(self.airline_codes)}
+
+        self.price_minor = np.fromiter((f.price_minor for f in self.flights), dtype=np.int64, count=n)
+        self.stops = np.fromiter((f.outbound_stops for f in self.flights), dtype=np.int32, count=n)
+        minutes = np.fromiter((f.outbound_minutes for f in self.flights), dtype=np.int64, count=n)
+        # 與 utils.minutes_to_hours 相同的算法，確保浮點數比較結果一致
+        self.duration_hours = minutes // 60 + (minutes % 60) / 60.0
+        self.departure_hour = np.fromiter((f.departure_hour for f in self.flights), dtype=np.int32, count=n)
+        self.arrival_hour = np.fromiter((f.arrival_hour for f in self.flights), dtype=np.int32, count=n)
+        self.airline_id = np.fromiter((code_ids[f.airline_code] for f in self.flights), dtype=np.int32, count=n)
+
+        self.departure_period = _period_ids(self.departure_hour)
+        self.arrival_period = _period_ids(self.arrival_hour)
+
+    def __len__(self):
+        return len(self.flights)
+
+    def _airline_mask(self, codes):
+        ids = [self.airline_codes.index(code) for code in codes if code in self.airline_codes]
+        return np.isin(self.airline_id, ids)
+
+    def _period_mask(self, periods, preference):
+        if preference == "any":
+            return None
+        if preference not in PERIODS:
+            return np.zeros(len(self), dtype=bool)
+        return periods == PERIODS.index(preference)
+
+    def preference_mask(self, preferences):
+        """回傳符合偏好的布林陣列（規則同 FlightInfo.matches_preferences）"""
+        mask = np.ones(len(self), dtype=bool)
+
+        max_stops = preferences.get("max_stops")
+        if max_stops is not None:
+            mask &= self.stops <= max_stops
+
+        preferred = preferences.get("preferred_airlines", [])
+        if preferred:
+            mask &= self._airline_mask(preferred)
+
+        excluded = preferences.get("excluded_airlines", [])
+        if excluded:
+            mask &= ~self._airline_mask(excluded)
+
+        max_duration = preferences.get("max_duration_hours")
+        if max_duration is not None:
+            mask &= self.duration_hours <= max_duration
+
+        for periods, key in ((self.departure_period, "departure_time_preference"),
+                             (self.arrival_period, "arrival_time_preference")):
+            period_mask = self._period_mask(periods, preferences.get(key, "any"))
+            if period_mask is not None:
+                mask &= period_mask
+
+        return mask
+
+    def sorted_indices(self, mask=None, top_k=None):
+        """
+        依價格排序的索引（價格相同時保持原順序）
+
+        Args:
+            top_k: 只取最便宜的 top_k 個（以 partition 選出後只排序這 top_k 個，不做完整排序）
+        """
+        indices = np.arange(len(self)) if mask is None else np.flatnonzero(mask)
+        prices = self.price_minor[indices]
+        if top_k and top_k < len(indices):
+            # 第 top_k 小的價格為門檻；門檻價格有多個時保留較前面的（與 TopK 相同）
+            kth = np.partition(prices, top_k - 1)[top_k - 1]
+            below = np.flatnonzero(prices < kth)
+            equal = np.flatnonzero(prices == kth)[:top_k - len(below)]
+            chosen = np.sort(np.concatenate((below, equal)))
+            indices, prices = indices[chosen], prices[chosen]
+        order = np.argsort(prices, kind="stable")
+        return indices[order]
+
+    def filter(self, preferences, top_k=None):
+        """篩選符合偏好的航班並按價格排序，回傳 FlightInfo 列表（top_k 表示只取最便宜的幾個）"""
+        return [self.flights[i] for i in self.sorted_indices(self.preference_mask(preferences), top_k)]
+
+    def cheapest_per_group(self, group_ids, mask=None):
+        """
+        每個群組的最低價航班
+
+        Args:
+            group_ids: 與航班數相同長度的整數陣列
+            mask: 只考慮符合條件的航班（None 表示全部）
+
+        Returns:
+            dict: {群組 id: FlightInfo}
+        """
+        indices = self.sorted_indices(mask)
+        groups = np.asarray(group_ids)[indices]
+        # 已按價格排序，各群組第一次出現的位置即為最低價
+        _, first = np.unique(groups, return_index=True)
+        return {int(groups[i]): self.flights[indices[i]] for i in first}
+
+    def cheapest_by_airline(self, preferences=None):
+        """每家航空公司的最低價航班，回傳 {航空公司代碼: FlightInfo}"""
+        mask = self.preference_mask(preferences) if preferences else None
+        cheapest = self.cheapest_per_group(self.airline_id, mask)
+        return {self.airline_codes[i]: flight for i, flight in cheapest.items()}
@@ -0,0 +1,85 @@
+"""
+航班差異比對模組
+以航班識別碼（航空公司、航班號碼、起降時間）與票價建立每條路線的快照，
+與上次查詢的快照比較，找出新增、消失與價格變動的航班
+"""
+
+
+def snapshot(flights):
+    """
+    建立航班快照
+
+    Returns:
+        dict: {航班識別碼: 票價（最小貨幣單位）}，同一行程有多個票價時取最低價
+    """
+    result = {}
+    for flight in flights:
+        offer_id = flight.offer_id()
+        price = result.get(offer_id)
+        if price is None or flight.price_minor < price:
+            result[offer_id] = flight.price_minor
+    return result
+
+
+class OfferDiff:
+    """兩次查詢之間的航班差異"""
+
+    __slots__ = ("added", "removed", "repriced", "snapshot", "first")
+
+    def __init__(self, added, removed, repriced, snapshot, first=False):
+        """
+        Args:
+            added: 新出現的航班（FlightInfo）
+            removed: 已消失的航班識別碼
+            repriced: 價格變動的航班 [(FlightInfo, 上次票價（最小貨幣單位）)]
+            snapshot: 本次的快照（處理完成後存入資料庫）
+            first: 是否沒有上次的快照
+        """
+        self.added = added
+        self.removed = removed
+        self.repriced = repriced
+        self.snapshot = snapshot
+        self.first = first
+
+    @property
+    def changed(self):
+        return bool(self.first or self.added or self.removed or self.repriced)
+
+    def summary(self):
+        """差異摘要文字"""
+        if self.first:
+            return f"首次記錄 {len(self.snapshot)} 個航班"
+        return f"新增 {len(self.added)} 個、消失 {len(self.removed)} 個、價格變動 {len(self.repriced)} 個航班"
+
+
+def diff_offers(previous, flights):
+    """
+    比較上次的快照與本次的航班
+
+    Args:
+        previous: 上次的快照（snapshot() 的結果），None 表示沒有記錄
+        flights: 本次的航班（FlightInfo）
+
+    Returns:
+        OfferDiff
+    """
+    current = snapshot(flights)
+    if previous is None:
+        return OfferDiff(list(flights), [], [], current, first=True)
+
+    added = []
+    repriced = []
+    seen = set()
+    for flight in flights:
+        offer_id = flight.offer_id()
+        # 同一行程只以最低價的那一筆比較
+        if offer_id in seen or flight.price_minor != current[offer_id]:
+            continue
+        seen.add(offer_id)
+        old_price = previous.get(offer_id)
+        if old_price is None:
+            added.append(flight)
+        elif old_price != flight.price_minor:
+            repriced.append((flight, old_price))
+    removed = [offer_id for offer_id in previous if offer_id not in current]
+    return OfferDiff(added, removed, repriced, current)
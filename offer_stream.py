@@ -0,0 +1,109 @@
+"""
+航班回應串流解析模組
+邊下載邊解析 API 回應中的 data 陣列，一次只保留一個航班的原始資料
+"""
+
+import codecs
+import json
+
+_WHITESPACE = " \t\r\n"
+
+
+class OfferStream:
+    """
+    逐筆解析 flight-offers 回應
+
+    用法:
+        stream = OfferStream(response.iter_content(chunk_size=65536))
+        for offer in stream:
+            ...
+        stream.extra  # data 以外的欄位（meta、dictionaries、errors）
+    """
+
+    def __init__(self, chunks):
+        """
+        Args:
+            chunks: bytes 或 str 的可迭代物件（例如 response.iter_content()）
+        """
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self.extra = {}
+
+    def _read_more(self):
+        """讀取下一個區塊，已無資料時回傳 False"""
+        if self._eof:
+            return False
+        # 丟棄已解析的部分，讓緩衝區大小維持在單一航班的量級
+        self._buf = self._buf[self._pos:]
+        self._pos = 0
+        try:
+            chunk = next(self._chunks)
+        except StopIteration:
+            self._eof = True
+            self._buf += self._decoder.decode(b"", final=True)
+            return False
+        self._buf += self._decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+        return True
+
+    def _peek(self):
+        """跳過空白並回傳下一個字元（資料結束時回傳空字串）"""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._read_more():
+                return ""
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise ValueError(f"回應格式錯誤：預期 '{char}'，位置 {self._pos}")
+        self._pos += 1
+
+    def _decode_value(self):
+        """解析下一個完整的 JSON 值（資料不足時繼續讀取）"""
+        self._peek()
+        while True:
+            try:
+                value, end = self._json.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if not self._read_more():
+                    raise
+                continue
+            # 數字可能剛好被區塊切斷，確認後面還有其他字元
+            if end == len(self._buf) and self._read_more():
+                continue
+            self._pos = end
+            return value
+
+    def __iter__(self):
+        self._expect("{")
+        while True:
+            char = self._peek()
+            if char == "}":
+                self._pos += 1
+                return
+            if char == ",":
+                self._pos += 1
+                continue
+
+            key = self._decode_value()
+            self._expect(":")
+            if key != "data":
+                self.extra[key] = self._decode_value()
+                continue
+
+            self._expect("[")
+            while True:
+                char = self._peek()
+                if char == "]":
+                    self._pos += 1
+                    break
+                if char == ",":
+                    self._pos += 1
+                    continue
+                yield self._decode_value()
@@ -0,0 +1,92 @@
+"""
+API 流量限制模組
+Token bucket 限流器，透過狀態檔 + 檔案鎖在同一台機器的多個執行緒與程序間共用
+"""
+
+import json
+import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from utils import file_lock
+
+
+def parse_retry_after(value):
+    """
+    解析 Retry-After 標頭（秒數或 HTTP 日期）
+
+    Returns:
+        float: 需等待的秒數，無法解析時回傳 None
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """Token bucket 限流器（跨執行緒、跨程序共用）"""
+
+    def __init__(self, requests_per_second, burst=None, state_file="rate_limit.json"):
+        """
+        Args:
+            requests_per_second: 每秒允許的請求數
+            burst: bucket 容量（可瞬間送出的請求數），預設等於 requests_per_second
+            state_file: 共用狀態檔路徑
+        """
+        self.rate = float(requests_per_second)
+        self.capacity = float(burst or max(1.0, self.rate))
+        self.state_file = state_file
+        self.lock_file = state_file + ".lock"
+        self._lock = threading.Lock()
+
+    def _load_state(self, now):
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (FileNotFoundError, ValueError):
+            state = {"tokens": self.capacity, "updated": now, "blocked_until": 0}
+
+        # 依經過時間補充 token
+        elapsed = max(0.0, now - state["updated"])
+        state["tokens"] = min(self.capacity, state["tokens"] + elapsed * self.rate)
+        state["updated"] = now
+        return state
+
+    def _save_state(self, state):
+        tmp_file = f"{self.state_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_file, self.state_file)
+
+    def acquire(self):
+        """取得一個請求配額，必要時等待"""
+        while True:
+            with self._lock, file_lock(self.lock_file):
+                now = time.time()
+                state = self._load_state(now)
+                wait = state["blocked_until"] - now
+                if wait <= 0:
+                    if state["tokens"] >= 1:
+                        state["tokens"] -= 1
+                        self._save_state(state)
+                        return
+                    wait = (1 - state["tokens"]) / self.rate
+                self._save_state(state)
+            time.sleep(wait)
+
+    def block_for(self, seconds):
+        """伺服器要求暫停（例如 429 + Retry-After），所有共用者都會一起等待"""
+        with self._lock, file_lock(self.lock_file):
+            now = time.time()
+            state = self._load_state(now)
+            state["blocked_until"] = max(state["blocked_until"], now + seconds)
+            state["tokens"] = 0
+            self._save_state(state)
@@ -0,0 +1,135 @@
+"""
+航空參考資料模組
+統一處理機場、航空公司、機型名稱的查詢
+
+查詢順序：config.yaml 的 mappings > 內建 IATA 對照表 > API 回應的 dictionaries > 原始代碼
+內建對照表在第一次查詢時才載入，所有代碼與名稱都經過 sys.intern，
+大量 FlightInfo 共用同一份字串
+"""
+
+import csv
+import os
+import sys
+import threading
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def load_table(path):
+    """讀取 code,name 格式的 CSV 對照表，檔案不存在時回傳空 dict"""
+    table = {}
+    if not path or not os.path.exists(path):
+        return table
+    try:
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                code = (row.get("code") or "").strip()
+                name = (row.get("name") or "").strip()
+                if code and name:
+                    table[_intern(code)] = _intern(name)
+    except Exception as e:
+        print(f"⚠️ 無法讀取參考資料 {path}: {e}")
+    return table
+
+
+class ReferenceData:
+    """機場 / 航空公司 / 機型名稱查詢（執行緒安全）"""
+
+    def __init__(self, airport_names=None, airline_names=None,
+                 airports_file=None, airlines_file=None):
+        """
+        Args:
+            airport_names / airline_names: 優先使用的自訂名稱（config.yaml 的 mappings）
+            airports_file / airlines_file: 內建 IATA 對照表（CSV，欄位 code,name）
+        """
+        self._airport_overrides = {_intern(k): _intern(v) for k, v in (airport_names or {}).items()}
+        self._airline_overrides = {_intern(str(k)): _intern(v) for k, v in (airline_names or {}).items()}
+        self._airports_file = airports_file
+        self._airlines_file = airlines_file
+        self._airports = None
+        self._airlines = None
+
+        # 從 API 回應 dictionaries 累積的資料
+        self._carriers = {}
+        self._locations = {}
+        self._aircraft = {}
+
+        self._lock = threading.Lock()
+
+    def configure(self, airport_names=None, airline_names=None, airports_file=None, airlines_file=None):
+        """套用新的自訂名稱與對照表檔案（設定檔重新載入時呼叫，API dictionaries 累積的資料保留）"""
+        airport_overrides = {_intern(k): _intern(v) for k, v in (airport_names or {}).items()}
+        airline_overrides = {_intern(str(k)): _intern(v) for k, v in (airline_names or {}).items()}
+        with self._lock:
+            self._airport_overrides = airport_overrides
+            self._airline_overrides = airline_overrides
+            if airports_file != self._airports_file:
+                self._airports_file = airports_file
+                self._airports = None
+            if airlines_file != self._airlines_file:
+                self._airlines_file = airlines_file
+                self._airlines = None
+
+    def _airport_table(self):
+        if self._airports is None:
+            with self._lock:
+                if self._airports is None:
+                    self._airports = load_table(self._airports_file)
+        return self._airports
+
+    def _airline_table(self):
+        if self._airlines is None:
+            with self._lock:
+                if self._airlines is None:
+                    self._airlines = load_table(self._airlines_file)
+        return self._airlines
+
+    def load_dictionaries(self, dictionaries):
+        """
+        合併 API 回應的 dictionaries 區塊（每個回應呼叫一次）
+
+        Args:
+            dictionaries: {"carriers": {...}, "locations": {...}, "aircraft": {...}}
+        """
+        if not dictionaries:
+            return
+        carriers = dictionaries.get("carriers") or {}
+        locations = dictionaries.get("locations") or {}
+        aircraft = dictionaries.get("aircraft") or {}
+        with self._lock:
+            for code, name in carriers.items():
+                if code not in self._carriers:
+                    self._carriers[_intern(code)] = _intern(name)
+            for code, info in locations.items():
+                if code not in self._locations and isinstance(info, dict):
+                    self._locations[_intern(code)] = _intern(info.get("cityCode"))
+            for code, name in aircraft.items():
+                if code not in self._aircraft:
+                    self._aircraft[_intern(code)] = _intern(name)
+
+    def airport_name(self, code):
+        """取得機場名稱，找不到時依序嘗試所在城市名稱、原始代碼"""
+        name = self._airport_overrides.get(code)
+        if name:
+            return name
+        table = self._airport_table()
+        name = table.get(code)
+        if name:
+            return name
+        city = self._locations.get(code)
+        if city:
+            return self._airport_overrides.get(city) or table.get(city) or code
+        return code
+
+    def airline_name(self, code):
+        """取得航空公司名稱，找不到時使用 API 回應中的名稱或原始代碼"""
+        return (self._airline_overrides.get(code)
+                or self._airline_table().get(code)
+                or self._carriers.get(code)
+                or code)
+
+    def aircraft_name(self, code):
+        """取得機型名稱（只有 API 回應提供）"""
+        return self._aircraft.get(code, code)
@@ -0,0 +1,285 @@
+"""
+API 回應封存模組
+以背景執行緒將每次查詢的原始回應寫入 gzip 壓縮的 NDJSON 檔（一行一筆記錄，回應原樣寫入不重新解析），
+依檔案大小 / 時間輪替並只保留最近的檔案，可作為重播與效能測試的資料
+
+記錄格式:
+    {"ts": 1700000000.0, "route": "TPE-NRT-2026-03-06-2026-03-11", "origin": "TPE",
+     "destination": "NRT", "depart_date": "2026-03-06", "return_date": "2026-03-11",
+     "params": {...}, "response": {...}}
+"""
+
+import glob
+import gzip
+import json
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+FILE_PREFIX = "responses-"
+FILE_SUFFIX = ".ndjson.gz"
+
+_STOP = object()
+
+
+def _one_line(data):
+    """
+    去掉 JSON 中的換行，讓回應可以原樣放進一行記錄
+
+    合法的 JSON 字串內不會出現未跳脫的換行字元，換行只可能是格式用的空白
+    """
+    return data.replace(b"\r", b" ").replace(b"\n", b" ")
+
+
+class ResponseSpool:
+    """
+    串流下載時暫存原始回應（超過 max_size 時改存暫存檔，記憶體用量固定）
+
+    下載完成後交給 ResponseArchive.submit()，背景執行緒直接複製內容寫入封存檔，不重新解析
+    """
+
+    def __init__(self, max_size=1024 * 1024):
+        self._file = tempfile.SpooledTemporaryFile(max_size=max_size)
+        self.size = 0
+
+    def write(self, chunk):
+        if chunk:
+            self._file.write(_one_line(chunk))
+            self.size += len(chunk)
+
+    def copy_to(self, target, block_size=65536):
+        self._file.seek(0)
+        shutil.copyfileobj(self._file, target, block_size)
+
+    def close(self):
+        self._file.close()
+
+
+class ResponseArchive:
+    """API 回應封存（寫入在背景執行緒進行，不影響查詢延遲）"""
+
+    def __init__(self, archive_dir="archive", max_file_mb=16, rotate_hours=24,
+                 max_files=30, queue_size=256):
+        """
+        Args:
+            archive_dir: 封存檔目錄
+            max_file_mb: 單一檔案超過此大小（壓縮後）就換新檔
+            rotate_hours: 單一檔案使用超過此時數就換新檔
+            max_files: 最多保留幾個封存檔（超過時刪除最舊的）
+            queue_size: 等待寫入的回應數量上限（已滿時直接捨棄，不阻塞查詢）
+        """
+        self.archive_dir = archive_dir
+        self.max_bytes = int(max_file_mb * 1024 * 1024)
+        self.rotate_seconds = rotate_hours * 3600
+        self.max_files = max(1, max_files)
+        self.dropped = 0
+        self.written = 0
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._file = None
+        self._path = None
+        self._opened_at = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._worker, name="response-archive", daemon=True)
+        self._thread.start()
+
+    def submit(self, route, search_params, raw, observed_at=None):
+        """
+        加入一筆待封存的回應
+
+        Args:
+            route: 路線識別字串（utils.route_key）
+            search_params: 查詢參數
+            raw: 原始回應內容（bytes、串流下載的 ResponseSpool 或已解析的 dict）
+        """
+        if self._closed:
+            if isinstance(raw, ResponseSpool):
+                raw.close()
+            return False
+        record = {
+            "ts": observed_at or time.time(),
+            "route": route,
+            "origin": search_params.get("originLocationCode"),
+            "destination": search_params.get("destinationLocationCode"),
+            "depart_date": search_params.get("departureDate"),
+            "return_date": search_params.get("returnDate"),
+            "params": dict(search_params)
+        }
+        try:
+            self._queue.put_nowait((record, raw))
+            return True
+        except queue.Full:
+            if isinstance(raw, ResponseSpool):
+                raw.close()
+            self.dropped += 1
+            print("⚠️ 回應封存佇列已滿，略過本次回應")
+            return False
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                self._write(*item)
+            except Exception as e:
+                print(f"⚠️ 回應封存失敗: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _write(self, record, raw):
+        # 原始回應直接接在記錄後面寫入（不重新解析與序列化）
+        head = json.dumps(record, ensure_ascii=False, separators=(",", ":"))[:-1] + ',"response":'
+
+        self._rotate_if_needed()
+        self._file.write(head.encode("utf-8"))
+        try:
+            if isinstance(raw, ResponseSpool):
+                raw.copy_to(self._file)
+            elif isinstance(raw, (bytes, bytearray)):
+                self._file.write(_one_line(bytes(raw)) or b"null")
+            else:
+                self._file.write(json.dumps(raw, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        finally:
+            # 即使寫入失敗也結束這一行，不影響之後的記錄
+            self._file.write(b"}\n")
+            if isinstance(raw, ResponseSpool):
+                raw.close()
+        self.written += 1
+        # 佇列已清空時才 flush，連續寫入時共用同一個壓縮區塊
+        if self._queue.qsize() <= 1:
+            self._file.flush()
+
+    def _rotate_if_needed(self):
+        if self._file is not None:
+            too_big = os.path.getsize(self._path) >= self.max_bytes
+            too_old = time.time() - self._opened_at >= self.rotate_seconds
+            if not (too_big or too_old):
+                return
+            self._file.close()
+            self._file = None
+
+        os.makedirs(self.archive_dir, exist_ok=True)
+        # 檔名含程序 id，多個程序共用同一目錄時不會寫到同一個檔案
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        self._path = os.path.join(self.archive_dir, f"{FILE_PREFIX}{stamp}-{os.getpid()}{FILE_SUFFIX}")
+        self._file = gzip.open(self._path, "ab")
+        self._opened_at = time.time()
+        self._apply_retention()
+
+    def _apply_retention(self):
+        """
+        只保留最近的 max_files 個封存檔
+
+        其他程序的檔案可能仍在寫入，只有超過一個輪替週期沒有更新時才刪除
+        """
+        own_suffix = f"-{os.getpid()}{FILE_SUFFIX}"
+        now = time.time()
+        files = []
+        for path in archive_files(self.archive_dir):
+            try:
+                files.append((os.path.getmtime(path), path))
+            except OSError:
+                pass
+        files.sort()
+        for mtime, path in files[:-self.max_files]:
+            if path == self._path:
+                continue
+            if not path.endswith(own_suffix) and now - mtime < self.rotate_seconds:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def flush(self):
+        """等待佇列中的回應全部寫入"""
+        self._queue.join()
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        """寫完剩餘的回應後關閉檔案（可重複呼叫）"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def archive_files(archive_dir):
+    """目錄中的所有封存檔（依檔名排序，即依建立時間）"""
+    return sorted(glob.glob(os.path.join(archive_dir, f"{FILE_PREFIX}*{FILE_SUFFIX}")))
+
+
+def iter_records(path_or_dir, route=None):
+    """
+    逐筆讀取封存的回應
+
+    Args:
+        path_or_dir: 單一封存檔或封存目錄
+        route: 只回傳此路線的記錄（None 表示全部）
+
+    Yields:
+        dict: 封存記錄（回應在 "response" 欄位）
+    """
+    paths = archive_files(path_or_dir) if os.path.isdir(path_or_dir) else [path_or_dir]
+    for path in paths:
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # 寫入中斷的記錄
+                        continue
+                    if route is None or record.get("route") == route:
+                        yield record
+        except (EOFError, OSError, ValueError) as e:
+            # 程序中斷時最後一個壓縮區塊可能不完整，已讀取的記錄仍然有效
+            print(f"⚠️ 封存檔 {path} 尚未寫完或已損毀: {e}")
+
+
+class ArchiveReplay:
+    """從封存檔重播回應（每組路線與日期取最新的一筆）"""
+
+    def __init__(self, path_or_dir):
+        self.path = path_or_dir
+        self._index = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    index = {}
+                    for record in iter_records(self.path):
+                        if not (record.get("response") or {}).get("data"):
+                            continue
+                        key = (record.get("origin"), record.get("destination"),
+                               record.get("depart_date"), record.get("return_date"))
+                        index[key] = record["response"]
+                        # 同路線不同日期時的備用回應
+                        index[(key[0], key[1], None, None)] = record["response"]
+                    self._index = index
+        return self._index
+
+    def get(self, origin, destination, depart_date, return_date):
+        """
+        取得封存的回應
+
+        Returns:
+            dict: 相同路線與日期的回應；沒有時回傳相同路線其他日期的回應；都沒有時回傳 None
+        """
+        index = self._load()
+        return (index.get((origin, destination, depart_date, return_date))
+                or index.get((origin, destination, None, None)))
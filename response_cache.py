@@ -0,0 +1,115 @@
+"""
+API 回應快取模組
+以正規化後的查詢參數為 key，快取航班查詢結果（記憶體 LRU + 選用的檔案快取）
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def make_cache_key(url, params):
+    """
+    將查詢參數轉為固定格式的快取 key
+    參數順序、數字/字串型別（例如 adults: 1 與 "1"）不影響結果
+    """
+    canonical = {str(k): str(v).strip() for k, v in params.items() if v is not None}
+    raw = url + "?" + json.dumps(canonical, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """航班查詢結果快取"""
+
+    def __init__(self, ttl_seconds=300, max_entries=128, cache_dir=None):
+        """
+        Args:
+            ttl_seconds: 快取有效秒數
+            max_entries: 記憶體中最多保留幾筆（超過時淘汰最久未使用的）
+            cache_dir: 檔案快取目錄（None 表示只使用記憶體）
+        """
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _read_disk(self, key):
+        """讀取檔案快取，回傳 (expires_at, data) 或 None"""
+        try:
+            with open(self._disk_path(key), "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            return cached["expires_at"], cached["data"]
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+
+    def _write_disk(self, key, expires_at, data):
+        path = self._disk_path(key)
+        tmp_file = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump({"expires_at": expires_at, "data": data}, f, ensure_ascii=False)
+            os.replace(tmp_file, path)
+        except OSError as e:
+            print(f"⚠️ 寫入回應快取失敗: {e}")
+
+    def _remember(self, key, expires_at, data):
+        """放入記憶體快取（呼叫前需持有 self._lock）"""
+        self._entries[key] = (expires_at, data)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key):
+        """取得快取資料，不存在或已過期時回傳 None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry:
+                del self._entries[key]
+
+        if self.cache_dir:
+            entry = self._read_disk(key)
+            if entry and entry[0] > now:
+                with self._lock:
+                    self._remember(key, *entry)
+                    self.hits += 1
+                return entry[1]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, data):
+        """寫入快取"""
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, expires_at, data)
+        if self.cache_dir:
+            self._write_disk(key, expires_at, data)
+
+    def stats(self):
+        """快取命中統計"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self._entries)
+            }
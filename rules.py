@@ -0,0 +1,238 @@
+"""
+規則編譯模組
+將偏好（flight_preferences）與通知規則（notification_rules）預先轉為判斷物件，
+評估時不需再逐項讀取設定 dict；內容相同的設定共用同一個編譯結果
+
+SubscriptionIndex 依路線、航空公司與轉機上限建立訂閱的反向索引，
+每個航班只需與可能符合的訂閱比對
+"""
+
+from operator import attrgetter
+
+from utils import minutes_to_hours, period_of_hour
+
+# 不限航空公司 / 不限轉機次數的索引鍵
+ANY = None
+
+
+def _freeze(value):
+    """設定內容轉為可作為快取鍵的 tuple"""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _period_hours(preference):
+    """時段偏好對應的小時集合（"any" 為 None）"""
+    if preference == "any":
+        return None
+    return frozenset(h for h in range(24) if period_of_hour(h) == preference)
+
+
+class PreferenceRule:
+    """編譯後的航班偏好（判斷結果與 FlightInfo.matches_preferences 相同）"""
+
+    __slots__ = ("preferences", "max_stops", "preferred", "excluded", "max_duration",
+                 "departure_hours", "arrival_hours", "_checks")
+
+    def __init__(self, preferences):
+        preferences = preferences or {}
+        self.preferences = preferences
+        self.max_stops = preferences.get("max_stops")
+        self.preferred = frozenset(preferences.get("preferred_airlines") or ()) or None
+        self.excluded = frozenset(preferences.get("excluded_airlines") or ())
+        self.max_duration = preferences.get("max_duration_hours")
+        self.departure_hours = _period_hours(preferences.get("departure_time_preference", "any"))
+        self.arrival_hours = _period_hours(preferences.get("arrival_time_preference", "any"))
+
+        # 只保留有設定的條件
+        checks = []
+        if self.max_stops is not None:
+            checks.append(lambda f, limit=self.max_stops: f.outbound_stops <= limit)
+        if self.preferred:
+            checks.append(lambda f, codes=self.preferred: f.airline_code in codes)
+        if self.excluded:
+            checks.append(lambda f, codes=self.excluded: f.airline_code not in codes)
+        if self.max_duration is not None:
+            checks.append(lambda f, limit=self.max_duration: minutes_to_hours(f.outbound_minutes) <= limit)
+        if self.departure_hours is not None:
+            checks.append(lambda f, hours=self.departure_hours: f.departure_hour in hours)
+        if self.arrival_hours is not None:
+            checks.append(lambda f, hours=self.arrival_hours: f.arrival_hour in hours)
+        self._checks = tuple(checks)
+
+    def matches(self, flight):
+        for check in self._checks:
+            if not check(flight):
+                return False
+        return True
+
+    __call__ = matches
+
+
+class NotificationRule:
+    """編譯後的通知規則（判斷結果與原本的 should_notify 相同）"""
+
+    __slots__ = ("rules", "notify_on_any_drop", "target_price", "threshold_percent", "threshold_amount")
+
+    def __init__(self, rules):
+        rules = rules or {}
+        self.rules = rules
+        self.notify_on_any_drop = rules.get("notify_on_any_drop", False)
+        self.target_price = rules.get("target_price")
+        self.threshold_percent = rules.get("price_drop_threshold_percent", 0)
+        self.threshold_amount = rules.get("price_drop_threshold_amount", 0)
+
+    def evaluate(self, last_price, new_price):
+        """
+        判斷是否應該發送通知
+
+        Returns:
+            tuple: (是否通知, 原因)
+        """
+        # 如果價格上升或不變，不通知
+        if new_price >= last_price:
+            return False, "價格未下降"
+
+        # 計算降幅
+        price_drop = last_price - new_price
+        drop_percent = (price_drop / last_price) * 100
+
+        if self.notify_on_any_drop:
+            return True, f"任何降價都通知模式 (降幅: {price_drop:.0f}, {drop_percent:.1f}%)"
+
+        if self.target_price is not None and new_price <= self.target_price:
+            return True, f"達到目標價格 NT$ {self.target_price:,.0f}"
+
+        # 降幅門檻（百分比或金額，滿足其一即可）
+        if drop_percent >= self.threshold_percent:
+            return True, f"降幅 {drop_percent:.1f}% 超過門檻 {self.threshold_percent}%"
+
+        if price_drop >= self.threshold_amount:
+            return True, f"降幅 NT$ {price_drop:.0f} 超過門檻 NT$ {self.threshold_amount}"
+
+        return False, f"降幅不足 (降幅: {price_drop:.0f}, {drop_percent:.1f}%)"
+
+
+# 編譯結果快取: {設定內容: 規則物件}
+_PREFERENCE_RULES = {}
+_NOTIFICATION_RULES = {}
+_CACHE_LIMIT = 4096
+
+
+def _compile(cache, cls, value):
+    key = _freeze(value or {})
+    rule = cache.get(key)
+    if rule is None:
+        if len(cache) >= _CACHE_LIMIT:
+            cache.clear()
+        rule = cache[key] = cls(value)
+    return rule
+
+
+def compile_preferences(preferences):
+    """取得偏好的編譯結果（內容相同的設定共用同一個物件）"""
+    if isinstance(preferences, PreferenceRule):
+        return preferences
+    return _compile(_PREFERENCE_RULES, PreferenceRule, preferences)
+
+
+def compile_notification_rules(rules):
+    """取得通知規則的編譯結果（內容相同的設定共用同一個物件）"""
+    if isinstance(rules, NotificationRule):
+        return rules
+    return _compile(_NOTIFICATION_RULES, NotificationRule, rules)
+
+
+class SubscriptionIndex:
+    """訂閱的反向索引：路線 → 航空公司 → 轉機上限"""
+
+    def __init__(self):
+        # {路線: {航空公司或 ANY: {轉機上限或 ANY: [(訂閱鍵, PreferenceRule)]}}}
+        self._routes = {}
+        # {訂閱鍵: (路線, PreferenceRule)}
+        self._keys = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, route, key, preferences=None):
+        """
+        加入訂閱（相同訂閱鍵已存在時取代原本的設定）
+
+        Args:
+            route: 路線（查詢條件）識別鍵
+            key: 訂閱識別鍵
+            preferences: 偏好 dict 或 PreferenceRule
+        """
+        self.remove(key)
+        rule = compile_preferences(preferences)
+        entry = (key, rule)
+        airlines = self._routes.setdefault(route, {})
+        for airline in (rule.preferred or (ANY,)):
+            airlines.setdefault(airline, {}).setdefault(rule.max_stops, []).append(entry)
+        self._keys[key] = (route, rule)
+
+    def remove(self, key):
+        """移除訂閱（不存在時不做任何事）"""
+        existing = self._keys.pop(key, None)
+        if existing is None:
+            return
+        route, rule = existing
+        airlines = self._routes[route]
+        for airline in (rule.preferred or (ANY,)):
+            limits = airlines[airline]
+            entries = [entry for entry in limits[rule.max_stops] if entry[0] != key]
+            if entries:
+                limits[rule.max_stops] = entries
+            else:
+                del limits[rule.max_stops]
+                if not limits:
+                    del airlines[airline]
+        if not airlines:
+            del self._routes[route]
+
+    def candidates(self, route, flight):
+        """可能符合此航班的訂閱（只比對同一路線、同航空公司或不限、轉機上限足夠的訂閱）"""
+        airlines = self._routes.get(route)
+        if not airlines:
+            return
+        stops = flight.outbound_stops
+        for airline in (flight.airline_code, ANY):
+            limits = airlines.get(airline)
+            if not limits:
+                continue
+            for limit, entries in limits.items():
+                if limit is ANY or stops <= limit:
+                    yield from entries
+
+    def match(self, route, flights, top_k=10):
+        """
+        將一批航班與路線上的訂閱比對
+
+        航班先依價格排序一次，每個訂閱只需保留最先符合的 top_k 個
+        （相同價格時保留先出現的，與 TopK 相同）
+
+        Returns:
+            dict: {訂閱鍵: (最便宜的 top_k 個符合航班, 符合數量)}，沒有符合航班的訂閱不會出現
+        """
+        results = {}
+        # 同航空公司、同轉機次數的航班候選訂閱相同，只需查詢一次
+        candidates = {}
+        for flight in sorted(flights, key=attrgetter("price_minor")):
+            group = (flight.airline_code, flight.outbound_stops)
+            entries = candidates.get(group)
+            if entries is None:
+                entries = candidates[group] = tuple(self.candidates(route, flight))
+            for key, rule in entries:
+                if rule.matches(flight):
+                    result = results.get(key)
+                    if result is None:
+                        results[key] = [[flight], 1]
+                    else:
+                        result[1] += 1
+                        if len(result[0]) < top_k:
+                            result[0].append(flight)
+        return {key: (items, count) for key, (items, count) in results.items()}
@@ -0,0 +1,54 @@
+"""
+請求合併模組（single-flight）
+相同 key 的請求同時進行時只執行一次，其他呼叫者等待並共用同一個結果
+"""
+
+import threading
+
+
+class _Call:
+    """進行中的請求"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """合併同時進行的相同請求"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """
+        執行 fn()；若相同 key 的請求正在進行，則等待並回傳它的結果
+
+        Returns:
+            fn() 的回傳值（fn 拋出例外時，所有等待者都會收到同一個例外）
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not is_leader:
+            call.done.wait()
+            if call.error:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
@@ -0,0 +1,155 @@
+"""
+訂閱模組
+多個訂閱者共用同一組路線/日期查詢：API 只呼叫一次、航班只解析一次，
+再依每位訂閱者各自的偏好與通知規則判斷是否通知
+
+訂閱以反向索引（路線 → 航空公司 → 轉機上限）管理，每個航班只與可能符合的訂閱比對，
+訂閱者增加時每個航班的比對成本大致不變
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from response_cache import make_cache_key
+from rules import SubscriptionIndex
+import ticket_searcher
+from ticket_searcher import TicketSearcher, FLIGHT_SEARCH_URL, SINGLE_FLIGHT, config
+from topk import TopK
+
+
+class Subscription:
+    """訂閱者（一組偏好與通知規則）"""
+
+    def __init__(self, name, origin, destination, depart_date, return_date,
+                 preferences=None, notification_rules=None, search_params=None):
+        self.name = name
+        self.origin = origin
+        self.destination = destination
+        self.depart_date = depart_date
+        self.return_date = return_date
+        self.preferences = preferences
+        self.notification_rules = notification_rules
+        self.search_params = search_params or {}
+
+    @classmethod
+    def from_config(cls, entry):
+        """由 config.yaml 的 subscriptions.subscribers 項目建立"""
+        entry = dict(entry)
+        return cls(
+            entry.pop('name'),
+            entry.pop('originLocationCode'),
+            entry.pop('destinationLocationCode'),
+            str(entry.pop('departureDate')),
+            str(entry.pop('returnDate')),
+            preferences=entry.pop('flight_preferences', None),
+            notification_rules=entry.pop('notification_rules', None),
+            search_params=entry
+        )
+
+
+class SubscriptionHub:
+    """將訂閱者依查詢條件分組，每組只查詢一次"""
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max(1, max_workers)
+        # {查詢鍵: {訂閱鍵: (Subscription, TicketSearcher)}}
+        self._groups = {}
+        # {訂閱鍵: 查詢鍵}
+        self._group_of = {}
+        self.index = SubscriptionIndex()
+
+    def _searcher_for(self, subscription):
+        return TicketSearcher(
+            subscription.origin,
+            subscription.destination,
+            subscription.depart_date,
+            subscription.return_date,
+            search_params=subscription.search_params,
+            preferences=subscription.preferences,
+            notification_rules=subscription.notification_rules,
+            state_key=f"sub:{subscription.name}"
+        )
+
+    def subscribe(self, subscription):
+        """加入訂閱者；查詢參數相同的訂閱者會被分到同一組（同名的訂閱者會取代原本的設定）"""
+        searcher = self._searcher_for(subscription)
+        key = make_cache_key(FLIGHT_SEARCH_URL, searcher.search_params)
+        previous = self._group_of.get(searcher.state_key)
+        if previous is not None and previous != key:
+            members = self._groups[previous]
+            del members[searcher.state_key]
+            if not members:
+                del self._groups[previous]
+        self._groups.setdefault(key, {})[searcher.state_key] = (subscription, searcher)
+        self._group_of[searcher.state_key] = key
+        self.index.add(key, searcher.state_key, searcher.preference_rule)
+
+    def fetch_shared(self, key, searcher):
+        """查詢並解析航班（同一組查詢同時只會執行一次）"""
+        def fetch():
+            return searcher.parse_offers(searcher.fetch_offers())
+
+        return SINGLE_FLIGHT.do(("parsed", key), fetch)
+
+    def _run_group(self, key, members):
+        """執行一組訂閱：查詢一次，以索引一次比對所有訂閱者，再分別判斷是否通知"""
+        results = []
+        try:
+            all_flights = self.fetch_shared(key, next(iter(members.values()))[1])
+        except Exception as e:
+            print(f"❌ 查詢失敗: {e}")
+            all_flights = None
+
+        matched = {}
+        cheapest = None
+        if all_flights:
+            # TOP_K 可能隨設定檔重新載入改變，每次執行時讀取
+            top_k = ticket_searcher.TOP_K
+            matched = self.index.match(key, all_flights, top_k)
+            if len(matched) < len(members):
+                # 沒有符合偏好的訂閱者改為顯示所有航班中最便宜的幾個
+                cheapest = TopK(top_k)
+                cheapest.extend(all_flights)
+                cheapest = cheapest.items()
+
+        for sub_key, (subscription, searcher) in members.items():
+            result = {"name": subscription.name, "success": False, "price": None}
+            if all_flights:
+                try:
+                    if sub_key in matched:
+                        flights, searcher.match_count = matched[sub_key]
+                    else:
+                        print(f"⚠️ 訂閱 {subscription.name} 沒有找到符合偏好條件的航班，顯示所有航班")
+                        flights, searcher.match_count = cheapest, len(all_flights)
+                    result["success"] = searcher.check_price(filtered_flights=flights)
+                    result["price"] = searcher.current_price
+                except Exception as e:
+                    print(f"❌ 訂閱 {subscription.name} 處理失敗: {e}")
+            results.append(result)
+        return results
+
+    def run(self):
+        """執行所有訂閱，回傳每位訂閱者的結果"""
+        total = sum(len(members) for members in self._groups.values())
+        print(f"\n📬 共 {total} 位訂閱者，合併為 {len(self._groups)} 組查詢")
+
+        results = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self._run_group, key, members)
+                       for key, members in self._groups.items()]
+            for future in as_completed(futures):
+                results.extend(future.result())
+
+        succeeded = sum(1 for r in results if r["success"])
+        print(f"\n📊 訂閱處理完成：成功 {succeeded} 位，失敗 {len(results) - succeeded} 位")
+        return results
+
+
+def run_subscriptions():
+    """依 config.yaml 的 subscriptions 設定執行所有訂閱"""
+    subscriptions_config = config.get('subscriptions') or {}
+    hub = SubscriptionHub(
+        max_workers=subscriptions_config.get('max_workers', 4)
+    )
+    for entry in subscriptions_config.get('subscribers') or []:
+        hub.subscribe(Subscription.from_config(entry))
+    return hub.run()
@@ -0,0 +1,146 @@
+"""
+模擬航班資料模組
+產生與 Amadeus flight-offers 回應格式相同的假資料（直飛 / 轉機、多家航空、不同時段與票價），
+供效能測試與本機模擬伺服器使用，相同 seed 會產生完全相同的內容
+"""
+
+import json
+import random
+from datetime import datetime, timedelta
+
+CARRIERS = {"BR": "EVA AIRWAYS", "CI": "CHINA AIRLINES", "JX": "STARLUX AIRLINES",
+            "IT": "TIGERAIR TAIWAN", "JL": "JAPAN AIRLINES", "NH": "ALL NIPPON AIRWAYS",
+            "MM": "PEACH AVIATION", "CX": "CATHAY PACIFIC", "KE": "KOREAN AIR",
+            "OZ": "ASIANA AIRLINES", "SQ": "SINGAPORE AIRLINES", "TG": "THAI AIRWAYS",
+            "TR": "SCOOT", "UA": "UNITED AIRLINES"}
+_CARRIER_CODES = tuple(CARRIERS)
+HUBS = ("HKG", "ICN", "PVG", "MNL", "BKK", "SIN", "KIX", "OKA")
+AIRCRAFT = {"321": "AIRBUS A321", "333": "AIRBUS A330-300", "359": "AIRBUS A350-900",
+            "738": "BOEING 737-800", "77W": "BOEING 777-300ER", "789": "BOEING 787-9"}
+
+# 轉機次數的比例：直飛 60%、一次轉機 30%、兩次轉機 10%
+_STOP_WEIGHTS = (60, 30, 10)
+
+
+def _iso_duration(minutes):
+    hours, mins = divmod(minutes, 60)
+    text = "PT"
+    if hours:
+        text += f"{hours}H"
+    if mins or not hours:
+        text += f"{mins}M"
+    return text
+
+
+def _itinerary(rnd, origin, destination, date, carrier, block_minutes, number_base):
+    """產生單程行程（0 ~ 2 次轉機）"""
+    stops = rnd.choices(range(len(_STOP_WEIGHTS)), weights=_STOP_WEIGHTS)[0]
+    hubs = rnd.sample([h for h in HUBS if h not in (origin, destination)], stops)
+    airports = [origin] + hubs + [destination]
+
+    at = date + timedelta(hours=rnd.randint(0, 23), minutes=rnd.choice(range(0, 60, 5)))
+    start = at
+    segments = []
+    for i in range(len(airports) - 1):
+        # 轉機航段可能由其他航空公司執飛
+        seg_carrier = carrier if i == 0 or rnd.random() < 0.7 else rnd.choice(_CARRIER_CODES)
+        minutes = max(50, int(block_minutes / (stops + 1) * rnd.uniform(0.8, 1.3)))
+        arrive = at + timedelta(minutes=minutes)
+        segments.append({
+            "departure": {"iataCode": airports[i], "at": at.strftime("%Y-%m-%dT%H:%M:%S")},
+            "arrival": {"iataCode": airports[i + 1], "at": arrive.strftime("%Y-%m-%dT%H:%M:%S")},
+            "carrierCode": seg_carrier,
+            "number": str(number_base + rnd.randint(0, 899)),
+            "aircraft": {"code": rnd.choice(tuple(AIRCRAFT))},
+            "duration": _iso_duration(minutes),
+            "id": str(rnd.randint(1, 9999)),
+            "numberOfStops": 0
+        })
+        at = arrive + timedelta(minutes=rnd.randint(60, 300))
+
+    total = int((arrive - start).total_seconds() // 60)
+    return {"duration": _iso_duration(total), "segments": segments}, stops
+
+
+def generate_offer(rnd, index, origin="TPE", destination="NRT", depart_date="2026-03-06",
+                   return_date="2026-03-11", currency="TWD", block_minutes=200):
+    """
+    產生一筆航班資料
+
+    Args:
+        rnd: random.Random 物件
+        index: 航班序號（作為 id）
+        block_minutes: 直飛的飛行時間（分鐘），轉機行程會依此拉長
+    """
+    carrier = rnd.choice(_CARRIER_CODES)
+    itineraries = []
+    total_stops = 0
+    for o, d, date in ((origin, destination, depart_date), (destination, origin, return_date)):
+        if not date:
+            continue
+        itinerary, stops = _itinerary(rnd, o, d, datetime.strptime(date, "%Y-%m-%d"),
+                                      carrier, block_minutes, 100 if o == origin else 1000)
+        itineraries.append(itinerary)
+        total_stops += stops
+
+    # 轉機較便宜、加上隨機浮動，偶爾出現特價
+    base = 9000 * (1 - 0.12 * total_stops) * rnd.uniform(0.75, 1.6)
+    if rnd.random() < 0.03:
+        base *= 0.6
+    total = round(base, 2)
+    return {
+        "type": "flight-offer",
+        "id": str(index),
+        "source": "GDS",
+        "instantTicketingRequired": False,
+        "nonHomogeneous": False,
+        "oneWay": False,
+        "lastTicketingDate": depart_date,
+        "numberOfBookableSeats": rnd.randint(1, 9),
+        "itineraries": itineraries,
+        "price": {
+            "currency": currency,
+            "total": f"{total:.2f}",
+            "base": f"{total * 0.8:.2f}",
+            "fees": [{"amount": "0.00", "type": "SUPPLIER"}, {"amount": "0.00", "type": "TICKETING"}],
+            "grandTotal": f"{total:.2f}"
+        },
+        "pricingOptions": {"fareType": ["PUBLISHED"], "includedCheckedBagsOnly": rnd.random() < 0.5},
+        "validatingAirlineCodes": [carrier],
+        "travelerPricings": [{
+            "travelerId": "1",
+            "fareOption": "STANDARD",
+            "travelerType": "ADULT",
+            "price": {"currency": currency, "total": f"{total:.2f}", "base": f"{total * 0.8:.2f}"}
+        }]
+    }
+
+
+def generate_payload(count, seed=0, origin="TPE", destination="NRT", depart_date="2026-03-06",
+                     return_date="2026-03-11", currency="TWD"):
+    """
+    產生完整的 flight-offers 回應（含 meta 與 dictionaries）
+
+    Returns:
+        dict: {"meta": ..., "data": [...], "dictionaries": ...}
+    """
+    rnd = random.Random(seed)
+    block_minutes = rnd.randint(150, 420)
+    data = [generate_offer(rnd, i + 1, origin, destination, depart_date, return_date,
+                           currency, block_minutes) for i in range(count)]
+    locations = {code: {"cityCode": code, "countryCode": "XX"} for code in (origin, destination) + HUBS}
+    return {
+        "meta": {"count": count},
+        "data": data,
+        "dictionaries": {
+            "locations": locations,
+            "aircraft": dict(AIRCRAFT),
+            "currencies": {currency: currency},
+            "carriers": dict(CARRIERS)
+        }
+    }
+
+
+def generate_payload_bytes(count, seed=0, **kwargs):
+    """產生回應並序列化為 bytes（與 API 回傳的原始內容相同格式）"""
+    return json.dumps(generate_payload(count, seed, **kwargs), separators=(",", ":")).encode("utf-8")
@@ -0,0 +1,36 @@
+"""
+測試共用設定
+以暫存目錄中的 config.yaml（mock 模式、不寄信）執行，避免讀寫正式的記錄與設定
+"""
+
+import os
+import sys
+import tempfile
+
+import yaml
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORK_DIR = tempfile.mkdtemp(prefix="flight-monitor-tests-")
+
+
+def _write_test_config():
+    with open(os.path.join(ROOT, "config.yaml"), "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f)
+    data["replay"]["mode"] = "mock"
+    data["replay"]["mock_url"] = "http://127.0.0.1:9"
+    data["email"]["recipients"] = ["test@example.com"]
+    data["notifications"]["window_seconds"] = 0
+    data["response_archive"]["enabled"] = False
+    data["metrics"]["enabled"] = False
+    for key in ("airports_file", "airlines_file"):
+        data["reference_data"][key] = os.path.join(ROOT, data["reference_data"][key])
+    path = os.path.join(WORK_DIR, "config.yaml")
+    with open(path, "w", encoding="utf-8") as f:
+        yaml.safe_dump(data, f, allow_unicode=True)
+    return path
+
+
+# 必須在匯入任何專案模組之前設定（app_config 匯入時就會讀取設定檔）
+os.environ["FLIGHT_MONITOR_CONFIG"] = _write_test_config()
+os.chdir(WORK_DIR)
+sys.path.insert(0, ROOT)
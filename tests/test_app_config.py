@@ -0,0 +1,50 @@
+import os
+
+import pytest
+import yaml
+
+import ticket_searcher
+from app_config import config
+from email_formatter import EmailFormatter
+from utils import get_airport_name
+
+
+def _write(data):
+    with open(config.path, "w", encoding="utf-8") as f:
+        yaml.safe_dump(data, f, allow_unicode=True)
+    # 確保修改時間不同（部分檔案系統的時間精度較低）
+    st = os.stat(config.path)
+    os.utime(config.path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+@pytest.fixture
+def edit_config():
+    with open(config.path, "r", encoding="utf-8") as f:
+        original = f.read()
+    yield lambda: yaml.safe_load(original)
+    with open(config.path, "w", encoding="utf-8") as f:
+        f.write(original)
+    st = os.stat(config.path)
+    os.utime(config.path, ns=(st.st_atime_ns, st.st_mtime_ns + 2_000_000_000))
+    assert config.reload_if_changed()
+
+
+def test_reload_rebuilds_derived_values(edit_config):
+    data = edit_config()
+    assert ticket_searcher.TOP_K == 10
+    formatter = EmailFormatter("TPE", "NRT", "2026-03-06", "2026-03-11", 1)
+    assert "桃園" in formatter.create_price_drop_email(10000, 9000, [])
+
+    data["display_settings"]["top_k"] = 25
+    data["display_settings"]["max_results_in_email"] = 7
+    data["history"]["skip_unchanged"] = False
+    data["mappings"]["airport_names"]["TPE"] = "測試機場"
+    _write(data)
+    assert config.reload_if_changed()
+
+    assert ticket_searcher.TOP_K == 25
+    assert ticket_searcher.SKIP_UNCHANGED is False
+    assert ticket_searcher.NOTIFIER.max_results == 7
+    assert get_airport_name("TPE") == "測試機場"
+    # 郵件標頭快取已清除，使用新的名稱
+    assert "測試機場" in formatter.create_price_drop_email(10000, 9000, [])
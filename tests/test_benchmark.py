@@ -0,0 +1,17 @@
+"""效能測試的封存回應重播"""
+
+from benchmark import replay_datasets
+from response_archive import ResponseArchive
+
+
+def test_replay_skips_empty_responses(tmp_path):
+    archive = ResponseArchive(str(tmp_path))
+    params = {"originLocationCode": "TPE", "destinationLocationCode": "NRT"}
+    archive.submit("TPE-NRT", params, {"data": [{"id": "1"}]})
+    # 空的回應會被封存成 "response": null
+    archive.submit("TPE-KIX", params, b"")
+    archive.submit("TPE-OKA", params, {"errors": []})
+    archive.close()
+
+    datasets = list(replay_datasets(str(tmp_path)))
+    assert [name for name, raw in datasets] == ["replay-TPE-NRT"]
@@ -0,0 +1,45 @@
+"""舊版價格記錄轉移"""
+
+import os
+
+from history_store import HistoryStore
+from legacy_state import migrate_legacy_state
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def test_migrate_legacy_state_imports_once(tmp_path):
+    db_file = str(tmp_path / "history.db")
+    state_dir = str(tmp_path / "state")
+    config = {
+        "search_params": {"originLocationCode": "TPE", "destinationLocationCode": "NRT",
+                          "departureDate": "2026-03-06", "returnDate": "2026-03-11"},
+        "files": {"last_price_file": str(tmp_path / "last_price.txt"), "history_db_file": db_file},
+        "watchlist": {"routes": [{"originLocationCode": "TPE", "destinationLocationCode": "KIX",
+                                  "departureDate": "2026-03-06", "returnDate": "2026-03-11"}]},
+        "subscriptions": {"subscribers": [{"name": "direct only"}]},
+    }
+    _write(str(tmp_path / "last_price.txt"), "12000")
+    _write(os.path.join(state_dir, "last_price_TPE-KIX-2026-03-06-2026-03-11.txt"), "9000")
+    _write(os.path.join(state_dir, "last_price_sub_direct_only.txt"), "8000")
+
+    # 資料庫已有記錄的路線保留原本的價格
+    store = HistoryStore(db_file)
+    store.set_last_price("TPE-KIX-2026-03-06-2026-03-11", 9500)
+    store.close()
+
+    assert migrate_legacy_state(config, state_dir) == 2
+    store = HistoryStore(db_file)
+    assert store.get_last_price("TPE-NRT-2026-03-06-2026-03-11") == 12000
+    assert store.get_last_price("TPE-KIX-2026-03-06-2026-03-11") == 9500
+    assert store.get_last_price("sub:direct only") == 8000
+    store.close()
+
+    assert not os.path.exists(str(tmp_path / "last_price.txt"))
+    assert os.path.exists(str(tmp_path / "last_price.txt.migrated"))
+    # 已轉移的檔案不會再次匯入
+    assert migrate_legacy_state(config, state_dir) == 0
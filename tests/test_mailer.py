@@ -0,0 +1,48 @@
+import time
+
+import pytest
+
+from mailer import MailQueue
+
+
+class FakeConnection:
+    idle_timeout = 60
+
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.sent = []
+
+    def send(self, msg):
+        time.sleep(self.delay)
+        self.sent.append(msg)
+
+    def close(self):
+        pass
+
+    def close_if_idle(self):
+        pass
+
+
+def test_submit_without_recipients_fails_immediately():
+    connection = FakeConnection()
+    mail_queue = MailQueue(connection, "sender@example.com")
+    future = mail_queue.submit("body", "subject", [])
+    with pytest.raises(ValueError):
+        future.result(timeout=1)
+    mail_queue.close()
+    assert connection.sent == []
+
+
+def test_close_waits_at_most_shutdown_timeout():
+    # 寄一封要 0.6 秒，另一封受同一收件人的間隔限制延後 60 秒
+    connection = FakeConnection(delay=0.6)
+    mail_queue = MailQueue(connection, "sender@example.com", per_recipient_interval=60, shutdown_timeout=1)
+    first = mail_queue.submit("a", "subject", ["r@example.com"])
+    second = mail_queue.submit("b", "subject", ["r@example.com"])
+
+    start = time.monotonic()
+    mail_queue.close()
+    assert time.monotonic() - start < 1.5
+    assert first.result(timeout=1) is True
+    with pytest.raises(RuntimeError):
+        second.result(timeout=1)
@@ -0,0 +1,59 @@
+import json
+from concurrent.futures import Future
+
+import pytest
+
+import mailer
+from flightInfo import FlightInfo
+from history_store import HistoryStore
+from notifier import Alert, NotificationEngine
+from synthetic_offers import generate_payload_bytes
+
+
+@pytest.fixture
+def flights():
+    offers = json.loads(generate_payload_bytes(10, seed=3))["data"]
+    return sorted((FlightInfo(offer) for offer in offers), key=lambda f: f.price_minor)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"), batch_size=1)
+    yield NotificationEngine(store, content_file=str(tmp_path / "email_content.txt"))
+    store.close()
+
+
+def _alert(flights, route="TPE-NRT"):
+    return Alert(route, "TPE", "NRT", "2026-03-06", "2026-03-11", 1, flights[0].price * 1.2,
+                 flights[0].price, "test", flights[:3], recipients=["a@example.com"])
+
+
+def _fake_queue(monkeypatch, error=None):
+    sent = []
+
+    def queue_email(body, subject=None, recipients=None, metrics=None, html=None):
+        sent.append(body)
+        future = Future()
+        if error is None:
+            future.set_result(True)
+        else:
+            future.set_exception(error)
+        return future
+
+    monkeypatch.setattr(mailer, "queue_email", queue_email)
+    return sent
+
+
+def test_content_file_written_after_send(engine, flights, monkeypatch):
+    sent = _fake_queue(monkeypatch)
+    assert engine.submit(_alert(flights)) == ["a@example.com"]
+    assert len(sent) == 1
+    with open(engine.content_file, encoding="utf-8") as f:
+        assert f.read() == sent[0]
+
+
+def test_content_file_not_written_when_send_fails(engine, flights, monkeypatch):
+    _fake_queue(monkeypatch, error=RuntimeError("smtp down"))
+    engine.submit(_alert(flights))
+    with pytest.raises(FileNotFoundError):
+        open(engine.content_file, encoding="utf-8")
@@ -0,0 +1,33 @@
+"""回應封存的保留數量"""
+
+import gzip
+import os
+import time
+
+from response_archive import ResponseArchive, archive_files
+
+
+def _archive_file(directory, stamp, pid, age_seconds):
+    path = os.path.join(str(directory), f"responses-{stamp}-{pid}.ndjson.gz")
+    with gzip.open(path, "wb"):
+        pass
+    mtime = time.time() - age_seconds
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_retention_keeps_files_other_processes_may_still_write(tmp_path):
+    other_pid = os.getpid() + 1
+    own_old = _archive_file(tmp_path, "20260101-000000", os.getpid(), 7200)
+    other_stale = _archive_file(tmp_path, "20260101-000001", other_pid, 7200)
+    other_active = _archive_file(tmp_path, "20260101-000002", other_pid, 60)
+
+    archive = ResponseArchive(str(tmp_path), rotate_hours=1, max_files=1)
+    archive.submit("TPE-NRT", {}, {"data": []})
+    archive.close()
+
+    remaining = archive_files(str(tmp_path))
+    assert own_old not in remaining
+    assert other_stale not in remaining
+    assert other_active in remaining
+    assert archive._path in remaining
@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+import history_store
+import ticket_searcher
+from flightInfo import FlightInfo
+from history_store import HistoryStore
+from synthetic_offers import generate_payload_bytes
+
+DAY = 86400
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = HistoryStore(str(tmp_path / "history.db"), batch_size=1)
+    monkeypatch.setattr(ticket_searcher, "HISTORY_STORE", store)
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def flights():
+    offers = json.loads(generate_payload_bytes(30, seed=7))["data"]
+    return sorted((FlightInfo(offer) for offer in offers), key=lambda f: f.price_minor)[:10]
+
+
+def _searcher():
+    return ticket_searcher.TicketSearcher("TPE", "NRT", "2026-03-06", "2026-03-11",
+                                          state_key="test:unchanged")
+
+
+def test_unchanged_route_keeps_price_history(store, flights, monkeypatch):
+    clock = FakeClock(1_800_000_000.0)
+    monkeypatch.setattr(history_store, "time", clock)
+    searcher = _searcher()
+    searcher.match_count = len(flights)
+
+    # 每 3 天查詢一次，共 10 天，航班與價格都沒有變化
+    for day in (0, 3, 6, 9):
+        clock.now = 1_800_000_000.0 + day * DAY
+        assert searcher.check_price(filtered_flights=flights)
+
+    assert store.min_price(searcher.state_key, days=7) == flights[0].price
+    history = store.price_history(searcher.state_key, days=7)
+    assert [round((ts - 1_800_000_000.0) / DAY) for ts, _ in history] == [3, 6, 9]
+    assert all(price == flights[0].price for _, price in history)
+
+    # 只有第一次查詢寫入航班摘要
+    rows = store._conn.execute(
+        "SELECT top_offers FROM observations WHERE route = ? ORDER BY observed_at", (searcher.state_key,)
+    ).fetchall()
+    assert rows[0][0] is not None
+    assert [row[0] for row in rows[1:]] == [None, None, None]
@@ -1,31 +1,59 @@
 from datetime import datetime
-import requests
-import json
-from utils import get_airport_name, get_airline_name
-from email_formatter import EmailFormatter
+import atexit
+from urllib.parse import urlparse
+from utils import get_airport_name, get_airline_name, route_key, REFERENCE_DATA
 from flightInfo import FlightInfo
-import yaml
-
-# 读取 YAML 配置文件
-with open("config.yaml", "r", encoding="utf-8") as f:
-    config = yaml.safe_load(f)
+from token_cache import TokenCache
+from http_client import HttpClient
+from rate_limiter import RateLimiter
+from response_cache import ResponseCache, make_cache_key
+from single_flight import SingleFlight
+from history_store import HistoryStore
+from offer_stream import OfferStream
+from response_archive import ResponseArchive, ResponseSpool, ArchiveReplay
+from execution_log import ExecutionLog
+from metrics import Metrics
+from notifier import Alert, NotificationEngine
+from rules import compile_preferences, compile_notification_rules
+from offer_diff import diff_offers
+from offer_batch import OfferBatch
+from topk import TopK
+import offer_batch
+from app_config import config
 
 # 从 config 中提取各项配置
 AMADEUS_API_KEY = config['amadeus']['api_key']
 AMADEUS_API_SECRET = config['amadeus']['api_secret']
 TOKEN_URL = config['amadeus']['token_url']
 FLIGHT_SEARCH_URL = config['amadeus']['flight_search_url']
+TOKEN_REFRESH_MARGIN = config['amadeus'].get('token_refresh_margin_seconds', 60)
 
 # 文件设置
-LAST_PRICE_FILE = config['files']['last_price_file']
-HISTORY_LOG_FILE = config['files']['history_log_file']
+HISTORY_DB_FILE = config['files'].get('history_db_file', 'flight_history.db')
 ERROR_LOG_FILE = config['files']['error_log_file']
 EMAIL_CONTENT_FILE = config['files']['email_content_file']
 EXECUTION_LOG_FILE = config['files']['execution_log_file']
+TOKEN_CACHE_FILE = config['files'].get('token_cache_file', 'token_cache.json')
 
-# 机场和航空公司名称映射
-AIRPORT_NAMES = config['mappings']['airport_names']
-AIRLINE_NAMES = config['mappings']['airline_names']
+# 離線測試：mock 連到本機模擬伺服器（mock_amadeus.py），archive 直接重播封存的回應
+# 兩種模式都使用另外的 token 快取、價格歷史與限流狀態，不會影響正式的記錄
+REPLAY_SETTINGS = config.get('replay') or {}
+REPLAY_MODE = REPLAY_SETTINGS.get('mode') or 'off'
+ARCHIVE_REPLAY = None
+if REPLAY_MODE == 'mock':
+    MOCK_URL = REPLAY_SETTINGS.get('mock_url', 'http://127.0.0.1:8080').rstrip('/')
+    TOKEN_URL = MOCK_URL + urlparse(TOKEN_URL).path
+    FLIGHT_SEARCH_URL = MOCK_URL + urlparse(FLIGHT_SEARCH_URL).path
+    TOKEN_CACHE_FILE = REPLAY_SETTINGS.get('token_cache_file', 'token_cache_replay.json')
+elif REPLAY_MODE == 'archive':
+    ARCHIVE_REPLAY = ArchiveReplay(REPLAY_SETTINGS.get('archive', 'archive'))
+# 離線測試也不寄出真正的郵件（通知改寫入檔案，除非 replay.send_email 為 true），
+# 限流狀態也另外記錄，模擬伺服器的 429 不會讓同一台機器上的正式監控暫停
+OUTBOX_FILE = None
+if REPLAY_MODE != 'off':
+    HISTORY_DB_FILE = REPLAY_SETTINGS.get('history_db_file', 'flight_history_replay.db')
+    if not REPLAY_SETTINGS.get('send_email', False):
+        OUTBOX_FILE = REPLAY_SETTINGS.get('outbox_file', 'email_replay.txt')
 
 # 搜索参数
 SEARCH_PARAMS = config['search_params']
@@ -38,12 +66,160 @@ FLIGHT_PREFERENCES = config['flight_preferences']
 
 # 显示设置
 DISPLAY_SETTINGS = config['display_settings']
+
+# 航班數達到門檻時改用 numpy 向量化篩選（未安裝 numpy 時自動使用一般篩選）
+VECTORIZE_MIN_OFFERS = (config.get('vectorized_filter') or {}).get('min_offers', 200)
+
+# 串流解析（邊下載邊解析航班）
+STREAMING_SETTINGS = config.get('streaming') or {}
+
+def _top_k(display_settings):
+    return max(10, display_settings.get('top_k', 10), display_settings['max_results_in_email'])
+
+
+# 篩選後只保留最便宜的 K 個航班（至少足夠顯示前 10 名與 Email 內容）
+TOP_K = _top_k(DISPLAY_SETTINGS)
+
+# 價格歷史資料庫（程序結束時寫入尚未寫入的記錄）
+HISTORY_SETTINGS = config.get('history') or {}
+HISTORY_STORE = HistoryStore(HISTORY_DB_FILE, batch_size=HISTORY_SETTINGS.get('batch_size', 20))
+atexit.register(HISTORY_STORE.close)
+
+# 航班與價格和上次查詢完全相同時，歷史記錄不重複寫入航班摘要（最低價與通知判斷照常進行）
+SKIP_UNCHANGED = HISTORY_SETTINGS.get('skip_unchanged', True)
+
+# Access Token 快取（同一程序內的所有 TicketSearcher 共用）
+TOKEN_CACHE = TokenCache(TOKEN_CACHE_FILE, AMADEUS_API_KEY, TOKEN_REFRESH_MARGIN)
+
+# API 限流（同一台機器上的所有程序共用配額）
+RATE_LIMIT_SETTINGS = config.get('rate_limit') or {}
+RATE_LIMITER = None
+if RATE_LIMIT_SETTINGS.get('enabled', False):
+    RATE_LIMITER = RateLimiter(
+        RATE_LIMIT_SETTINGS.get('requests_per_second', 10),
+        burst=RATE_LIMIT_SETTINGS.get('burst'),
+        state_file=(RATE_LIMIT_SETTINGS.get('state_file', 'rate_limit.json') if REPLAY_MODE == 'off'
+                    else REPLAY_SETTINGS.get('rate_limit_state_file', 'rate_limit_replay.json'))
+    )
+
+# 航班查詢結果快取（相同查詢參數在有效期限內只呼叫一次 API）
+RESPONSE_CACHE_SETTINGS = config.get('response_cache') or {}
+RESPONSE_CACHE = None
+if RESPONSE_CACHE_SETTINGS.get('enabled', False):
+    RESPONSE_CACHE = ResponseCache(
+        ttl_seconds=RESPONSE_CACHE_SETTINGS.get('ttl_seconds', 300),
+        max_entries=RESPONSE_CACHE_SETTINGS.get('max_entries', 128),
+        cache_dir=RESPONSE_CACHE_SETTINGS.get('cache_dir')
+    )
+
+# API 原始回應封存（背景寫入，程序結束時寫完剩餘的回應）
+RESPONSE_ARCHIVE_SETTINGS = config.get('response_archive') or {}
+RESPONSE_ARCHIVE = None
+if RESPONSE_ARCHIVE_SETTINGS.get('enabled', False) and REPLAY_MODE == 'off':
+    RESPONSE_ARCHIVE = ResponseArchive(
+        archive_dir=RESPONSE_ARCHIVE_SETTINGS.get('dir', 'archive'),
+        max_file_mb=RESPONSE_ARCHIVE_SETTINGS.get('max_file_mb', 16),
+        rotate_hours=RESPONSE_ARCHIVE_SETTINGS.get('rotate_hours', 24),
+        max_files=RESPONSE_ARCHIVE_SETTINGS.get('max_files', 30)
+    )
+    atexit.register(RESPONSE_ARCHIVE.close)
+
+# 執行記錄（JSON Lines，超過大小上限時輪替）
+EXECUTION_LOG_SETTINGS = config.get('execution_log') or {}
+EXECUTION_LOG = ExecutionLog(
+    EXECUTION_LOG_FILE,
+    max_bytes=int(EXECUTION_LOG_SETTINGS.get('max_kb', 1024) * 1024),
+    backup_count=EXECUTION_LOG_SETTINGS.get('backup_count', 3)
+)
+
+# 同時進行的相同查詢只呼叫一次 API
+SINGLE_FLIGHT = SingleFlight()
+
+# 效能指標（各階段耗時與計數，程序結束時寫入 Prometheus 文字檔）
+METRICS_SETTINGS = config.get('metrics') or {}
+METRICS = Metrics()
+METRICS_TEXTFILE = METRICS_SETTINGS.get('textfile') if METRICS_SETTINGS.get('enabled', False) else None
+PHASE_METRIC = "flight_monitor_phase_seconds"
+if METRICS_TEXTFILE:
+    atexit.register(METRICS.write_textfile, METRICS_TEXTFILE)
+
+# 降價通知（彙整期間內的通知合併為每位收件人一封摘要，並略過冷卻時間內的重複通知）
+NOTIFICATION_SETTINGS = config.get('notifications') or {}
+NOTIFIER = NotificationEngine(
+    HISTORY_STORE,
+    window_seconds=NOTIFICATION_SETTINGS.get('window_seconds', 0),
+    cooldown_seconds=NOTIFICATION_SETTINGS.get('cooldown_hours', 0) * 3600,
+    max_results=DISPLAY_SETTINGS['max_results_in_email'],
+    show_return=DISPLAY_SETTINGS['show_return_flight'],
+    metrics=METRICS,
+    outbox_file=OUTBOX_FILE,
+    content_file=EMAIL_CONTENT_FILE
+)
+
+
+def _apply_config(new_config):
+    """
+    設定檔重新載入後更新由設定推導出的值
+
+    搜尋參數、偏好、通知規則、顯示設定、檔案名稱與通知彙整設定會立即生效；
+    amadeus、replay、rate_limit、response_cache、response_archive、http、metrics、
+    execution_log、email 的 SMTP 設定與 files 中的資料庫 / token 快取路徑需要重新啟動程序
+    """
+    global ERROR_LOG_FILE
+    global VECTORIZE_MIN_OFFERS, STREAMING_SETTINGS, TOP_K, SKIP_UNCHANGED
+    files = new_config['files']
+    ERROR_LOG_FILE = files['error_log_file']
+    VECTORIZE_MIN_OFFERS = (new_config.get('vectorized_filter') or {}).get('min_offers', 200)
+    STREAMING_SETTINGS = new_config.get('streaming') or {}
+    display = new_config['display_settings']
+    TOP_K = _top_k(display)
+    SKIP_UNCHANGED = (new_config.get('history') or {}).get('skip_unchanged', True)
+
+    notifications = new_config.get('notifications') or {}
+    NOTIFIER.window_seconds = notifications.get('window_seconds', 0)
+    NOTIFIER.cooldown_seconds = notifications.get('cooldown_hours', 0) * 3600
+    NOTIFIER.max_results = display['max_results_in_email']
+    NOTIFIER.show_return = display['show_return_flight']
+    NOTIFIER.content_file = files['email_content_file']
+
+
+config.on_reload(_apply_config)
+
+# HTTP 連線池（所有 Amadeus API 呼叫共用）
+HTTP_CLIENT = HttpClient(rate_limiter=RATE_LIMITER, metrics=METRICS, **config.get('http', {}))
+
+
 class TicketSearcher:
-    def __init__(self, origin, destination, depart_date, return_date):
+    def __init__(self, origin, destination, depart_date, return_date, http_client=None,
+                 search_params=None, preferences=None, notification_rules=None,
+                 state_key=None):
         self.origin = origin
         self.destination = destination
         self.depart_date = depart_date
         self.return_date = return_date
+        self.http = http_client or HTTP_CLIENT
+        
+        # 每條路線可覆寫全域的搜尋參數、偏好與通知規則
+        self.search_params = dict(SEARCH_PARAMS)
+        self.search_params.update(search_params or {})
+        self.search_params.update({
+            "originLocationCode": origin,
+            "destinationLocationCode": destination,
+            "departureDate": depart_date,
+            "returnDate": return_date
+        })
+        self.preferences = preferences if preferences is not None else FLIGHT_PREFERENCES
+        self.notification_rules = notification_rules if notification_rules is not None else NOTIFICATION_RULES
+        # 偏好與通知規則預先編譯，篩選每個航班時不需再讀取設定 dict
+        self.preference_rule = compile_preferences(self.preferences)
+        self.notification_rule = compile_notification_rules(self.notification_rules)
+        # 價格記錄以 state_key 區分（預設為路線）
+        self.route = route_key(origin, destination, depart_date, return_date)
+        # 指標只以起訖點區分，避免日期組合造成過多的標籤值
+        self.metric_route = f"{origin}-{destination}"
+        self.state_key = state_key or self.route
+        self.current_price = None
+        self.match_count = 0
         self.execution_start = datetime.now()
 
     def log_to_file(self, filename, content, mode='a'):
@@ -58,22 +234,7 @@ class TicketSearcher:
 
     def log_execution(self, status, message=""):
         """記錄執行狀態"""
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        log_entry = f"[{timestamp}] {status}"
-        if message:
-            log_entry += f" - {message}"
-        log_entry += "\n"
-        
-        try:
-            with open(EXECUTION_LOG_FILE, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-            lines = lines[-99:] if len(lines) >= 100 else lines
-            lines.append(log_entry)
-            with open(EXECUTION_LOG_FILE, 'w', encoding='utf-8') as f:
-                f.writelines(lines)
-        except FileNotFoundError:
-            with open(EXECUTION_LOG_FILE, 'w', encoding='utf-8') as f:
-                f.write(log_entry)
+        EXECUTION_LOG.write(status, message, route=self.state_key)
 
     def log_error(self, error_msg, error_detail=""):
         """記錄錯誤"""
@@ -91,68 +252,29 @@ class TicketSearcher:
 
     def should_notify(self, last_price, new_price):
         """判斷是否應該發送通知"""
-        rules = NOTIFICATION_RULES
-        
-        # 如果價格上升或不變，不通知
-        if new_price >= last_price:
-            return False, "價格未下降"
-        
-        # 計算降幅
-        price_drop = last_price - new_price
-        drop_percent = (price_drop / last_price) * 100
-        
-        # 檢查是否任何降價都通知
-        if rules.get("notify_on_any_drop", False):
-            return True, f"任何降價都通知模式 (降幅: {price_drop:.0f}, {drop_percent:.1f}%)"
-        
-        # 檢查目標價格
-        target_price = rules.get("target_price")
-        if target_price is not None and new_price <= target_price:
-            return True, f"達到目標價格 NT$ {target_price:,.0f}"
-        
-        # 檢查降幅門檻（百分比或金額，滿足其一即可）
-        threshold_percent = rules.get("price_drop_threshold_percent", 0)
-        threshold_amount = rules.get("price_drop_threshold_amount", 0)
-        
-        if drop_percent >= threshold_percent:
-            return True, f"降幅 {drop_percent:.1f}% 超過門檻 {threshold_percent}%"
-        
-        if price_drop >= threshold_amount:
-            return True, f"降幅 NT$ {price_drop:.0f} 超過門檻 NT$ {threshold_amount}"
-        
-        return False, f"降幅不足 (降幅: {price_drop:.0f}, {drop_percent:.1f}%)"
+        return self.notification_rule.evaluate(last_price, new_price)
 
-    def create_email_content(self, last_price, new_price, filtered_flights):
-        """建立 Email 內容（使用 EmailFormatter）"""
-        formatter = EmailFormatter(
-            self.origin,
-            self.destination,
-            self.depart_date,
-            self.return_date,
-            SEARCH_PARAMS['adults']
-        )
-        
-        return formatter.create_price_drop_email(
-            last_price,
-            new_price,
-            filtered_flights,
-            max_results=DISPLAY_SETTINGS['max_results_in_email'],
-            show_return=DISPLAY_SETTINGS['show_return_flight']
-        )
+    def _timer(self, phase):
+        """記錄此路線某個階段的耗時"""
+        return METRICS.timer(PHASE_METRIC, phase=phase, route=self.metric_route)
+
+    def get_access_token(self, stale_token=None):
+        """取得 Amadeus API 的 access token（優先使用快取）"""
+        with self._timer("token"):
+            return TOKEN_CACHE.get_token(self._request_access_token, stale_token=stale_token)
 
-    def get_access_token(self):
-        """取得 Amadeus API 的 access token"""
+    def _request_access_token(self):
+        """向 Amadeus 申請新的 access token，回傳 (token, expires_in)"""
         print("🔑 正在取得 Access Token...")
         try:
-            response = requests.post(
+            response = self.http.post(
                 TOKEN_URL,
                 headers={"Content-Type": "application/x-www-form-urlencoded"},
                 data={
                     "grant_type": "client_credentials",
                     "client_id": AMADEUS_API_KEY,
                     "client_secret": AMADEUS_API_SECRET
-                },
-                timeout=10
+                }
             )
             
             if response.status_code != 200:
@@ -162,53 +284,117 @@ class TicketSearcher:
                 
             token_data = response.json()
             token = token_data["access_token"]
+            expires_in = token_data.get("expires_in", 1799)
             print("✅ 成功取得 Access Token")
-            return token
+            return token, expires_in
             
         except Exception as e:
             self.log_error("取得 Access Token 失敗", str(e))
             return None
 
-    def get_flights(self):
-        """查詢航班並回傳所有符合條件的航班"""
-        token = self.get_access_token()
-        if not token:
-            return None
-        
+    def _search_request(self, token, stream=False):
+        """送出航班查詢請求"""
         headers = {
             "Authorization": f"Bearer {token}",
             "Accept": "application/json"
         }
-        
-        try:
-            print(f"🔍 正在查詢航班: {self.origin} → {self.destination}")
-            print(f"📅 出發日期: {self.depart_date}")
-            print(f"📅 回程日期: {self.return_date}")
-            
-            response = requests.get(
+        with self._timer("search"):
+            return self.http.get(
                 FLIGHT_SEARCH_URL,
                 headers=headers,
-                params=SEARCH_PARAMS,
-                timeout=15
+                params=self.search_params,
+                stream=stream
             )
-            
-            if response.status_code != 200:
-                error_msg = f"航班查詢失敗 (狀態碼: {response.status_code})"
-                self.log_error(error_msg, response.text)
+
+    def _search_response(self, stream=False):
+        """取得 token 並查詢航班，回傳狀態碼 200 的回應，失敗時回傳 None"""
+        token = self.get_access_token()
+        if not token:
+            return None
+        
+        print(f"🔍 正在查詢航班: {self.origin} → {self.destination}")
+        print(f"📅 出發日期: {self.depart_date}")
+        print(f"📅 回程日期: {self.return_date}")
+        
+        response = self._search_request(token, stream)
+        
+        # Token 已失效：重新取得一次後再查詢
+        if response.status_code == 401:
+            print("🔑 Access Token 已失效，重新取得...")
+            response.close()
+            token = self.get_access_token(stale_token=token)
+            if not token:
                 return None
-            
+            response = self._search_request(token, stream)
+        
+        if response.status_code != 200:
+            error_msg = f"航班查詢失敗 (狀態碼: {response.status_code})"
+            self.log_error(error_msg, response.text)
+            return None
+        
+        return response
+
+    def fetch_offers(self, use_cache=True):
+        """
+        查詢航班並回傳 API 原始回應（dict）
+
+        Args:
+            use_cache: 是否使用回應快取（False 時一定會呼叫 API）
+        """
+        if ARCHIVE_REPLAY:
+            return self._replay_offers()
+        
+        cache_key = make_cache_key(FLIGHT_SEARCH_URL, self.search_params)
+        if use_cache and RESPONSE_CACHE:
+            data = RESPONSE_CACHE.get(cache_key)
+            METRICS.inc("flight_monitor_cache_requests_total", result="hit" if data is not None else "miss")
+            if data is not None:
+                print(f"⚡ 使用快取的查詢結果: {self.origin} → {self.destination}")
+                return data
+        
+        return SINGLE_FLIGHT.do(cache_key, lambda: self._request_offers(cache_key, use_cache))
+
+    def _replay_offers(self):
+        """從封存檔取得回應（不連網路）"""
+        print(f"🔁 重播封存的查詢結果: {self.origin} → {self.destination} ({self.depart_date} ~ {self.return_date})")
+        data = ARCHIVE_REPLAY.get(self.origin, self.destination, self.depart_date, self.return_date)
+        if data is None:
+            self.log_error("封存檔中沒有此路線的查詢結果", self.route)
+        return data
+
+    def _request_offers(self, cache_key, use_cache):
+        """呼叫航班查詢 API（同一查詢同時只會有一個執行）"""
+        response = self._search_response()
+        if response is None:
+            return None
+        
+        with self._timer("decode"):
             data = response.json()
-            
-            # 儲存完整 API 回應
-            with open("api_response.json", "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-            
-            if "data" not in data or len(data["data"]) == 0:
-                self.log_error("沒有找到任何航班", str(data.get('errors', '')))
-                return None
-            
-            # 解析所有航班
-            all_flights = []
+        
+        # 封存原始回應（背景執行緒原樣寫檔）
+        if RESPONSE_ARCHIVE:
+            RESPONSE_ARCHIVE.submit(self.route, self.search_params, response.content)
+        
+        if use_cache and RESPONSE_CACHE and data.get("data"):
+            RESPONSE_CACHE.set(cache_key, data)
+        
+        return data
+
+    def parse_offers(self, data):
+        """將 API 回應解析為 FlightInfo 列表，失敗時回傳 None"""
+        if data is None:
+            return None
+        
+        if "data" not in data or len(data["data"]) == 0:
+            self.log_error("沒有找到任何航班", str(data.get('errors', '')))
+            return None
+        
+        # 航空公司 / 機場名稱對照，每個回應只載入一次
+        REFERENCE_DATA.load_dictionaries(data.get("dictionaries"))
+        
+        # 解析所有航班
+        all_flights = []
+        with self._timer("parse"):
             for offer in data["data"]:
                 try:
                     flight = FlightInfo(offer)
@@ -216,22 +402,140 @@ class TicketSearcher:
                 except Exception as e:
                     print(f"⚠️ 解析航班失敗: {e}")
                     continue
-            
-            if not all_flights:
-                self.log_error("無法解析任何航班資料")
-                return None
-            
-            # 篩選符合偏好的航班
-            filtered_flights = [f for f in all_flights if f.matches_preferences(FLIGHT_PREFERENCES)]
-            
-            if not filtered_flights:
+        METRICS.inc("flight_monitor_offers_parsed_total", len(all_flights), route=self.metric_route)
+        
+        if not all_flights:
+            self.log_error("無法解析任何航班資料")
+            return None
+        
+        return all_flights
+
+    def filter_flights(self, all_flights, top_k=None):
+        """
+        依偏好篩選航班並按價格排序（沒有符合的航班時回傳全部航班）
+        
+        Args:
+            all_flights: FlightInfo 列表或 OfferBatch（多個訂閱共用時可避免重複建立欄位陣列）
+            top_k: 只回傳最便宜的幾個（None 表示全部），self.match_count 仍為完整的符合數量
+        """
+        with self._timer("filter"):
+            return self._filter_flights(all_flights, top_k)
+
+    def _filter_flights(self, all_flights, top_k):
+        batch = all_flights if isinstance(all_flights, OfferBatch) else None
+        if batch is None and offer_batch.is_available() and len(all_flights) >= VECTORIZE_MIN_OFFERS:
+            batch = OfferBatch(all_flights)
+        
+        if batch is not None:
+            # 只取出最便宜的 top_k 個航班，符合數量由遮罩計算
+            mask = batch.preference_mask(self.preferences)
+            self.match_count = int(mask.sum())
+            if not self.match_count:
                 print("⚠️ 沒有找到符合偏好條件的航班，顯示所有航班")
-                filtered_flights = all_flights
-            
-            # 按價格排序
-            filtered_flights.sort(key=lambda x: x.price)
+                mask = None
+                self.match_count = len(batch)
+            return [batch.flights[i] for i in batch.sorted_indices(mask, top_k)]
+        
+        if not top_k:
+            top_k = len(all_flights)
+        
+        matched = TopK(top_k)
+        matched.extend(f for f in all_flights if self.preference_rule.matches(f))
+        
+        if not matched.count:
+            print("⚠️ 沒有找到符合偏好條件的航班，顯示所有航班")
+            matched = TopK(top_k)
+            matched.extend(all_flights)
+        
+        self.match_count = matched.count
+        return matched.items()
+
+    def stream_flights(self, top_n):
+        """
+        串流查詢：邊下載邊解析並篩選，只保留最便宜的 top_n 個航班
+        
+        Returns:
+            list: 依價格排序的航班（最多 top_n 個），失敗時回傳 None
+        """
+        response = self._search_response(stream=True)
+        if response is None:
+            return None
+        
+        matched = TopK(top_n)
+        fallback = TopK(top_n)
+        
+        chunks = response.iter_content(chunk_size=65536)
+        spool = None
+        if RESPONSE_ARCHIVE:
+            # 下載的區塊同時寫入暫存（超過上限時存到暫存檔），結束後交給背景執行緒封存
+            spool = ResponseSpool()
+            chunks = self._tee_chunks(chunks, spool)
+        
+        parsed = 0
+        try:
+            # 串流模式下載、解析與篩選同時進行，合併記錄為 stream 階段
+            with self._timer("stream"):
+                stream = OfferStream(chunks)
+                for offer in stream:
+                    try:
+                        flight = FlightInfo(offer)
+                    except Exception as e:
+                        print(f"⚠️ 解析航班失敗: {e}")
+                        continue
+                    parsed += 1
+                    if self.preference_rule.matches(flight):
+                        matched.push(flight)
+                    elif not matched.count:
+                        fallback.push(flight)
+        except BaseException:
+            # 下載或解析中斷時回應不完整，不封存
+            if spool is not None:
+                spool.close()
+            raise
+        finally:
+            response.close()
+            METRICS.inc("flight_monitor_offers_parsed_total", parsed, route=self.metric_route)
+        
+        if spool is not None:
+            if spool.size:
+                RESPONSE_ARCHIVE.submit(self.route, self.search_params, spool)
+            else:
+                spool.close()
+        
+        # dictionaries 在 data 陣列之後，串流結束時才會取得
+        REFERENCE_DATA.load_dictionaries(stream.extra.get("dictionaries"))
+        
+        total = matched.count + fallback.count
+        if total == 0:
+            self.log_error("沒有找到任何航班", str(stream.extra.get('errors', '')))
+            return None
+        
+        if not matched.count:
+            print("⚠️ 沒有找到符合偏好條件的航班，顯示所有航班")
+            matched = fallback
+        
+        self.match_count = matched.count
+        return matched.items()
+
+    @staticmethod
+    def _tee_chunks(chunks, spool):
+        """將下載的區塊同時寫入 spool"""
+        for chunk in chunks:
+            spool.write(chunk)
+            yield chunk
+
+    def get_flights(self, use_cache=True):
+        """查詢航班並回傳最便宜的 TOP_K 個符合條件的航班（完整數量見 self.match_count）"""
+        try:
+            if STREAMING_SETTINGS.get('enabled', False) and not ARCHIVE_REPLAY:
+                filtered_flights = self.stream_flights(TOP_K)
+            else:
+                all_flights = self.parse_offers(self.fetch_offers(use_cache=use_cache))
+                filtered_flights = self.filter_flights(all_flights, TOP_K) if all_flights else None
+            if not filtered_flights:
+                return None
             
-            print(f"\n找到 {len(filtered_flights)} 個符合條件的航班:")
+            print(f"\n找到 {self.match_count} 個符合條件的航班:")
             print("-" * 80)
             
             for i, flight in enumerate(filtered_flights[:10], 1):
@@ -246,8 +550,44 @@ class TicketSearcher:
             self.log_error("查詢航班時發生錯誤", str(e))
             return None
 
-    def check_price(self):
-        """檢查價格是否有變化"""
+    def get_last_price(self):
+        """取得比較基準價格（舊版 last_price 檔案需先以 python main.py --migrate-state 轉移）"""
+        return HISTORY_STORE.get_last_price(self.state_key)
+
+    def diff_offers(self, filtered_flights):
+        """
+        與上次查詢的航班快照比較
+
+        Returns:
+            OfferDiff，未啟用或讀取快照失敗時回傳 None（視為有變化）
+        """
+        if not SKIP_UNCHANGED:
+            return None
+        try:
+            diff = diff_offers(HISTORY_STORE.get_snapshot(self.state_key), filtered_flights)
+        except Exception as e:
+            print(f"⚠️ 讀取航班快照失敗: {e}")
+            return None
+        for change, count in (("added", len(diff.added)), ("removed", len(diff.removed)),
+                              ("repriced", len(diff.repriced))):
+            if count:
+                METRICS.inc("flight_monitor_offer_changes_total", count, route=self.metric_route, change=change)
+        if not diff.changed:
+            METRICS.inc("flight_monitor_unchanged_polls_total", route=self.metric_route)
+        return diff
+
+    def check_price(self, all_flights=None, filtered_flights=None):
+        """
+        檢查價格是否有變化（清單、常駐、訂閱與彈性日期查詢都經過這裡，一併記錄總耗時）
+        
+        Args:
+            all_flights: 已解析的航班列表（多個訂閱共用同一次查詢時傳入），None 表示自行查詢
+            filtered_flights: 已依偏好篩選並排序的航班（由訂閱索引比對時傳入，match_count 需先設定）
+        """
+        with METRICS.timer("flight_monitor_run_seconds", route=self.metric_route):
+            return self._check_price(all_flights, filtered_flights)
+
+    def _check_price(self, all_flights, filtered_flights):
         print(f"\n{'='*60}")
         print(f"⏰ 執行時間: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         print('='*60)
@@ -255,38 +595,69 @@ class TicketSearcher:
         self.log_execution("START", "開始查詢航班價格")
         
         # 查詢航班
-        filtered_flights = self.get_flights()
+        if filtered_flights is None:
+            if all_flights is None:
+                filtered_flights = self.get_flights()
+            else:
+                filtered_flights = self.filter_flights(all_flights, TOP_K)
         if not filtered_flights:
             print("⚠️ 無法取得航班資訊")
             self.log_execution("FAILED", "無法取得航班資訊")
             return False
         
         new_price = filtered_flights[0].price  # 最低價
+        self.current_price = new_price
+        
+        # 與上次查詢的航班快照比較，沒有任何變化時歷史記錄只保留最低價與航班數，不重複寫入航班摘要
+        # （通知判斷仍照常進行：通知規則或比較基準價格可能已經改變）
+        diff = self.diff_offers(filtered_flights)
+        unchanged = diff is not None and not diff.changed
+        if unchanged:
+            print(f"💤 航班與價格與上次查詢相同（最低價 NT$ {new_price:,.0f}），只記錄最低價")
+        elif diff is not None:
+            print(f"🔍 航班變化：{diff.summary()}")
+        self._record_history(new_price, None if unchanged else filtered_flights)
         
-        # 記錄簡易日誌（使用 EmailFormatter）
-        formatter = EmailFormatter(
+        # 讀取上次記錄的價格
+        try:
+            last_price = self.get_last_price()
+        except Exception as e:
+            self.log_error("讀取歷史價格失敗", str(e))
+            return False
+        
+        success = self._notify_if_needed(last_price, new_price, filtered_flights, unchanged)
+        
+        # 通知處理完成後才更新快照（中途失敗時下次查詢仍會視為有變化）
+        if diff is not None and diff.changed:
+            HISTORY_STORE.set_snapshot(self.state_key, diff.snapshot)
+        return success
+
+    def _record_history(self, new_price, filtered_flights=None):
+        """記錄本次查詢結果（filtered_flights 為 None 時不記錄航班摘要）"""
+        HISTORY_STORE.record(
+            self.state_key,
             self.origin,
             self.destination,
             self.depart_date,
             self.return_date,
-            SEARCH_PARAMS['adults']
+            new_price,
+            self.match_count,
+            top_offers=None if filtered_flights is None else [{
+                "price": f.price,
+                "airline": f.airline_code,
+                "flight_number": f.flight_number,
+                "departure_time": f.departure_time,
+                "stops": f.outbound_stops
+            } for f in filtered_flights[:DISPLAY_SETTINGS['max_results_in_email']]]
         )
-        summary = formatter.create_simple_summary(new_price, len(filtered_flights))
-        self.log_to_file(HISTORY_LOG_FILE, summary)
-        
-        # 讀取上次記錄的價格
-        try:
-            with open(LAST_PRICE_FILE, "r") as f:
-                last_price = float(f.read().strip())
-        except FileNotFoundError:
+
+    def _notify_if_needed(self, last_price, new_price, filtered_flights, unchanged=False):
+        """依比較基準價格判斷是否通知，回傳是否成功完成"""
+        if last_price is None:
             print("📝 首次執行，記錄當前價格")
-            with open(LAST_PRICE_FILE, "w") as f:
-                f.write(str(new_price))
+            HISTORY_STORE.set_last_price(self.state_key, new_price)
             self.log_execution("SUCCESS", f"首次執行，記錄價格: {new_price}")
             return True
-        except Exception as e:
-            self.log_error("讀取歷史價格失敗", str(e))
-            return False
         
         # 判斷是否需要通知
         should_send, reason = self.should_notify(last_price, new_price)
@@ -304,32 +675,53 @@ class TicketSearcher:
         
         # 發送通知
         if should_send:
-            email_content = self.create_email_content(last_price, new_price, filtered_flights)
-            self.log_to_file(EMAIL_CONTENT_FILE, email_content, mode='w')
-            
-            print("\n📧 符合通知條件！正在發送 Email...")
-            
-            try:
-                from mailer import send_email
-                send_email(email_content)
-                print("✅ Email 通知已成功發送！")
-                self.log_execution("EMAIL_SENT", f"{reason}")
-            except ImportError:
-                print("⚠️ 找不到 mailer.py，Email 內容已儲存至 email_content.txt")
-                self.log_execution("EMAIL_SKIPPED", "找不到 mailer.py")
-            except Exception as e:
-                print(f"❌ Email 發送失敗: {e}")
-                self.log_error("Email 發送失敗", str(e))
+            alert = Alert(
+                self.state_key,
+                self.origin,
+                self.destination,
+                self.depart_date,
+                self.return_date,
+                self.search_params['adults'],
+                last_price,
+                new_price,
+                reason,
+                filtered_flights[:DISPLAY_SETTINGS['max_results_in_email']],
+                recipients=self.notification_rules.get('recipients'),
+                on_done=lambda recipient, error: self._on_email_done(recipient, error, reason)
+            )
+            # 由通知引擎彙整後在背景寄出，不阻塞查詢流程
+            if not alert.recipients:
+                print("\n⚠️ 符合通知條件，但沒有設定收件人（email.recipients），本次不寄信")
+                self.log_execution("EMAIL_SKIPPED", f"未設定收件人: {reason}")
+            elif NOTIFIER.submit(alert):
+                print("\n📧 符合通知條件！通知已加入寄送佇列...")
+                self.log_execution("EMAIL_QUEUED", f"{reason}")
+            else:
+                print("\n🔕 相同航班或價格已在冷卻時間內通知過，本次略過")
+                METRICS.inc("flight_monitor_emails_total", route=self.metric_route, result="suppressed")
+                self.log_execution("EMAIL_SUPPRESSED", f"{reason}")
             
             # 更新價格記錄
-            with open(LAST_PRICE_FILE, "w") as f:
-                f.write(str(new_price))
+            HISTORY_STORE.set_last_price(self.state_key, new_price)
+        elif unchanged:
+            print("💤 不符合通知條件，本次不發送通知")
+            self.log_execution("UNCHANGED", f"航班與價格沒有變化: {reason}")
         else:
             print("💤 不符合通知條件，本次不發送通知")
             self.log_execution("SUCCESS", f"價格變化但不通知: {reason}")
         
         return True
 
+    def _on_email_done(self, recipient, error, reason):
+        """郵件寄出或重試用盡後的記錄（在寄信執行緒中呼叫）"""
+        if error is None:
+            print(f"✅ Email 通知已成功發送！({self.origin} → {self.destination}, {recipient})")
+            METRICS.inc("flight_monitor_emails_total", route=self.metric_route, result="sent")
+            self.log_execution("EMAIL_SENT", f"{reason}")
+        else:
+            METRICS.inc("flight_monitor_emails_total", route=self.metric_route, result="failed")
+            self.log_error("Email 發送失敗", str(error))
+
     def run(self):
 
         """執行一次完整的檢查流程"""
@@ -338,12 +730,12 @@ class TicketSearcher:
         print("="*60)
         print(f"📍 路線: {get_airport_name(self.origin)} → {get_airport_name(self.destination)}")
         print(f"📅 日期: {self.depart_date} ~ {self.return_date}")
-        print(f"👤 人數: {SEARCH_PARAMS['adults']} 位成人")
-        print(f"💱 幣別: {SEARCH_PARAMS['currencyCode']}")
+        print(f"👤 人數: {self.search_params['adults']} 位成人")
+        print(f"💱 幣別: {self.search_params['currencyCode']}")
         print("\n【篩選條件】")
         
         # 顯示轉機限制
-        max_stops = FLIGHT_PREFERENCES.get('max_stops')
+        max_stops = self.preferences.get('max_stops')
         if max_stops is not None:
             if max_stops == 0:
                 print("  ✓ 只接受直飛")
@@ -351,25 +743,25 @@ class TicketSearcher:
                 print(f"  ✓ 最多 {max_stops} 次轉機")
         
         # 顯示航空公司偏好
-        preferred = FLIGHT_PREFERENCES.get('preferred_airlines', [])
+        preferred = self.preferences.get('preferred_airlines', [])
         if preferred:
             print(f"  ✓ 偏好航空: {', '.join([get_airline_name(code) for code in preferred])}")
         
-        excluded = FLIGHT_PREFERENCES.get('excluded_airlines', [])
+        excluded = self.preferences.get('excluded_airlines', [])
         if excluded:
             print(f"  ✗ 排除航空: {', '.join([get_airline_name(code) for code in excluded])}")
         
         # 顯示時段偏好
-        dep_pref = FLIGHT_PREFERENCES.get('departure_time_preference', 'any')
+        dep_pref = self.preferences.get('departure_time_preference', 'any')
         if dep_pref != 'any':
             print(f"  ✓ 出發時段: {dep_pref}")
         
-        arr_pref = FLIGHT_PREFERENCES.get('arrival_time_preference', 'any')
+        arr_pref = self.preferences.get('arrival_time_preference', 'any')
         if arr_pref != 'any':
             print(f"  ✓ 抵達時段: {arr_pref}")
         
         print("\n【通知條件】")
-        rules = NOTIFICATION_RULES
+        rules = self.notification_rules
         
         if rules.get('notify_on_any_drop', False):
             print("  🔔 任何降價都通知")
@@ -0,0 +1,95 @@
+"""
+Access Token 快取模組
+將 Amadeus OAuth token 保存在記憶體與檔案中，在到期前重複使用
+多個搜尋程序可透過同一個快取檔案共用 token
+"""
+
+import json
+import os
+import threading
+import time
+
+from utils import file_lock
+
+
+class TokenCache:
+    """Access Token 快取（記憶體 + 檔案，跨程序共用）"""
+
+    def __init__(self, cache_file, client_id, refresh_margin=60):
+        """
+        Args:
+            cache_file: 快取檔案路徑
+            client_id: API Key，用來區分不同帳號的 token
+            refresh_margin: 到期前幾秒就視為過期並重新取得
+        """
+        self.cache_file = cache_file
+        self.lock_file = cache_file + ".lock"
+        self.client_id = client_id
+        self.refresh_margin = refresh_margin
+        self._token = None
+        self._expires_at = 0
+        self._lock = threading.Lock()
+
+    def _is_fresh(self, expires_at):
+        """檢查 token 是否仍在有效期限內（已扣除提前更新的緩衝時間）"""
+        return time.time() < expires_at - self.refresh_margin
+
+    def _read_file(self):
+        """讀取快取檔案，回傳 (token, expires_at) 或 None"""
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        if cached.get("client_id") != self.client_id:
+            return None
+        return cached.get("access_token"), float(cached.get("expires_at", 0))
+
+    def _write_file(self):
+        """寫入快取檔案（先寫暫存檔再取代，避免其他程序讀到一半的內容）"""
+        tmp_file = f"{self.cache_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({
+                "client_id": self.client_id,
+                "access_token": self._token,
+                "expires_at": self._expires_at
+            }, f)
+        os.replace(tmp_file, self.cache_file)
+
+    def get_token(self, fetch_func, stale_token=None):
+        """
+        取得有效的 token，必要時呼叫 fetch_func 重新取得
+
+        Args:
+            fetch_func: 無參數函數，回傳 (token, expires_in 秒數) 或 None
+            stale_token: 已知失效的 token（例如 API 回傳 401），不會再被重複使用
+
+        Returns:
+            str: access token，取得失敗時回傳 None
+        """
+        with self._lock:
+            if self._token and self._token != stale_token and self._is_fresh(self._expires_at):
+                return self._token
+
+            with file_lock(self.lock_file):
+                # 其他程序可能已經更新過 token
+                cached = self._read_file()
+                if cached:
+                    token, expires_at = cached
+                    if token and token != stale_token and self._is_fresh(expires_at):
+                        self._token, self._expires_at = token, expires_at
+                        return token
+
+                result = fetch_func()
+                if not result:
+                    return None
+
+                token, expires_in = result
+                self._token = token
+                self._expires_at = time.time() + float(expires_in)
+                try:
+                    self._write_file()
+                except OSError as e:
+                    print(f"⚠️ 寫入 Token 快取失敗: {e}")
+                return token
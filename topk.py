@@ -0,0 +1,57 @@
+"""
+Top-K 選取模組
+只保留最便宜的 K 個航班，以及合併多組已排序結果的 k-way merge
+"""
+
+import heapq
+from itertools import islice
+
+
+def _price(flight):
+    return flight.price_minor
+
+
+class TopK:
+    """固定大小的最小 K 個元素收集器（相同 key 時保留先加入的）"""
+
+    def __init__(self, k, key=_price):
+        """
+        Args:
+            k: 最多保留幾個
+            key: 排序依據（預設為航班價格）
+        """
+        self.k = k
+        self.key = key
+        self.count = 0
+        # 以 (-key, -順序) 建立最大堆積，堆頂為目前保留的最差元素
+        self._heap = []
+
+    def push(self, item):
+        """加入一個元素"""
+        entry = (-self.key(item), -self.count, item)
+        self.count += 1
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif entry[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entry)
+
+    def extend(self, items):
+        for item in items:
+            self.push(item)
+
+    def __len__(self):
+        return len(self._heap)
+
+    def items(self):
+        """依 key 由小到大排序的結果"""
+        return [entry[2] for entry in sorted(self._heap, key=lambda e: (-e[0], -e[1]))]
+
+
+def merge_topk(sorted_lists, k, key=_price):
+    """
+    合併多組已排序的結果，只取前 k 個（不建立完整的聯集）
+
+    Args:
+        sorted_lists: 多個依 key 由小到大排序的列表（例如多個 TopK.items()）
+    """
+    return list(islice(heapq.merge(*sorted_lists, key=key), k))
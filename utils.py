@@ -1,50 +1,82 @@
-import yaml
+import os
+import re
+from contextlib import contextmanager
 from datetime import datetime
-
-# 读取 YAML 配置文件
-with open("config.yaml", "r", encoding="utf-8") as f:
-    config = yaml.safe_load(f)
+from app_config import config
+from reference_data import ReferenceData
 
 AIRPORT_NAMES = config['mappings']['airport_names']
 AIRLINE_NAMES = config['mappings']['airline_names']
 
+# 共用的參考資料（自訂名稱優先，其次為內建 IATA 對照表與 API 回應的 dictionaries）
+REFERENCE_SETTINGS = config.get('reference_data') or {}
+REFERENCE_DATA = ReferenceData(
+    AIRPORT_NAMES,
+    AIRLINE_NAMES,
+    airports_file=REFERENCE_SETTINGS.get('airports_file', 'data/airports.csv'),
+    airlines_file=REFERENCE_SETTINGS.get('airlines_file', 'data/airlines.csv')
+)
+
+
+def _reload_reference_data(new_config):
+    """設定檔重新載入後套用新的名稱對照"""
+    settings = new_config.get('reference_data') or {}
+    REFERENCE_DATA.configure(
+        new_config['mappings']['airport_names'],
+        new_config['mappings']['airline_names'],
+        airports_file=settings.get('airports_file', 'data/airports.csv'),
+        airlines_file=settings.get('airlines_file', 'data/airlines.csv')
+    )
+
+
+config.on_reload(_reload_reference_data)
+
 
 def get_airport_name(code):
     """取得機場中文名稱"""
-    return AIRPORT_NAMES.get(code, code)
+    return REFERENCE_DATA.airport_name(code)
 
 
 def get_airline_name(code):
     """取得航空公司中文名稱"""
-    return AIRLINE_NAMES.get(code, code)
+    return REFERENCE_DATA.airline_name(code)
 
 
-def parse_duration(duration_str):
+def route_key(origin, destination, depart_date, return_date):
+    """路線識別字串，例如: TPE-NRT-2026-03-06-2026-03-11"""
+    return f"{origin}-{destination}-{depart_date}-{return_date}"
+
+
+_DURATION_PATTERN = re.compile(r"P(?:(\d+)D)?T?(?:(\d+)H)?(?:(\d+)M)?")
+
+
+def parse_duration_minutes(duration_str):
     """
     解析 ISO 8601 duration 格式（例如: "PT3H30M"）
-    回傳小時數（浮點數）
+    回傳分鐘數（整數）
     """
     if not duration_str:
         return 0
     
-    # 移除 "PT" 前綴
-    duration_str = duration_str.replace("PT", "")
-    
-    hours = 0
-    minutes = 0
-    
-    # 解析小時
-    if "H" in duration_str:
-        h_index = duration_str.index("H")
-        hours = int(duration_str[:h_index])
-        duration_str = duration_str[h_index+1:]
-    
-    # 解析分鐘
-    if "M" in duration_str:
-        m_index = duration_str.index("M")
-        minutes = int(duration_str[:m_index])
+    match = _DURATION_PATTERN.match(duration_str)
+    if not match:
+        return 0
     
-    return hours + minutes / 60.0
+    days, hours, minutes = (int(x) if x else 0 for x in match.groups())
+    return (days * 24 + hours) * 60 + minutes
+
+
+def parse_duration(duration_str):
+    """
+    解析 ISO 8601 duration 格式（例如: "PT3H30M"）
+    回傳小時數（浮點數）
+    """
+    return minutes_to_hours(parse_duration_minutes(duration_str))
+
+
+def minutes_to_hours(minutes):
+    """分鐘數轉換為小時數（浮點數）"""
+    return minutes // 60 + (minutes % 60) / 60.0
 
 
 def format_duration(hours):
@@ -61,6 +93,23 @@ def format_duration(hours):
         return f"{h}小時{m}分鐘"
 
 
+def period_of_hour(hour):
+    """
+    依小時取得時段（morning, afternoon, evening, night）
+    hour 為 None 或負數時回傳 "any"
+    """
+    if hour is None or hour < 0:
+        return "any"
+    if 6 <= hour < 12:
+        return "morning"
+    elif 12 <= hour < 18:
+        return "afternoon"
+    elif 18 <= hour < 24:
+        return "evening"
+    else:
+        return "night"
+
+
 def get_time_period(datetime_str):
     """
     取得時段（morning, afternoon, evening, night）
@@ -68,16 +117,7 @@ def get_time_period(datetime_str):
     """
     try:
         dt = datetime.fromisoformat(datetime_str.replace('Z', '+00:00'))
-        hour = dt.hour
-        
-        if 6 <= hour < 12:
-            return "morning"
-        elif 12 <= hour < 18:
-            return "afternoon"
-        elif 18 <= hour < 24:
-            return "evening"
-        else:
-            return "night"
+        return period_of_hour(dt.hour)
     except:
         return "any"
 
@@ -97,4 +137,38 @@ def calculate_price_change(old_price, new_price):
     """
     diff = new_price - old_price
     percent = (diff / old_price) * 100 if old_price > 0 else 0
-    return diff, percent
\ No newline at end of file
+    return diff, percent
+
+@contextmanager
+def file_lock(lock_path):
+    """
+    跨程序檔案鎖（Windows 使用 msvcrt，其他平台使用 fcntl）
+    用法: with file_lock("xxx.lock"): ...
+    """
+    lock_dir = os.path.dirname(lock_path)
+    if lock_dir:
+        os.makedirs(lock_dir, exist_ok=True)
+
+    with open(lock_path, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK 最多重試 10 秒，逾時則繼續等待
+                    continue
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,117 @@
+"""
+多路線監控模組
+在同一個程序中同時檢查 config.yaml 中 watchlist 的所有路線
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+from ticket_searcher import TicketSearcher, config
+from utils import get_airport_name, route_key
+
+
+def load_routes(watchlist_config):
+    """將 watchlist 設定中的路線轉換為搜尋參數列表"""
+    routes = []
+    for route in watchlist_config.get('routes') or []:
+        route = dict(route)
+        routes.append({
+            "origin": route.pop('originLocationCode'),
+            "destination": route.pop('destinationLocationCode'),
+            "depart_date": str(route.pop('departureDate')),
+            "return_date": str(route.pop('returnDate')),
+            "preferences": route.pop('flight_preferences', None),
+            "notification_rules": route.pop('notification_rules', None),
+            # 其餘欄位（例如 adults、max）直接覆寫搜尋參數
+            "search_params": route
+        })
+    return routes
+
+
+class WatchlistRunner:
+    """多路線並行檢查"""
+
+    def __init__(self, routes, max_workers=4):
+        """
+        Args:
+            routes: load_routes() 回傳的路線列表
+            max_workers: 同時檢查的路線數上限
+        """
+        self.routes = routes
+        self.max_workers = max(1, max_workers)
+
+    def check_route(self, route):
+        """檢查單一路線，任何例外都只影響這條路線"""
+        key = route_key(route['origin'], route['destination'], route['depart_date'], route['return_date'])
+        started = time.time()
+        result = {"route": key, "success": False, "price": None, "error": None}
+
+        try:
+            searcher = TicketSearcher(
+                route['origin'],
+                route['destination'],
+                route['depart_date'],
+                route['return_date'],
+                search_params=route['search_params'],
+                preferences=route['preferences'],
+                notification_rules=route['notification_rules']
+            )
+            result["success"] = searcher.check_price()
+            result["price"] = searcher.current_price
+        except Exception as e:
+            result["error"] = str(e)
+            print(f"❌ 路線 {key} 執行失敗: {e}")
+
+        result["elapsed"] = time.time() - started
+        return result
+
+    def run(self):
+        """並行檢查所有路線，回傳每條路線的結果"""
+        started = datetime.now()
+
+        print("\n" + "="*60)
+        print(f"✈️  多路線監控：共 {len(self.routes)} 條路線（同時 {self.max_workers} 條）")
+        print("="*60)
+
+        results = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self.check_route, route) for route in self.routes]
+            for future in as_completed(futures):
+                results.append(future.result())
+
+        self.print_summary(results, (datetime.now() - started).total_seconds())
+        return results
+
+    def print_summary(self, results, execution_time):
+        """輸出所有路線的彙總結果"""
+        succeeded = [r for r in results if r["success"]]
+        failed = [r for r in results if not r["success"]]
+
+        print("\n" + "="*60)
+        print("📊 多路線監控結果")
+        print("="*60)
+        for r in sorted(results, key=lambda x: x["route"]):
+            origin, destination = r["route"].split('-')[:2]
+            name = f"{get_airport_name(origin)} → {get_airport_name(destination)}"
+            if r["success"] and r["price"] is not None:
+                print(f"  ✅ {r['route']} ({name}) | NT$ {r['price']:,.0f} | {r['elapsed']:.2f} 秒")
+            else:
+                print(f"  ❌ {r['route']} ({name}) | {r['error'] or '無法取得航班資訊'}")
+        print("-"*60)
+        print(f"成功: {len(succeeded)} 條 | 失敗: {len(failed)} 條 | 總執行時間: {execution_time:.2f} 秒")
+
+
+def run_watchlist():
+    """依 config.yaml 的 watchlist 設定執行多路線監控"""
+    watchlist_config = config.get('watchlist') or {}
+    routes = load_routes(watchlist_config)
+    if not routes:
+        print("⚠️ config.yaml 的 watchlist 沒有設定任何路線")
+        return []
+
+    runner = WatchlistRunner(
+        routes,
+        max_workers=watchlist_config.get('max_workers', 4)
+    )
+    return runner.run()